@@ -0,0 +1,144 @@
+"""
+Professional Fashion Sizing API - Admission Control
+Adaptive concurrency limit (AIMD) with a bounded wait queue and load shedding
+"""
+
+import functools
+import math
+import threading
+import time
+
+from negotiation import render
+
+
+class Rejected(Exception):
+    """Raised when a request is shed instead of admitted"""
+
+    def __init__(self, status, error_code, message, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.error_code = error_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Concurrency limiter with an adaptive limit
+    The limit grows additively while completed requests stay under the target
+    latency and shrinks multiplicatively when they exceed it. Requests beyond
+    the limit wait in a bounded queue; a full queue is rejected immediately
+    with 429 and a queue wait past the timeout is rejected with 503.
+    """
+
+    def __init__(self, initial_limit=16, min_limit=2, max_limit=256, max_queue=32,
+                 queue_timeout=0.5, target_latency=0.25, backoff_ratio=0.8):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.target_latency = target_latency
+        self.backoff_ratio = backoff_ratio
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._last_decrease = 0.0
+        self._latency_ewma = None
+
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def _retry_after(self):
+        """Seconds a shed client should wait, from queue depth and service time"""
+        latency = self._latency_ewma or self.target_latency
+        backlog = (self._in_flight + self._waiting) / max(1.0, self.limit)
+        return max(1, math.ceil(backlog * latency))
+
+    def acquire(self):
+        """Admit the caller or raise Rejected"""
+        with self._cond:
+            if self._in_flight < int(self.limit) and self._waiting == 0:
+                self._in_flight += 1
+                self.admitted += 1
+                return
+
+            if self._waiting >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise Rejected(429, 'OVERLOADED', 'Server is at capacity, retry later',
+                               self._retry_after())
+
+            self._waiting += 1
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self._in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.rejected_timeout += 1
+                        raise Rejected(503, 'QUEUE_TIMEOUT', 'Request timed out waiting for capacity',
+                                       self._retry_after())
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+            self._in_flight += 1
+            self.admitted += 1
+
+    def release(self, latency):
+        """Record a completed request and adapt the limit"""
+        with self._cond:
+            self._in_flight -= 1
+
+            if self._latency_ewma is None:
+                self._latency_ewma = latency
+            else:
+                self._latency_ewma = 0.9 * self._latency_ewma + 0.1 * latency
+
+            now = time.monotonic()
+            if latency > self.target_latency:
+                # Decrease at most once per target latency window
+                if now - self._last_decrease >= self.target_latency:
+                    self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+                    self._last_decrease = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+            self._cond.notify()
+
+    def guard(self, view):
+        """Decorator applying admission control to a Flask view"""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                self.acquire()
+            except Rejected as e:
+                response = render({
+                    'success': False,
+                    'error': str(e),
+                    'error_code': e.error_code
+                })
+                response.status_code = e.status
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+
+            start = time.perf_counter()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                self.release(time.perf_counter() - start)
+
+        return wrapper
+
+    def get_metrics(self):
+        """Current limiter state"""
+        with self._cond:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self._in_flight,
+                'waiting': self._waiting,
+                'admitted': self.admitted,
+                'rejected_queue_full': self.rejected_queue_full,
+                'rejected_timeout': self.rejected_timeout,
+                'latency_ewma_ms': round(self._latency_ewma * 1000, 2) if self._latency_ewma else None
+            }
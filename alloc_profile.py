@@ -0,0 +1,201 @@
+"""
+Professional Fashion Sizing API - Allocation Profiler
+Reports objects and bytes allocated by each recommendation pipeline stage
+with tracemalloc and checks them against declared per-request budgets
+"""
+
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+from engine import STAGE_METHODS, ProfessionalSizeRecommendationEngine
+
+ALLOCATION_STAGES = STAGE_METHODS + [('assemble', 'assemble_recommendation')]
+
+# Per-request budgets, checked against the worst request of the corpus.
+# objects: memory blocks (objects and their buffers) the stage leaves
+# allocated; peak_kb: highest traced memory above the stage's starting point,
+# temporaries included.
+ALLOCATION_BUDGETS = {
+    'body_analysis': {'objects': 48, 'peak_kb': 2},
+    'top_size': {'objects': 24, 'peak_kb': 1},
+    'bottom_size': {'objects': 24, 'peak_kb': 1},
+    'sizes': {'objects': 16, 'peak_kb': 1},
+    'brand': {'objects': 12, 'peak_kb': 1},
+    'outfits': {'objects': 48, 'peak_kb': 2},
+    'virtual_fitting': {'objects': 32, 'peak_kb': 2},
+    'confidence': {'objects': 16, 'peak_kb': 2},
+    'assemble': {'objects': 28, 'peak_kb': 2},
+    'total': {'objects': 100, 'peak_kb': 8}
+}
+
+
+class AllocationProfiler:
+    """
+    Wraps the engine's stage methods to record allocations per stage
+    The collector is paused while profiling so a collection cannot free
+    memory mid-stage; tracemalloc must be tracing.
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine or ProfessionalSizeRecommendationEngine()
+        self.current = {}
+        # Absolute traced peaks; each stage resets the peak, so the request keeps its own
+        self.peaks = []
+        for stage, method in ALLOCATION_STAGES:
+            setattr(self.engine, method, self._traced(stage, getattr(self.engine, method)))
+
+    def _traced(self, stage, method):
+        current, peaks = self.current, self.peaks
+
+        def traced(*args, **kwargs):
+            objects = sys.getallocatedblocks()
+            start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                size, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak)
+                current[stage] = {
+                    'objects': sys.getallocatedblocks() - objects,
+                    'bytes': size - start,
+                    'peak_kb': (peak - start) / 1024
+                }
+        return traced
+
+    def profile(self, payload):
+        """Allocations of one recommendation, per stage and in total"""
+        self.current.clear()
+        self.peaks.clear()
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            objects = sys.getallocatedblocks()
+            start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            self.engine.recommend_size(payload)
+            size, peak = tracemalloc.get_traced_memory()
+            total_peak = max([peak] + self.peaks)
+            result = dict(self.current)
+            result['total'] = {
+                'objects': sys.getallocatedblocks() - objects,
+                'bytes': size - start,
+                'peak_kb': (total_peak - start) / 1024
+            }
+            return result
+        finally:
+            if enabled:
+                gc.enable()
+
+
+def profile_corpus(payloads, warmup=20):
+    """Per-stage mean and worst case over a corpus of payloads"""
+    profiler = AllocationProfiler()
+    for payload in payloads[:warmup]:
+        # First calls fill interned strings and caches; they are not steady state
+        profiler.engine.recommend_size(payload)
+
+    samples = {}
+    tracemalloc.start()
+    try:
+        for payload in payloads:
+            for stage, values in profiler.profile(payload).items():
+                for name, value in values.items():
+                    samples.setdefault(stage, {}).setdefault(name, []).append(value)
+    finally:
+        tracemalloc.stop()
+
+    report = {}
+    for stage in [stage for stage, _ in ALLOCATION_STAGES] + ['total']:
+        if stage not in samples:
+            continue
+        report[stage] = {
+            name: {'mean': round(statistics.mean(values), 2), 'max': round(max(values), 2)}
+            for name, values in samples[stage].items()
+        }
+    return report
+
+
+def gc_pressure(payloads, rounds=5):
+    """Collections and collector pause time per 1000 requests with the GC running normally"""
+    engine = ProfessionalSizeRecommendationEngine()
+    pauses = []
+    started = {}
+
+    def callback(phase, info):
+        if phase == 'start':
+            started['at'] = time.perf_counter()
+        elif 'at' in started:
+            pauses.append((info['generation'], (time.perf_counter() - started.pop('at')) * 1000))
+
+    gc.collect()
+    gc.callbacks.append(callback)
+    try:
+        for _ in range(rounds):
+            for payload in payloads:
+                engine.recommend_size(payload)
+    finally:
+        gc.callbacks.remove(callback)
+
+    requests = rounds * len(payloads)
+    return {
+        'requests': requests,
+        'collections_per_1000': round(len(pauses) / requests * 1000, 2),
+        'pause_ms_per_1000': round(sum(pause for _, pause in pauses) / requests * 1000, 3),
+        'max_pause_ms': round(max((pause for _, pause in pauses), default=0.0), 3),
+        'by_generation': {generation: sum(1 for g, _ in pauses if g == generation) for generation in range(3)}
+    }
+
+
+def check_budgets(report, budgets=ALLOCATION_BUDGETS):
+    """Budget violations of the worst request per stage"""
+    failures = []
+    for stage, limits in budgets.items():
+        for name, limit in limits.items():
+            worst = report.get(stage, {}).get(name, {}).get('max')
+            if worst is not None and worst > limit:
+                failures.append(f'{stage} {name} {worst} exceeds budget {limit}')
+    return failures
+
+
+def print_report(report, budgets=ALLOCATION_BUDGETS):
+    print(f"  {'stage':<16} {'objects':>9} {'max':>6} {'budget':>7} {'net KB':>8} {'peak KB':>9} {'max':>7} {'budget':>7}")
+    for stage, values in report.items():
+        budget = budgets.get(stage, {})
+        print(f"  {stage:<16} {values['objects']['mean']:>9.1f} {values['objects']['max']:>6.0f} "
+              f"{budget.get('objects', '-'):>7} {values['bytes']['mean'] / 1024:>8.2f} "
+              f"{values['peak_kb']['mean']:>9.2f} {values['peak_kb']['max']:>7.2f} {budget.get('peak_kb', '-'):>7}")
+
+
+if __name__ == '__main__':
+    from vectorized import random_profiles
+
+    parser = argparse.ArgumentParser(description='Per-stage allocation profile of recommend_size')
+    parser.add_argument('--rows', type=int, default=500, help='Random profiles to run')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    parser.add_argument('--check', action='store_true', help='Exit 1 when a stage exceeds its budget')
+    parser.add_argument('--gc', action='store_true', help='Also measure collections and pauses with the GC enabled')
+    parser.add_argument('--json', action='store_true', help='Print the raw JSON report')
+    args = parser.parse_args()
+
+    payloads = random_profiles(args.rows, args.seed)
+    report = profile_corpus(payloads)
+    pressure = gc_pressure(payloads) if args.gc else None
+    failures = check_budgets(report) if args.check else []
+
+    if args.json:
+        print(json.dumps({'stages': report, 'gc': pressure, 'failures': failures}, indent=2))
+    else:
+        print(f'Allocations per request over {len(payloads)} profiles')
+        print_report(report)
+        if pressure:
+            print(f"  GC: {pressure['collections_per_1000']} collections and {pressure['pause_ms_per_1000']} ms "
+                  f"paused per 1000 requests (max pause {pressure['max_pause_ms']} ms)")
+        for failure in failures:
+            print(f'  FAIL {failure}')
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,241 @@
+"""
+Professional Fashion Sizing API - Size Analytics
+Streaming demand counters and histogram sketches of recommended sizes, body
+types and measurements, kept in a fixed ring of time buckets
+"""
+
+import math
+import threading
+import time
+from array import array
+
+from flask import Blueprint, request
+
+from negotiation import render
+
+GARMENTS = ['top', 'bottom']
+GENDERS = ['homme', 'femme']
+SKETCHED_MEASUREMENTS = {
+    # name: (low, high, bin width) in centimetres
+    'poitrine': (50, 160, 0.5),
+    'epaules': (25, 70, 0.5),
+    'bassin': (40, 150, 0.5),
+    'hanches': (60, 160, 0.5),
+    'abdomen': (40, 160, 0.5),
+    'height': (120, 220, 1.0)
+}
+QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+OTHER = 'other'
+
+
+class HistogramSketch:
+    """Fixed-bin histogram with quantile estimates; memory depends only on the range"""
+
+    def __init__(self, low, high, bin_width):
+        self.low = low
+        self.high = high
+        self.bin_width = bin_width
+        self.bins = array('I', [0]) * int(math.ceil((high - low) / bin_width))
+        self.count = 0
+        self.total = 0.0
+        self.underflow = 0
+        self.overflow = 0
+
+    def add(self, value):
+        if not math.isfinite(value):
+            return
+        self.count += 1
+        self.total += value
+        if value < self.low:
+            self.underflow += 1
+        elif value >= self.high:
+            self.overflow += 1
+        else:
+            self.bins[int((value - self.low) / self.bin_width)] += 1
+
+    def merge(self, other):
+        for index, count in enumerate(other.bins):
+            if count:
+                self.bins[index] += count
+        self.count += other.count
+        self.total += other.total
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+
+    def quantile(self, q):
+        """Value below which a fraction q of the samples fall, interpolated within its bin"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = self.underflow
+        if rank <= seen:
+            return self.low
+        for index, count in enumerate(self.bins):
+            if count and seen + count >= rank:
+                return round(self.low + (index + (rank - seen) / count) * self.bin_width, 2)
+            seen += count
+        return self.high
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 2) if self.count else None,
+            'quantiles': {f'p{int(q * 100)}': self.quantile(q) for q in QUANTILES},
+            'out_of_range': self.underflow + self.overflow
+        }
+
+
+class _Bucket:
+    """Counters of one time window"""
+
+    def __init__(self, window_id):
+        self.window_id = window_id
+        self.requests = 0
+        # (brand, gender, garment) -> {size: count}
+        self.sizes = {}
+        # (gender, body type) -> count
+        self.body_types = {}
+        # (gender, measurement) -> HistogramSketch, created on first use
+        self.measurements = {}
+
+
+class SizeAnalytics:
+    """
+    Live size-distribution analytics over a ring of time buckets
+    Each recommendation is O(1) to record. Brands outside the known set and
+    genders other than homme/femme are folded into 'other', so the number of
+    counters, like the number of buckets, is bounded.
+    """
+
+    def __init__(self, known_brands, window_seconds=300, windows=12):
+        self.known_brands = set(known_brands)
+        self.window_seconds = window_seconds
+        self.windows = windows
+        self._buckets = [None] * windows
+        self._lock = threading.Lock()
+
+    def _bucket(self, now):
+        window_id = int(now // self.window_seconds)
+        slot = window_id % self.windows
+        bucket = self._buckets[slot]
+        if bucket is None or bucket.window_id != window_id:
+            bucket = self._buckets[slot] = _Bucket(window_id)
+        return bucket
+
+    def _normalize(self, data):
+        brand = (data.get('brand') or '').lower()
+        if brand and brand not in self.known_brands:
+            brand = OTHER
+        gender = str(data.get('gender', '')).lower()
+        return brand or 'none', gender if gender in GENDERS else OTHER
+
+    def record(self, data, recommendation, now=None):
+        """Count one recommendation payload and its result"""
+        brand, gender = self._normalize(data)
+        measurements = data.get('measurements') or {}
+        sizes = recommendation['sizes']
+        # Per-brand demand is for the brand-adjusted size the customer was shown
+        brand_sizes = recommendation.get('brand_recommendations') or {}
+        body_type = recommendation['body_analysis']['classification']['type']
+
+        with self._lock:
+            bucket = self._bucket(time.time() if now is None else now)
+            bucket.requests += 1
+            for garment in GARMENTS:
+                size = (brand_sizes.get(garment) or sizes[garment]).get('size')
+                if size is None:
+                    continue
+                counts = bucket.sizes.setdefault((brand, gender, garment), {})
+                counts[size] = counts.get(size, 0) + 1
+            key = (gender, body_type)
+            bucket.body_types[key] = bucket.body_types.get(key, 0) + 1
+            for name, bounds in SKETCHED_MEASUREMENTS.items():
+                value = data.get('height') if name == 'height' else measurements.get(name)
+                if (not isinstance(value, (int, float)) or isinstance(value, bool)
+                        or not math.isfinite(value) or value <= 0):
+                    continue
+                sketch = bucket.measurements.get((gender, name))
+                if sketch is None:
+                    sketch = bucket.measurements[(gender, name)] = HistogramSketch(*bounds)
+                sketch.add(value)
+
+    def _recent(self, windows, now):
+        current = int(now // self.window_seconds)
+        oldest = current - min(windows, self.windows) + 1
+        return [bucket for bucket in self._buckets
+                if bucket is not None and oldest <= bucket.window_id <= current]
+
+    def snapshot(self, windows=None, brand=None, gender=None, now=None):
+        """Demand curves, body types and measurement quantiles over the last windows"""
+        now = time.time() if now is None else now
+        windows = self.windows if windows is None else max(1, windows)
+        brand = brand.lower() if brand else None
+        gender = gender.lower() if gender else None
+
+        demand = {}
+        body_types = {}
+        sketches = {}
+        timeline = []
+        with self._lock:
+            buckets = sorted(self._recent(windows, now), key=lambda b: b.window_id)
+            for bucket in buckets:
+                timeline.append({
+                    'start': bucket.window_id * self.window_seconds,
+                    'requests': bucket.requests
+                })
+                for (size_brand, size_gender, garment), counts in bucket.sizes.items():
+                    if (brand and size_brand != brand) or (gender and size_gender != gender):
+                        continue
+                    curve = demand.setdefault(size_brand, {}).setdefault(size_gender, {}).setdefault(garment, {})
+                    for size, count in counts.items():
+                        curve[size] = curve.get(size, 0) + count
+                for (type_gender, body_type), count in bucket.body_types.items():
+                    if gender and type_gender != gender:
+                        continue
+                    by_gender = body_types.setdefault(type_gender, {})
+                    by_gender[body_type] = by_gender.get(body_type, 0) + count
+                for (sketch_gender, name), sketch in bucket.measurements.items():
+                    if gender and sketch_gender != gender:
+                        continue
+                    merged = sketches.get((sketch_gender, name))
+                    if merged is None:
+                        merged = sketches[(sketch_gender, name)] = HistogramSketch(
+                            sketch.low, sketch.high, sketch.bin_width)
+                    merged.merge(sketch)
+
+        measurements = {}
+        for (sketch_gender, name), sketch in sketches.items():
+            measurements.setdefault(sketch_gender, {})[name] = sketch.to_dict()
+
+        return {
+            'window_seconds': self.window_seconds,
+            'windows': windows,
+            'requests': sum(entry['requests'] for entry in timeline),
+            'timeline': timeline,
+            'size_demand': demand,
+            'body_types': body_types,
+            'measurements': measurements
+        }
+
+    def get_metrics(self):
+        with self._lock:
+            live = [bucket for bucket in self._buckets if bucket is not None]
+            return {
+                'buckets': len(live),
+                'window_seconds': self.window_seconds,
+                'recorded': sum(bucket.requests for bucket in live)
+            }
+
+
+def create_analytics_blueprint(analytics):
+    """Flask route for live size analytics"""
+    bp = Blueprint('analytics', __name__)
+
+    @bp.route('/api/analytics', methods=['GET'])
+    def get_analytics():
+        """Size demand curves per brand, gender and garment over recent time windows"""
+        windows = request.args.get('windows', type=int)
+        data = analytics.snapshot(windows, request.args.get('brand'), request.args.get('gender'))
+        return render({'success': True, 'data': data})
+
+    return bp
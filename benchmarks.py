@@ -0,0 +1,297 @@
+"""
+Professional Fashion Sizing API - Benchmarks
+Startup and request benchmarks for the sizing engine and API servers
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Default measurements submitted by the index.html form
+SAMPLE_PAYLOAD = {
+    'measurements': {'poitrine': 95, 'epaules': 45, 'bassin': 85, 'hanches': 95},
+    'fit_preferences': {'poitrine': 'standard', 'epaules': 'cintre', 'bassin': 'standard', 'hanches': 'standard'},
+    'gender': 'homme',
+    'height': 175,
+    'morphotype': 'normal',
+    'brand': 'zara'
+}
+
+# Runs in a fresh interpreter: import and build the server, answer one request
+STARTUP_PROBE = """
+import json, sys, time
+began = time.perf_counter()
+import {module} as server
+app = server.create_app()
+imported = time.perf_counter()
+response = app.test_client().post('/api/recommend', json=json.loads(sys.argv[1]))
+answered = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({{'import_ms': (imported - began) * 1000, 'request_ms': (answered - imported) * 1000}}), flush=True)
+"""
+
+
+# Runs in a fresh interpreter: import one module and report what it pulled in
+IMPORT_PROBE = """
+import json, sys, time
+before = set(sys.modules)
+began = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - began
+loaded = sorted(set(sys.modules) - before)
+print(json.dumps({{'import_ms': elapsed * 1000, 'modules': loaded}}), flush=True)
+"""
+
+# Import budget of the standalone engine module
+ENGINE_IMPORT_BUDGET_MS = 50.0
+WEB_FRAMEWORK_MODULES = ['flask', 'flask_cors', 'werkzeug']
+
+# CPU the always-on sampling profiler may take from request handling
+PROFILER_OVERHEAD_BUDGET_PCT = 1.0
+
+
+def _summary(values):
+    return {
+        'median': round(statistics.median(values), 2),
+        'min': round(min(values), 2),
+        'max': round(max(values), 2)
+    }
+
+
+def bench_startup(module='api', snapshot=None, runs=5):
+    """Time-to-first-response of a cold server process"""
+    env = dict(os.environ)
+    env.pop('SIZING_SNAPSHOT', None)
+    if snapshot:
+        env['SIZING_SNAPSHOT'] = snapshot
+
+    samples = {'first_response_ms': [], 'import_ms': [], 'request_ms': []}
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, '-c', STARTUP_PROBE.format(module=module), json.dumps(SAMPLE_PAYLOAD)],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        line = process.stdout.readline()
+        first_response = (time.perf_counter() - started) * 1000
+        process.wait()
+        if process.returncode != 0 or not line:
+            raise RuntimeError(f'Startup probe for {module} failed with exit code {process.returncode}')
+
+        probe = json.loads(line)
+        samples['first_response_ms'].append(first_response)
+        samples['import_ms'].append(probe['import_ms'])
+        samples['request_ms'].append(probe['request_ms'])
+
+    return {
+        'module': module,
+        'snapshot': snapshot,
+        'runs': runs,
+        **{name: _summary(values) for name, values in samples.items()}
+    }
+
+
+def bench_import(module='engine', runs=5):
+    """Import time of a module in a fresh interpreter"""
+    samples = []
+    loaded = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, '-c', IMPORT_PROBE.format(module=module)],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout
+        probe = json.loads(output)
+        samples.append(probe['import_ms'])
+        loaded = probe['modules']
+
+    return {
+        'module': module,
+        'runs': runs,
+        'import_ms': _summary(samples),
+        'module_count': len(loaded),
+        'web_framework_modules': [name for name in loaded if name in WEB_FRAMEWORK_MODULES]
+    }
+
+
+def bench_profiler(hz, rounds=40, seconds=0.25):
+    """
+    Engine throughput with the sampling profiler off and on
+    Each round measures both, in alternating order so drift affects them
+    alike; the overhead is the median over rounds of on against off. The
+    profiler's own duty cycle is reported alongside.
+    """
+    from engine import ProfessionalSizeRecommendationEngine
+    from sampling_profiler import SamplingProfiler
+
+    engine = ProfessionalSizeRecommendationEngine()
+    for _ in range(200):
+        engine.recommend_size(SAMPLE_PAYLOAD)
+
+    def throughput():
+        calls = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for _ in range(50):
+                engine.recommend_size(SAMPLE_PAYLOAD)
+            calls += 50
+        return calls / seconds
+
+    profiler = SamplingProfiler(hz=hz)
+    samples = {'off': [], 'on': []}
+    for round_index in range(rounds):
+        for state in (('off', 'on') if round_index % 2 == 0 else ('on', 'off')):
+            if state == 'off':
+                samples['off'].append(throughput())
+                continue
+            profiler.start()
+            samples['on'].append(throughput())
+            metrics = profiler.get_metrics()
+            profiler.stop()
+
+    overheads = [(1 - on / off) * 100 for off, on in zip(samples['off'], samples['on'])]
+    spread = statistics.median(abs(value - statistics.median(overheads)) for value in overheads)
+    return {
+        'hz': hz,
+        'rounds': rounds,
+        'throughput_off_rps': _summary(samples['off']),
+        'throughput_on_rps': _summary(samples['on']),
+        'round_overhead_pct': _summary(overheads),
+        'throughput_overhead_pct': round(statistics.median(overheads), 2),
+        # Standard error of the median, from the rounds' spread (MAD)
+        'overhead_stderr_pct': round(1.253 * 1.4826 * spread / len(overheads) ** 0.5, 2),
+        'sampling_overhead_pct': metrics['overhead_pct'],
+        'samples': metrics['samples']
+    }
+
+
+def bench_parallel(rows=20000, workers=(1, 2, 4), shared_tables=False):
+    """
+    Batch throughput of ParallelBatchScorer by worker count
+    Speedup is against scoring the same payloads in this process and
+    efficiency is speedup per worker; encode_rps is the input encoding done
+    in this process, which bounds the speedup of any worker count.
+    """
+    from engine import ProfessionalSizeRecommendationEngine
+    from parallel import ParallelBatchScorer, encode_payloads, score_payload
+    from vectorized import random_profiles
+
+    payloads = random_profiles(rows, 0)
+    engine = ProfessionalSizeRecommendationEngine()
+    began = time.perf_counter()
+    for payload in payloads:
+        score_payload(engine, payload)
+    serial_rps = rows / (time.perf_counter() - began)
+
+    began = time.perf_counter()
+    encode_payloads(payloads)
+    encode_rps = rows / (time.perf_counter() - began)
+
+    by_workers = {}
+    for count in workers:
+        with ParallelBatchScorer(max_workers=count, shared_tables=shared_tables) as scorer:
+            # Start the workers and calibrate the chunk size outside the timing
+            scorer.score(payloads[:count * 200])
+            began = time.perf_counter()
+            scorer.score(payloads)
+            rps = rows / (time.perf_counter() - began)
+        by_workers[count] = {
+            'rows_per_sec': round(rps, 1),
+            'speedup': round(rps / serial_rps, 2),
+            'efficiency': round(rps / serial_rps / count, 2)
+        }
+
+    return {
+        'rows': rows,
+        'cpu_count': os.cpu_count(),
+        'shared_tables': shared_tables,
+        'serial_rows_per_sec': round(serial_rps, 1),
+        'encode_rows_per_sec': round(encode_rps, 1),
+        'workers': by_workers
+    }
+
+
+def _print_report(title, report):
+    print(title)
+    for name, value in report.items():
+        if isinstance(value, dict):
+            print(f"  {name:<20} median {value['median']:>9.2f}  min {value['min']:>9.2f}  max {value['max']:>9.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Sizing engine and API benchmarks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    startup = subparsers.add_parser('startup', help='Cold-start time to first response')
+    startup.add_argument('--module', default='api', choices=['api', 'app'], help='Server module to start')
+    startup.add_argument('--snapshot', help='Engine snapshot to load (SIZING_SNAPSHOT)')
+    startup.add_argument('--runs', type=int, default=5, help='Number of cold starts')
+    startup.add_argument('--json', action='store_true', help='Print the raw JSON report')
+
+    import_time = subparsers.add_parser('import', help='Import time of the engine module against its budget')
+    import_time.add_argument('--module', default='engine', help='Module to import')
+    import_time.add_argument('--runs', type=int, default=5, help='Number of fresh interpreters')
+    import_time.add_argument('--budget-ms', type=float, default=ENGINE_IMPORT_BUDGET_MS,
+                             help='Median import time budget')
+
+    profiler = subparsers.add_parser('profiler', help='Overhead of the sampling profiler against its budget')
+    profiler.add_argument('--hz', type=float, default=None, help='Sampling rate (defaults to the server default)')
+    profiler.add_argument('--rounds', type=int, default=40, help='Rounds of one off and one on measurement')
+    profiler.add_argument('--seconds', type=float, default=0.25, help='Length of each measurement')
+    profiler.add_argument('--budget-pct', type=float, default=PROFILER_OVERHEAD_BUDGET_PCT,
+                          help='Overhead budget in percent')
+
+    parallel = subparsers.add_parser('parallel', help='Parallel batch scoring throughput by worker count')
+    parallel.add_argument('--rows', type=int, default=20000, help='Payloads per batch')
+    parallel.add_argument('--workers', default='1,2,4', help='Comma-separated worker counts')
+    parallel.add_argument('--shared-tables', action='store_true', help='Workers attach to shared-memory tables')
+    parallel.add_argument('--json', action='store_true', help='Print the raw JSON report')
+
+    args = parser.parse_args()
+    if args.command == 'parallel':
+        report = bench_parallel(args.rows, [int(count) for count in args.workers.split(',')], args.shared_tables)
+        if args.json:
+            print(json.dumps(report, indent=2))
+            sys.exit(0)
+        print(f"Parallel batch scoring of {report['rows']} rows on {report['cpu_count']} CPUs")
+        print(f"  one process       {report['serial_rows_per_sec']:>10.1f} rows/s")
+        print(f"  input encoding    {report['encode_rows_per_sec']:>10.1f} rows/s")
+        for count, result in report['workers'].items():
+            print(f"  {count:>3} workers       {result['rows_per_sec']:>10.1f} rows/s  "
+                  f"speedup {result['speedup']:>5.2f}  efficiency {result['efficiency']:>4.2f}")
+    elif args.command == 'profiler':
+        from sampling_profiler import DEFAULT_HZ
+        report = bench_profiler(args.hz or DEFAULT_HZ, args.rounds, args.seconds)
+        _print_report(f"Sampling profiler at {report['hz']} Hz ({report['samples']} samples)", report)
+        print(f"  throughput overhead {report['throughput_overhead_pct']:>6.2f}% "
+              f"(± {report['overhead_stderr_pct']:.2f}%)  sampling duty cycle {report['sampling_overhead_pct']:>6.4f}%")
+        failures = []
+        if report['throughput_overhead_pct'] > args.budget_pct:
+            failures.append(f"median throughput overhead {report['throughput_overhead_pct']}% exceeds {args.budget_pct}%")
+        if report['sampling_overhead_pct'] > args.budget_pct:
+            failures.append(f"sampling takes {report['sampling_overhead_pct']}% of CPU, over {args.budget_pct}%")
+        for failure in failures:
+            print(f'  FAIL {failure}')
+        sys.exit(1 if failures else 0)
+    elif args.command == 'import':
+        report = bench_import(args.module, args.runs)
+        _print_report(f"Import of {args.module} ({report['module_count']} modules loaded)", report)
+        failures = []
+        if report['import_ms']['median'] > args.budget_ms:
+            failures.append(f"median import time {report['import_ms']['median']} ms exceeds {args.budget_ms} ms")
+        if report['web_framework_modules']:
+            failures.append(f"web framework imported: {', '.join(report['web_framework_modules'])}")
+        for failure in failures:
+            print(f'  FAIL {failure}')
+        sys.exit(1 if failures else 0)
+    elif args.command == 'startup':
+        report = bench_startup(args.module, args.snapshot, args.runs)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            _print_report(f"Startup of {args.module} ({'snapshot' if args.snapshot else 'literal tables'})", report)
@@ -0,0 +1,405 @@
+"""
+Professional Fashion Sizing API - Size Chart Optimizer
+Computes size-chart breakpoints for a measurement population that minimize
+the squared out-of-range penalty used by find_best_top_size and
+find_best_bottom_size, from streamed histograms of any number of rows
+"""
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+LETTER_SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL', 'XXXL', '4XL', '5XL']
+
+# Garment: (chart attribute suffix, primary dimension and column, secondary dimension and column)
+GARMENTS = {
+    'top': ('top_sizes', ('chest', 'poitrine'), ('shoulders', 'epaules')),
+    'bottom': ('bottom_sizes', ('waist', 'bassin'), ('hips', 'hanches'))
+}
+CHART_PREFIXES = {'homme': 'men', 'femme': 'women'}
+
+# Weight of the secondary penalty in the engine's score, as in
+# find_best_top_size (shoulders) and find_best_bottom_size (hips)
+SECONDARY_WEIGHTS = {'top': 0.3, 'bottom': 1.0}
+
+# Printed with every optimized chart
+OPTIMIZER_LIMITS = [
+    'Breakpoints are optimized on the primary dimension only; secondary ranges are fitted per size afterwards.',
+    'Measurements are raw body sizes: the fit ease and morphotype offsets the engine adds before matching are '
+    'not modelled.'
+]
+
+# Weight of the within-size spread against the out-of-range penalty; small, so
+# it only decides between charts that leave about as many customers outside
+SPREAD_WEIGHT = 1e-3
+
+# Histogram extent per dimension in centimetres
+DIMENSION_BOUNDS = {
+    'chest': (60, 160),
+    'shoulders': (30, 70),
+    'waist': (45, 155),
+    'hips': (65, 170)
+}
+
+
+class JointHistogram:
+    """
+    Streaming 2-D histogram of a primary and a secondary measurement
+    Memory depends only on the bounds and resolution, not on the row count.
+    Values outside the bounds are clamped into the edge bins; rows without
+    a secondary value are kept in a separate column.
+    """
+
+    def __init__(self, primary_bounds, secondary_bounds, resolution=0.1):
+        self.resolution = resolution
+        self.primary_low = primary_bounds[0]
+        self.secondary_low = secondary_bounds[0]
+        self.primary_bins = int(round((primary_bounds[1] - primary_bounds[0]) / resolution))
+        self.secondary_bins = int(round((secondary_bounds[1] - secondary_bounds[0]) / resolution))
+        # The extra trailing column counts rows whose secondary value is missing
+        self.counts = np.zeros((self.primary_bins, self.secondary_bins + 1), dtype=np.int64)
+        self.rows = 0
+
+    def _bin(self, values, low, bins):
+        return np.clip(((values - low) / self.resolution).astype(np.int64), 0, bins - 1)
+
+    def add(self, primary, secondary):
+        """Count one chunk of rows; rows without a positive primary value are skipped"""
+        primary = np.asarray(primary, dtype=np.float64)
+        secondary = np.asarray(secondary, dtype=np.float64)
+        valid = primary > 0
+        primary = primary[valid]
+        secondary = secondary[valid]
+
+        rows = self._bin(primary, self.primary_low, self.primary_bins)
+        columns = self._bin(np.nan_to_num(secondary, nan=self.secondary_low), self.secondary_low,
+                            self.secondary_bins)
+        columns = np.where(secondary > 0, columns, self.secondary_bins)
+        flat = np.bincount(rows * (self.secondary_bins + 1) + columns, minlength=self.counts.size)
+        self.counts += flat.reshape(self.counts.shape)
+        self.rows += len(primary)
+
+    def primary_centers(self):
+        return self.primary_low + (np.arange(self.primary_bins) + 0.5) * self.resolution
+
+    def secondary_centers(self):
+        return self.secondary_low + (np.arange(self.secondary_bins) + 0.5) * self.resolution
+
+
+class _PenaltySums:
+    """Prefix sums of a 1-D histogram for O(1) squared out-of-range penalties"""
+
+    def __init__(self, centers, counts):
+        self.centers = centers
+        counts = counts.astype(np.float64)
+        self.s0 = np.concatenate([[0.0], np.cumsum(counts)])
+        self.s1 = np.concatenate([[0.0], np.cumsum(counts * centers)])
+        self.s2 = np.concatenate([[0.0], np.cumsum(counts * centers ** 2)])
+
+    def index(self, values):
+        """Number of bin centers strictly below each value"""
+        return np.searchsorted(self.centers, values, side='left')
+
+    def squared_distance(self, start, stop, anchor):
+        """Sum of count * (x - anchor)^2 over bins [start, stop)"""
+        s0 = self.s0[stop] - self.s0[start]
+        s1 = self.s1[stop] - self.s1[start]
+        s2 = self.s2[stop] - self.s2[start]
+        return np.maximum(s2 - 2 * anchor * s1 + anchor ** 2 * s0, 0.0)
+
+    def below(self, value):
+        """Penalty of the points below value against a range starting there"""
+        return self.squared_distance(0, self.index(value), value)
+
+    def above(self, value):
+        """Penalty of the points above value against a range ending there"""
+        return self.squared_distance(np.searchsorted(self.centers, value, side='right'),
+                                     len(self.centers), value)
+
+
+def optimal_ranges(centers, counts, sizes, max_width, min_width=None, step=0.5, spread_weight=SPREAD_WEIGHT):
+    """
+    K contiguous ranges minimizing the total squared out-of-range penalty
+    The ranges partition [b0, bK] on a grid of `step`, each between
+    min_width and max_width wide, so nobody inside falls between two sizes;
+    the penalty comes from the customers beyond the outer ranges. Among
+    placements of (nearly) equal penalty, a 1-D k-means term weighted by
+    spread_weight prefers sizes centred on the customers they serve.
+    Dynamic programming over breakpoints: O(sizes * breakpoints * widths)
+    work, with the data reduced to the histogram.
+    """
+    occupied = np.flatnonzero(counts)
+    if not len(occupied):
+        raise ValueError('The population has no valid measurements')
+    min_width = max_width / 2 if min_width is None else min_width
+    if not 0 < min_width <= max_width:
+        raise ValueError(f'Invalid range widths: {min_width} to {max_width}')
+    sums = _PenaltySums(centers, counts)
+
+    first = np.floor((centers[occupied[0]] - max_width) / step) * step
+    last = np.ceil((centers[occupied[-1]] + max_width) / step) * step
+    breakpoints = np.arange(first, last + step / 2, step)
+    index = sums.index(breakpoints)
+    widths = range(max(1, int(round(min_width / step))), int(round(max_width / step)) + 1)
+
+    # spread[d][j]: k-means term of the range ending at breakpoints[j] that is d steps wide
+    spread = {}
+    for d in widths:
+        mid = breakpoints[d:] - d * step / 2
+        spread[d] = np.concatenate([np.full(d, np.inf),
+                                    spread_weight * sums.squared_distance(index[:-d], index[d:], mid)])
+
+    cost = sums.below(breakpoints)
+    choices = []
+    for _ in range(sizes):
+        best = np.full(len(breakpoints), np.inf)
+        choice = np.zeros(len(breakpoints), dtype=np.int64)
+        for d in widths:
+            total = np.concatenate([np.full(d, np.inf), cost[:-d]]) + spread[d]
+            better = total < best
+            best = np.where(better, total, best)
+            choice = np.where(better, d, choice)
+        choices.append(choice)
+        cost = best
+
+    cost = cost + sums.above(breakpoints)
+    position = int(np.argmin(cost))
+    if not np.isfinite(cost[position]):
+        raise ValueError(f'{sizes} sizes of {min_width} to {max_width} do not fit the measurement range')
+
+    ranges = []
+    for choice in reversed(choices):
+        start = position - int(choice[position])
+        ranges.append((float(breakpoints[start]), float(breakpoints[position])))
+        position = start
+    ranges.reverse()
+    return ranges
+
+
+def _squared_outside(values, value_range):
+    lo, hi = value_range
+    return np.where(values < lo, (lo - values) ** 2, np.where(values > hi, (values - hi) ** 2, 0.0))
+
+
+def _assign(centers, ranges):
+    """Index of the nearest range for every bin center"""
+    lo = np.array([r[0] for r in ranges])
+    hi = np.array([r[1] for r in ranges])
+    values = centers[:, None]
+    distance = np.where(values < lo, lo - values, np.where(values > hi, values - hi, 0.0))
+    return np.argmin(distance, axis=1)
+
+
+def _round_range(value_range, step):
+    def clean(value):
+        value = round(round(value / step) * step, 2)
+        return int(value) if float(value).is_integer() else value
+    return (clean(value_range[0]), clean(value_range[1]))
+
+
+def default_labels(engine, gender, garment, sizes):
+    """Size labels in the style of the engine's existing chart"""
+    chart = getattr(engine, f"{CHART_PREFIXES[gender]}_{GARMENTS[garment][0]}")
+    first = next(iter(chart))
+    if first.isdigit():
+        return [str(int(first) + 2 * index) for index in range(sizes)]
+    offset = LETTER_SIZES.index(first) if first in LETTER_SIZES else 0
+    labels = LETTER_SIZES[offset:offset + sizes]
+    if len(labels) < sizes:
+        raise ValueError(f'No default labels for {sizes} sizes, pass labels explicitly')
+    return labels
+
+
+def chart_widths(engine, gender, garment):
+    """Narrowest and widest range of each dimension in the engine's existing chart"""
+    chart = getattr(engine, f"{CHART_PREFIXES[gender]}_{GARMENTS[garment][0]}")
+    widths = {}
+    for dimension in [GARMENTS[garment][1][0], GARMENTS[garment][2][0]]:
+        values = [ranges[dimension][1] - ranges[dimension][0] for ranges in chart.values() if dimension in ranges]
+        widths[dimension] = (float(min(values)), float(max(values)))
+    return widths
+
+
+def optimize_chart(histogram, garment, sizes, labels, primary_width, secondary_width, step=0.5,
+                   primary_min_width=None):
+    """
+    Chart with `sizes` sizes for a population histogram
+    The primary dimension (chest, waist) gets globally optimal contiguous
+    breakpoints; each size's secondary range (shoulders, hips) is then fitted
+    to the customers that size serves. See OPTIMIZER_LIMITS for what the
+    optimization does not model.
+    """
+    primary, secondary = GARMENTS[garment][1][0], GARMENTS[garment][2][0]
+    if len(labels) != sizes:
+        raise ValueError(f'Expected {sizes} labels, got {len(labels)}')
+
+    primary_centers = histogram.primary_centers()
+    primary_counts = histogram.counts.sum(axis=1)
+    ranges = optimal_ranges(primary_centers, primary_counts, sizes, primary_width, primary_min_width, step)
+
+    assignment = _assign(primary_centers, ranges)
+    secondary_centers = histogram.secondary_centers()
+    chart = {}
+    for index, (label, primary_range) in enumerate(zip(labels, ranges)):
+        entry = {primary: _round_range(primary_range, step)}
+        secondary_counts = histogram.counts[assignment == index, :-1].sum(axis=0)
+        if secondary_counts.any():
+            entry[secondary] = _round_range(
+                optimal_ranges(secondary_centers, secondary_counts, 1, secondary_width, secondary_width, step)[0],
+                step)
+        chart[label] = entry
+    return chart
+
+
+def evaluate_chart(histogram, garment, chart):
+    """
+    Penalty and between-sizes share of a chart against a population histogram
+    Every customer is scored as the engine scores them: the squared
+    out-of-range distance of the primary dimension plus the weighted one of
+    the secondary dimension, for the size with the lowest total. Rows
+    without a secondary value are scored on the primary dimension alone.
+    """
+    primary, secondary = GARMENTS[garment][1][0], GARMENTS[garment][2][0]
+    primary_centers = histogram.primary_centers()[:, None]
+    secondary_centers = histogram.secondary_centers()[None, :]
+
+    best = np.full(histogram.counts.shape, np.inf)
+    for ranges in chart.values():
+        primary_penalty = _squared_outside(primary_centers, ranges[primary])
+        penalty = np.zeros(histogram.counts.shape)
+        if secondary in ranges:
+            penalty[:, :-1] = SECONDARY_WEIGHTS[garment] * _squared_outside(secondary_centers, ranges[secondary])
+        best = np.minimum(best, penalty + primary_penalty)
+
+    counts = histogram.counts
+    rows = counts.sum()
+    return {
+        'total_penalty': float((best * counts).sum()),
+        'mean_penalty': round(float((best * counts).sum() / rows), 4) if rows else 0.0,
+        'between_sizes_share': round(float(counts[best > 0].sum() / rows), 4) if rows else 0.0
+    }
+
+
+def new_histogram(garment, resolution=0.1):
+    primary, secondary = GARMENTS[garment][1][0], GARMENTS[garment][2][0]
+    return JointHistogram(DIMENSION_BOUNDS[primary], DIMENSION_BOUNDS[secondary], resolution)
+
+
+def histogram_from_parquet(path, garment, gender, resolution=0.1, batch_size=1000000):
+    """Stream a Parquet file of measurements into a histogram for one gender"""
+    try:
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError('Reading Parquet requires pyarrow: pip install pyarrow')
+
+    primary_column, secondary_column = GARMENTS[garment][1][1], GARMENTS[garment][2][1]
+    histogram = new_histogram(garment, resolution)
+    source = pq.ParquetFile(path)
+    names = source.schema_arrow.names
+    wanted = [name for name in [primary_column, secondary_column, 'gender'] if name in names]
+    if primary_column not in names:
+        raise ValueError(f'Missing required column: {primary_column}')
+
+    for batch in source.iter_batches(batch_size=batch_size, columns=wanted):
+        if 'gender' in wanted:
+            keep = pc.fill_null(pc.equal(pc.utf8_lower(batch.column(wanted.index('gender'))), gender), False)
+            batch = batch.filter(keep)
+
+        def column(name):
+            if name not in wanted:
+                return np.full(batch.num_rows, np.nan)
+            return batch.column(wanted.index(name)).cast('float64').to_numpy(zero_copy_only=False)
+
+        histogram.add(column(primary_column), column(secondary_column))
+    return histogram
+
+
+def histogram_from_synthetic(rows, garment, gender, seed=0, resolution=0.1, chunk_rows=1000000):
+    """Histogram of a synthetic population generated in chunks (see forecast.py)"""
+    from forecast import DEFAULT_DISTRIBUTION, synthesize_population
+
+    primary_column, secondary_column = GARMENTS[garment][1][1], GARMENTS[garment][2][1]
+    distribution = dict(DEFAULT_DISTRIBUTION, genders={gender: DEFAULT_DISTRIBUTION['genders'][gender]})
+    histogram = new_histogram(garment, resolution)
+    for chunk, offset in enumerate(range(0, rows, chunk_rows)):
+        columns = synthesize_population(distribution, min(chunk_rows, rows - offset), seed + chunk)
+        histogram.add(columns[primary_column], columns[secondary_column])
+    return histogram
+
+
+def format_chart(name, chart):
+    """Chart as a Python literal in the style of the engine's size tables"""
+    lines = [f'{name} = {{']
+    for label, ranges in chart.items():
+        body = ', '.join(f"'{dimension}': {value}" for dimension, value in ranges.items())
+        lines.append(f"    '{label}': {{{body}}},")
+    lines[-1] = lines[-1].rstrip(',')
+    lines.append('}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Optimize size-chart breakpoints for a population')
+    parser.add_argument('--garment', choices=list(GARMENTS), default='top', help='Chart to optimize')
+    parser.add_argument('--gender', choices=list(CHART_PREFIXES), default='homme', help='Population gender')
+    parser.add_argument('--sizes', type=int, help='Number of sizes (defaults to the current chart)')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--parquet', help='Parquet file of measurements (poitrine/epaules or bassin/hanches)')
+    source.add_argument('--synthetic', type=int, help='Size of a synthetic population instead of a file')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic population')
+    parser.add_argument('--width', type=float, help='Widest primary range (defaults to the current chart)')
+    parser.add_argument('--min-width', type=float, help='Narrowest primary range (defaults to the current chart)')
+    parser.add_argument('--secondary-width', type=float, help='Secondary range width (defaults to the current chart)')
+    parser.add_argument('--step', type=float, default=0.5, help='Breakpoint grid in centimetres')
+    parser.add_argument('--labels', help='Comma-separated size labels')
+    parser.add_argument('--json', action='store_true', help='Print a JSON report instead of a chart literal')
+    args = parser.parse_args()
+
+    from engine import ProfessionalSizeRecommendationEngine
+    engine = ProfessionalSizeRecommendationEngine()
+    primary_dimension, secondary_dimension = GARMENTS[args.garment][1][0], GARMENTS[args.garment][2][0]
+    widths = chart_widths(engine, args.gender, args.garment)
+    chart_name = f"{CHART_PREFIXES[args.gender]}_{GARMENTS[args.garment][0]}"
+    current = getattr(engine, chart_name)
+    sizes = args.sizes or len(current)
+
+    try:
+        if args.parquet:
+            population = histogram_from_parquet(args.parquet, args.garment, args.gender)
+        else:
+            population = histogram_from_synthetic(args.synthetic, args.garment, args.gender, args.seed)
+        labels = args.labels.split(',') if args.labels else default_labels(engine, args.gender, args.garment,
+                                                                           sizes)
+        max_width = args.width or widths[primary_dimension][1]
+        optimized = optimize_chart(population, args.garment, sizes, labels, max_width,
+                                   args.secondary_width or widths[secondary_dimension][1], args.step,
+                                   args.min_width or min(widths[primary_dimension][0], max_width))
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
+
+    report = {
+        'rows': population.rows,
+        'chart': optimized,
+        'optimized': evaluate_chart(population, args.garment, optimized),
+        'current': evaluate_chart(population, args.garment, current),
+        'limits': OPTIMIZER_LIMITS
+    }
+    # The point of a new chart is fewer customers between sizes; never emit one that has more
+    worse = report['optimized']['between_sizes_share'] > report['current']['between_sizes_share']
+    report['failures'] = ['more customers fall between sizes than with the current chart'] if worse else []
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_chart(chart_name, optimized))
+        for name in ['current', 'optimized']:
+            print(f"# {name:<9} mean penalty {report[name]['mean_penalty']:>8.4f}  "
+                  f"between sizes {report[name]['between_sizes_share']:.2%}  ({report['rows']} rows)")
+        for limit in OPTIMIZER_LIMITS:
+            print(f'# Note: {limit}')
+        for failure in report['failures']:
+            print(f'# FAIL {failure}')
+    sys.exit(1 if report['failures'] else 0)
@@ -0,0 +1,130 @@
+"""
+Professional Fashion Sizing API - Columnar Bulk Scoring
+Scores Arrow record batches and Parquet files column-wise with the
+vectorized engine, streaming row groups so memory stays bounded
+"""
+
+import argparse
+import logging
+
+import numpy as np
+
+from vectorized import VectorizedEngine
+
+logger = logging.getLogger(__name__)
+
+NUMERIC_COLUMNS = ['poitrine', 'epaules', 'bassin', 'hanches', 'abdomen', 'height']
+CATEGORY_COLUMNS = ['gender', 'morphotype', 'brand',
+                    'fit_poitrine', 'fit_epaules', 'fit_bassin', 'fit_hanches']
+PASSTHROUGH_COLUMNS = ['id']
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Columnar scoring requires pyarrow: pip install pyarrow')
+    return pyarrow
+
+
+def _numeric_column(column):
+    """Arrow numeric column as float64 with NaN for nulls"""
+    pa = _require_pyarrow()
+    column = column.cast(pa.float64())
+    return column.to_numpy(zero_copy_only=False)
+
+
+def _category_column(column):
+    """Arrow string column as (codes, categories) without per-row Python objects"""
+    pa = _require_pyarrow()
+    if not pa.types.is_dictionary(column.type):
+        column = column.dictionary_encode()
+    categories = column.dictionary.to_pylist() + [None]
+    codes = column.indices.fill_null(len(categories) - 1).to_numpy(zero_copy_only=False).astype(np.int32)
+    return codes, categories
+
+
+def _dictionary_output(codes, labels):
+    """(codes, labels) output as an Arrow dictionary array, -1 as null"""
+    pa = _require_pyarrow()
+    indices = pa.array(codes, type=pa.int32(), mask=codes < 0)
+    dictionary = pa.array([label if label is not None else '' for label in labels], type=pa.string())
+    return pa.DictionaryArray.from_arrays(indices, dictionary)
+
+
+def score_record_batch(vectorized_engine, batch, include_fitting=False):
+    """Score one Arrow record batch into a record batch of results"""
+    pa = _require_pyarrow()
+    names = set(batch.schema.names)
+    if 'gender' not in names:
+        raise ValueError('Missing required column: gender')
+
+    columns = {}
+    for name in NUMERIC_COLUMNS:
+        if name in names:
+            columns[name] = _numeric_column(batch.column(name))
+    for name in CATEGORY_COLUMNS:
+        if name in names:
+            columns[name] = _category_column(batch.column(name))
+
+    scores = vectorized_engine.score_columns(columns, include_fitting)
+
+    arrays = [batch.column(name) for name in PASSTHROUGH_COLUMNS if name in names]
+    fields = [name for name in PASSTHROUGH_COLUMNS if name in names]
+    for name in ['top_size', 'bottom_size', 'brand_top_size', 'brand_bottom_size', 'body_type']:
+        arrays.append(_dictionary_output(*scores[name]))
+        fields.append(name)
+    arrays.append(pa.array(scores['confidence'], type=pa.float64()))
+    fields.append('confidence')
+
+    if include_fitting:
+        for garment in ['top', 'bottom']:
+            arrays.append(_dictionary_output(*scores[f'{garment}_fit']))
+            arrays.append(pa.array(scores[f'{garment}_fit_precision'], type=pa.int16()))
+            difference = scores[f'{garment}_fit_difference']
+            arrays.append(pa.array(difference, type=pa.float64(), mask=np.isnan(difference)))
+            fields.extend([f'{garment}_fit', f'{garment}_fit_precision', f'{garment}_fit_difference'])
+        arrays.append(pa.array(scores['comfort_prediction'], type=pa.float64()))
+        arrays.append(_dictionary_output(*scores['overall_fit']))
+        fields.extend(['comfort_prediction', 'overall_fit'])
+
+    return pa.RecordBatch.from_arrays(arrays, names=fields)
+
+
+def score_parquet(engine, input_path, output_path, batch_size=65536, include_fitting=False):
+    """Stream a Parquet file of measurements into a Parquet file of results"""
+    pa = _require_pyarrow()
+    vectorized_engine = VectorizedEngine(engine)
+    source = pa.parquet.ParquetFile(input_path)
+    wanted = [name for name in NUMERIC_COLUMNS + CATEGORY_COLUMNS + PASSTHROUGH_COLUMNS
+              if name in source.schema_arrow.names]
+
+    writer = None
+    rows = 0
+    try:
+        for batch in source.iter_batches(batch_size=batch_size, columns=wanted):
+            result = score_record_batch(vectorized_engine, batch, include_fitting)
+            if writer is None:
+                writer = pa.parquet.ParquetWriter(output_path, result.schema)
+            writer.write_batch(result)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    logger.info(f"Scored {rows} rows from {input_path} into {output_path}")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Score a Parquet file of customer measurements')
+    parser.add_argument('input', help='Parquet file with measurement columns')
+    parser.add_argument('output', help='Parquet file to write results to')
+    parser.add_argument('--batch-size', type=int, default=65536, help='Rows per streamed batch')
+    parser.add_argument('--fitting', action='store_true', help='Add virtual fitting and comfort columns')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from engine import ProfessionalSizeRecommendationEngine
+    score_parquet(ProfessionalSizeRecommendationEngine(), args.input, args.output, args.batch_size, args.fitting)
@@ -0,0 +1,403 @@
+"""
+Professional Fashion Sizing API - Recommendation Event Log
+Buffers every recommendation in memory and flushes it in batches from a
+background thread to size- and time-rotated binary files, with a reader
+that memory-maps them as numpy record arrays
+"""
+
+import argparse
+import atexit
+import glob
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'SZEVLOG1'
+BLOCK_HEADER = struct.Struct('<4sII')
+STRINGS_BLOCK = b'STRS'
+RECORDS_BLOCK = b'RECS'
+MISSING = 0xFFFF
+# A file holds at most this many distinct strings; later ones are stored as missing
+MAX_STRINGS = MISSING - 1
+
+MEASUREMENTS = ['poitrine', 'epaules', 'bassin', 'hanches', 'abdomen']
+FIT_PREFERENCES = ['poitrine', 'epaules', 'bassin', 'hanches']
+STRING_FIELDS = ['gender', 'morphotype', 'brand'] + [f'fit_{name}' for name in FIT_PREFERENCES] + \
+    ['top_size', 'bottom_size', 'brand_top_size', 'brand_bottom_size', 'body_type']
+
+# One fixed-size record per recommendation; strings are ids into the file's string table
+RECORD_FIELDS = (
+    [('timestamp', '<f8'), ('latency_ms', '<f4')] +
+    [(name, '<f8') for name in MEASUREMENTS + ['height']] +
+    [(name, '<u2') for name in STRING_FIELDS] +
+    [('confidence', '<f8')]
+)
+# The writer packs records with struct, so serving never imports numpy
+RECORD_STRUCT = struct.Struct('<' + ''.join({'<f8': 'd', '<f4': 'f', '<u2': 'H'}[code] for _, code in RECORD_FIELDS))
+
+
+@lru_cache(maxsize=None)
+def record_dtype():
+    """numpy dtype of a record, for readers"""
+    import numpy as np
+    return np.dtype(RECORD_FIELDS)
+
+
+def _number(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return float('nan')
+
+
+class EventLog:
+    """
+    Buffered binary sink for recommendation events
+    record() only appends to an in-memory buffer; a background thread
+    encodes and writes batches. When the buffer is full, events are dropped
+    and counted instead of blocking the request.
+    """
+
+    def __init__(self, directory, buffer_size=65536, flush_interval=1.0, max_file_bytes=64 * 1024 * 1024,
+                 rotate_seconds=3600):
+        self.directory = directory
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.max_file_bytes = max_file_bytes
+        self.rotate_seconds = rotate_seconds
+        os.makedirs(directory, exist_ok=True)
+
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = None
+        self._write_lock = threading.Lock()
+        self._file = None
+        self._file_path = None
+        self._file_opened = 0.0
+        self._file_sequence = 0
+        self._strings = {}
+        self._counters = {'recorded': 0, 'dropped': 0, 'written': 0, 'flushes': 0, 'files': 0,
+                          'bytes_written': 0, 'write_errors': 0}
+
+    def _ensure_started(self):
+        # Started on first use so prefork servers get the thread in each worker
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='event-log-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def record(self, data, recommendation, latency_ms):
+        """Queue one recommendation; never blocks on I/O"""
+        sizes = recommendation['sizes']
+        brand = recommendation.get('brand_recommendations') or {}
+        event = (
+            time.time(), latency_ms, data,
+            sizes['top']['size'], sizes['bottom']['size'],
+            brand.get('top', {}).get('size'), brand.get('bottom', {}).get('size'),
+            recommendation['body_analysis']['classification']['type'],
+            recommendation['confidence']
+        )
+        with self._lock:
+            if self._thread is None:
+                self._ensure_started()
+            if len(self._buffer) >= self.buffer_size:
+                self._counters['dropped'] += 1
+                return False
+            self._buffer.append(event)
+            self._counters['recorded'] += 1
+            if len(self._buffer) >= self.buffer_size // 2:
+                self._wakeup.set()
+        return True
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def _string_id(self, value, new_strings):
+        if value is None:
+            return MISSING
+        value = str(value)
+        string_id = self._strings.get(value)
+        if string_id is None:
+            if len(self._strings) >= MAX_STRINGS:
+                return MISSING
+            string_id = self._strings[value] = len(self._strings)
+            new_strings.append(value)
+        return string_id
+
+    def _encode(self, events):
+        records = bytearray(RECORD_STRUCT.size * len(events))
+        new_strings = []
+        for row, (timestamp, latency, data, *outputs, confidence) in enumerate(events):
+            measurements = data.get('measurements') or {}
+            fit_preferences = data.get('fit_preferences') or {}
+            strings = [data.get('gender'), data.get('morphotype'), data.get('brand')]
+            strings += [fit_preferences.get(name) for name in FIT_PREFERENCES]
+            strings += outputs
+            RECORD_STRUCT.pack_into(
+                records, row * RECORD_STRUCT.size,
+                timestamp, latency,
+                *(_number(measurements.get(name)) for name in MEASUREMENTS),
+                _number(data.get('height')),
+                *(self._string_id(value, new_strings) for value in strings),
+                _number(confidence)
+            )
+        return records, new_strings
+
+    def _open_file(self):
+        self._file_sequence += 1
+        name = f"events-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._file_sequence:04d}.szev"
+        self._file_path = os.path.join(self.directory, name)
+        self._file = open(self._file_path, 'ab')
+        self._file.write(MAGIC)
+        self._file_opened = time.monotonic()
+        self._strings = {}
+        self._counters['files'] += 1
+
+    def _rotate_due(self):
+        return (self._file is None or self._file.tell() >= self.max_file_bytes or
+                time.monotonic() - self._file_opened >= self.rotate_seconds or
+                len(self._strings) >= MAX_STRINGS // 2)
+
+    def flush(self):
+        """Write everything buffered so far as one batch"""
+        with self._lock:
+            events, self._buffer = self._buffer, []
+        if not events:
+            return 0
+
+        with self._write_lock:
+            try:
+                if self._rotate_due():
+                    if self._file is not None:
+                        self._file.close()
+                    self._open_file()
+                records, new_strings = self._encode(events)
+                chunks = []
+                if new_strings:
+                    payload = json.dumps(new_strings).encode('utf-8')
+                    chunks += [BLOCK_HEADER.pack(STRINGS_BLOCK, len(new_strings), len(payload)), payload]
+                chunks += [BLOCK_HEADER.pack(RECORDS_BLOCK, len(events), len(records)), records]
+                body = b''.join(chunks)
+                self._file.write(body)
+                self._file.flush()
+            except Exception as e:
+                logger.error(f"Event log flush failed, dropping {len(events)} events: {str(e)}")
+                with self._lock:
+                    self._counters['write_errors'] += 1
+                    self._counters['dropped'] += len(events)
+                # Start a fresh file so a torn block is never followed by more data
+                if self._file is not None:
+                    try:
+                        self._file.close()
+                    except OSError:
+                        pass
+                self._file = None
+                return 0
+
+        with self._lock:
+            self._counters['written'] += len(events)
+            self._counters['flushes'] += 1
+            self._counters['bytes_written'] += len(body)
+        return len(events)
+
+    def close(self):
+        """Flush the buffer and stop the writer thread"""
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.flush()
+        with self._write_lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def get_metrics(self):
+        with self._lock:
+            return {
+                **self._counters,
+                'buffered': len(self._buffer),
+                'buffer_size': self.buffer_size,
+                'current_file': os.path.basename(self._file_path) if self._file_path else None
+            }
+
+
+class EventLogReader:
+    """Memory-mapped view of one event log file"""
+
+    def __init__(self, path):
+        import numpy as np
+        self.path = path
+        self.strings = []
+        self._blocks = []
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'Not an event log: {path}')
+
+        offset = len(MAGIC)
+        while offset + BLOCK_HEADER.size <= len(self._map):
+            kind, count, length = BLOCK_HEADER.unpack_from(self._map, offset)
+            start = offset + BLOCK_HEADER.size
+            if start + length > len(self._map):
+                # The writer is mid-batch; stop at the last complete block
+                break
+            if kind == STRINGS_BLOCK:
+                self.strings.extend(json.loads(bytes(self._map[start:start + length])))
+            elif kind == RECORDS_BLOCK:
+                self._blocks.append(np.frombuffer(self._map, dtype=record_dtype(), count=count, offset=start))
+            else:
+                raise ValueError(f'Corrupt event log block at byte {offset} of {path}')
+            offset = start + length
+
+    def __len__(self):
+        return sum(len(block) for block in self._blocks)
+
+    def records(self):
+        """All records as one structured array (zero-copy for a single block)"""
+        import numpy as np
+        if len(self._blocks) == 1:
+            return self._blocks[0]
+        if not self._blocks:
+            return np.empty(0, dtype=record_dtype())
+        return np.concatenate(self._blocks)
+
+    def decode(self, ids):
+        """String values of an id column (None where missing)"""
+        import numpy as np
+        table = np.array(self.strings + [None], dtype=object)
+        ids = np.asarray(ids).astype(np.int64)
+        return table[np.where(ids == MISSING, len(self.strings), ids)]
+
+    def payload(self, record):
+        """Rebuild the recommendation payload of one record"""
+        def string(name):
+            value = int(record[name])
+            return None if value == MISSING else self.strings[value]
+
+        payload = {
+            'measurements': {name: float(record[name]) for name in MEASUREMENTS if not math.isnan(record[name])},
+            'fit_preferences': {name: string(f'fit_{name}') for name in FIT_PREFERENCES
+                                if string(f'fit_{name}') is not None},
+            'gender': string('gender'),
+            'height': float(record['height']) if not math.isnan(record['height']) else None,
+            'morphotype': string('morphotype')
+        }
+        if string('brand') is not None:
+            payload['brand'] = string('brand')
+        return payload
+
+    def iter_payloads(self):
+        for block in self._blocks:
+            for record in block:
+                yield self.payload(record)
+
+    def close(self):
+        self._blocks = []
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+
+def log_files(directory):
+    """Event log files of a directory, oldest first"""
+    return sorted(glob.glob(os.path.join(directory, 'events-*.szev')))
+
+
+def read_records(directory):
+    """All records and decoded string columns of a directory"""
+    import numpy as np
+    readers = [EventLogReader(path) for path in log_files(directory)]
+    try:
+        columns = {name: [] for name in ['records'] + STRING_FIELDS}
+        for reader in readers:
+            # Decode from a copy: a view left over the map would stop close() from unmapping it
+            records = np.array(reader.records())
+            columns['records'].append(records)
+            for name in STRING_FIELDS:
+                columns[name].append(reader.decode(records[name]))
+        if not readers:
+            return np.empty(0, dtype=record_dtype()), {name: np.empty(0, dtype=object) for name in STRING_FIELDS}
+        return (np.concatenate(columns['records']),
+                {name: np.concatenate(columns[name]) for name in STRING_FIELDS})
+    finally:
+        for reader in readers:
+            reader.close()
+
+
+def self_check(rows=50):
+    """Write and read back logs of one and of several blocks; returns the failures"""
+    import tempfile
+    from engine import ProfessionalSizeRecommendationEngine
+    from replay import read_corpus
+    from vectorized import random_profiles
+
+    engine = ProfessionalSizeRecommendationEngine()
+    payloads = random_profiles(rows, 0)
+    failures = []
+    # One flush leaves a single RECS block, the usual state of the newest file
+    for flushes in (1, 3):
+        with tempfile.TemporaryDirectory() as directory:
+            log = EventLog(directory)
+            for chunk in range(flushes):
+                for payload in payloads[chunk::flushes]:
+                    log.record(payload, engine.recommend_size(payload), 1.0)
+                log.flush()
+            log.close()
+            try:
+                records, strings = read_records(directory)
+                if len(records) != rows or len(strings['gender']) != rows:
+                    failures.append(f'{flushes} block(s): read {len(records)} of {rows} records')
+                corpus = read_corpus(directory)
+                next(corpus)
+                corpus.close()
+                if sum(1 for _ in read_corpus(directory)) != rows:
+                    failures.append(f'{flushes} block(s): payload count differs')
+            except Exception as e:
+                failures.append(f'{flushes} block(s): {type(e).__name__}: {str(e)}')
+    return failures
+
+
+if __name__ == '__main__':
+    import numpy as np
+
+    parser = argparse.ArgumentParser(description='Summarize a recommendation event log directory')
+    parser.add_argument('directory', nargs='?', help='Event log directory')
+    parser.add_argument('--check', action='store_true', help='Write and read back sample logs; exit 1 on failure')
+    args = parser.parse_args()
+
+    if args.check:
+        failures = self_check()
+        for failure in failures:
+            print(f'  FAIL {failure}')
+        print('Event log self-check ' + ('failed' if failures else 'passed'))
+        raise SystemExit(1 if failures else 0)
+    if not args.directory:
+        parser.error('an event log directory is required without --check')
+
+    started = time.perf_counter()
+    records, strings = read_records(args.directory)
+    elapsed = time.perf_counter() - started
+    print(f"{len(records)} events in {len(log_files(args.directory))} files, read in {elapsed * 1000:.1f} ms")
+    if len(records):
+        print(f"  from {datetime.fromtimestamp(records['timestamp'].min()).isoformat()} "
+              f"to {datetime.fromtimestamp(records['timestamp'].max()).isoformat()}")
+        latency = records['latency_ms']
+        print(f"  latency ms  p50 {np.percentile(latency, 50):.2f}  p95 {np.percentile(latency, 95):.2f}  "
+              f"p99 {np.percentile(latency, 99):.2f}")
+        for name in ['top_size', 'bottom_size', 'body_type']:
+            values, counts = np.unique(strings[name].astype(str), return_counts=True)
+            print(f"  {name:<12} " + ', '.join(f'{v}: {c}' for v, c in zip(values, counts)))
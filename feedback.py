@@ -0,0 +1,527 @@
+"""
+Professional Fashion Sizing API - Fit Feedback Learning
+Appends fit-feedback and return events to a local log and learns per-brand,
+per-garment size offsets from running statistics, publishing them to the
+engine's brand_adjustments without a restart
+"""
+
+import glob
+import json
+import logging
+import math
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import Blueprint
+
+import negotiation
+from jobs import try_lock
+from negotiation import parse_body, render
+from shared_tables import to_builtin
+
+logger = logging.getLogger(__name__)
+
+GARMENTS = ['top', 'bottom']
+
+# Size steps between the size bought and the size that would have fit
+OUTCOMES = {
+    'too_small': 1,
+    'kept': 0,
+    'too_large': -1
+}
+
+# Per-process files: events-<pid>-<generation>.jsonl, state-<pid>.json and
+# owner-<pid>.lock; the unnumbered names are from single-process stores
+LOG_PATTERN = re.compile(r'events-(?:(\d+)-)?(\d+)\.jsonl$')
+STATE_PATTERN = re.compile(r'state(?:-(\d+))?\.json$')
+OWNER_PATTERN = re.compile(r'owner-(\d+)\.lock$')
+
+
+class RunningOffset:
+    """Welford running mean and variance of the offsets implied by feedback"""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def std(self):
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+    def merge(self, other):
+        """Fold in the statistics of another sample (Chan et al. parallel update)"""
+        count = self.count + other.count
+        if not other.count:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2}
+
+
+class FeedbackLearner:
+    """
+    Online brand-offset learning from fit feedback
+    Each event implies the offset that would have fitted: the offset applied
+    when the size was recommended plus the outcome's size step. The published
+    offset is the running mean shrunk toward the hand-written prior, so a few
+    events cannot swing it.
+
+    Every process appends to its own log and compacts it into its own state
+    file, so server workers sharing data_dir never overwrite or delete each
+    other's files. Start-up adopts the files of processes that have exited
+    into this process's state; every sync_interval seconds a background
+    thread reads what the other processes appended since the last sync, so
+    all workers publish the same offsets within one interval.
+    """
+
+    def __init__(self, engine, data_dir, prior_weight=20, compact_every=10000, sync_interval=5.0):
+        self.engine = engine
+        self.data_dir = data_dir
+        self.prior_weight = prior_weight
+        self.compact_every = compact_every
+        self.sync_interval = sync_interval
+        self._lock = threading.Lock()
+        self._since_compaction = 0
+        self._counters = {'events': 0, 'rejected': 0, 'compactions': 0, 'offset_changes': 0, 'syncs': 0}
+        # Bumped whenever a published offset changes, for caches of brand-adjusted results
+        self.version = 0
+        os.makedirs(data_dir, exist_ok=True)
+
+        # Snapshot tables are read-only views; learned offsets need a private copy
+        if not isinstance(engine.brand_adjustments, dict):
+            engine.brand_adjustments = to_builtin(engine.brand_adjustments)
+        self.priors = {
+            brand: {garment: data.get(garment, 0) for garment in GARMENTS}
+            for brand, data in engine.brand_adjustments.items()
+        }
+
+        # Estimates use every process's statistics (_stats); this process persists only _own
+        self._open()
+        self._publish_all()
+        _learners.append(self)
+
+    def _open(self):
+        """Take this process's owner lock, adopt exited processes' files, open a log and sync"""
+        self._stats = {}
+        self._own = {}
+        self._adopted = []
+        # Per other process: its state file's identity, statistics and read positions in its logs
+        self._peers = {}
+        self._pid = os.getpid()
+        self._owner = open(self._owner_path(self._pid), 'a+b')
+        if not try_lock(self._owner):
+            raise RuntimeError(f'Feedback owner lock {self._owner_path(self._pid)} is held by another process')
+        with self._directory_lock():
+            self._generation = self._load()
+            self._log = open(self._log_path(self._generation), 'a')
+            if self._adopted:
+                self._compact()
+            self._read_peers()
+        self._stats = self._merged_stats()
+        self._stop = threading.Event()
+        if self.sync_interval:
+            threading.Thread(target=self._run_sync, name='feedback-sync', daemon=True).start()
+
+    def _reopen_in_child(self):
+        """Continue under the child's pid; a forked worker must not append to or compact its parent's files"""
+        self._lock = threading.Lock()
+        self._log.close()
+        self._owner.close()
+        self._open()
+
+    @contextmanager
+    def _directory_lock(self):
+        """Serialize loading and compaction across the processes sharing data_dir"""
+        with open(os.path.join(self.data_dir, 'directory.lock'), 'a+b') as f:
+            try_lock(f, blocking=True)
+            yield
+
+    def _owner_path(self, pid):
+        return os.path.join(self.data_dir, f'owner-{pid}.lock')
+
+    def _state_path(self):
+        return os.path.join(self.data_dir, f'state-{self._pid}.json')
+
+    def _log_path(self, generation):
+        return os.path.join(self.data_dir, f'events-{self._pid}-{generation:06d}.jsonl')
+
+    def _owner_alive(self, pid):
+        """Whether another process still holds its owner lock"""
+        if pid is None or pid == self._pid:
+            # Unnumbered files, or files left by an earlier process with this pid
+            return False
+        try:
+            f = open(self._owner_path(pid), 'rb')
+        except OSError:
+            return False
+        with f:
+            return not try_lock(f)
+
+    def _scan(self):
+        """{pid: [(kind, match, path)]} of the files in data_dir (pid None for unnumbered names)"""
+        owners = {}
+        for path in glob.glob(os.path.join(self.data_dir, '*')):
+            name = os.path.basename(path)
+            for kind, pattern in (('log', LOG_PATTERN), ('state', STATE_PATTERN), ('lock', OWNER_PATTERN)):
+                match = pattern.fullmatch(name)
+                if match:
+                    pid = int(match.group(1)) if match.group(1) else None
+                    owners.setdefault(pid, []).append((kind, match, path))
+                    break
+        return owners
+
+    def _read_state(self, files, stats):
+        """Merge a process's state file into stats; returns its generation"""
+        for kind, _, path in files:
+            if kind != 'state':
+                continue
+            with open(path) as f:
+                state = json.load(f)
+            self.priors.update(state.get('priors', {}))
+            for brand, garments in state['stats'].items():
+                for garment, values in garments.items():
+                    self._running(stats, brand, garment).merge(RunningOffset(**values))
+            return state['generation']
+        return 0
+
+    def _read_log(self, path, stats, position=0):
+        """Apply a log's complete lines from position on to stats; returns (end position, events)"""
+        with open(path, 'rb') as f:
+            f.seek(position)
+            data = f.read()
+        # A partial last line is still being written, or was torn by a crash
+        end = data.rfind(b'\n') + 1
+        events = 0
+        for line in data[:end].splitlines():
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            self._apply(event, [stats])
+            events += 1
+        return position + end, events
+
+    @staticmethod
+    def _logs(files):
+        return sorted((int(match.group(2)), path) for kind, match, path in files if kind == 'log')
+
+    def _load(self):
+        """
+        Adopt the files of exited processes into this process's statistics
+        They are deleted by the next compaction; the files of running
+        processes are left to _read_peers(). Returns the generation of this
+        process's first log.
+        """
+        generation = 0
+        replayed = 0
+        for pid, files in self._scan().items():
+            if self._owner_alive(pid):
+                continue
+            state_generation = self._read_state(files, self._own)
+            logs = self._logs(files)
+            for log_generation, path in logs:
+                if log_generation < state_generation:
+                    # Compacted already; its owner crashed before deleting it
+                    continue
+                replayed += self._read_log(path, self._own)[1]
+
+            if pid == self._pid and (logs or state_generation):
+                # Never reopen a log that an earlier process with this pid compacted
+                generation = max([state_generation] + [g for g, _ in logs]) + 1
+            self._adopted.extend(path for kind, _, path in files if kind != 'lock' or pid != self._pid)
+        self._since_compaction = replayed
+        if replayed:
+            logger.info(f"Replayed {replayed} feedback events")
+        return generation
+
+    def _read_peers(self):
+        """
+        Bring the statistics of every other process up to date (directory lock held)
+        Appended log lines are read from where the last read stopped; a
+        process whose state file changed or whose logs were deleted has
+        compacted, or been adopted, and is read again from scratch.
+        """
+        peers = {}
+        for pid, files in self._scan().items():
+            if pid == self._pid:
+                continue
+            state = next((path for kind, _, path in files if kind == 'state'), None)
+            info = os.stat(state) if state else None
+            state_key = (info.st_mtime_ns, info.st_size) if info else None
+            logs = self._logs(files)
+            peer = self._peers.get(pid)
+            if peer is None or peer['state_key'] != state_key or not set(peer['positions']) <= {p for _, p in logs}:
+                peer = {'state_key': state_key, 'stats': {}, 'positions': {}}
+                peer['generation'] = self._read_state(files, peer['stats'])
+            for log_generation, path in logs:
+                if log_generation >= peer['generation']:
+                    peer['positions'][path] = self._read_log(path, peer['stats'], peer['positions'].get(path, 0))[0]
+            peers[pid] = peer
+        self._peers = peers
+
+    def _merged_stats(self):
+        """This process's statistics merged with every peer's"""
+        stats = {}
+        for source in [self._own] + [peer['stats'] for peer in self._peers.values()]:
+            for brand, garments in source.items():
+                for garment, running in garments.items():
+                    self._running(stats, brand, garment).merge(running)
+        return stats
+
+    def sync(self):
+        """Merge what the other processes learned since the last sync and publish the offsets"""
+        with self._directory_lock():
+            self._read_peers()
+        with self._lock:
+            # Events ingested meanwhile are already in _own
+            self._stats = self._merged_stats()
+            changed = self._publish_all()
+            self._counters['syncs'] += 1
+        if changed:
+            negotiation.invalidate('get_brands')
+        return changed
+
+    def _run_sync(self):
+        stop = self._stop
+        while not stop.wait(self.sync_interval):
+            try:
+                self.sync()
+            except (OSError, ValueError) as e:
+                logger.warning(f"Feedback sync failed: {str(e)}")
+
+    @staticmethod
+    def _running(stats, brand, garment):
+        garments = stats.setdefault(brand, {})
+        if garment not in garments:
+            garments[garment] = RunningOffset()
+        return garments[garment]
+
+    def _apply(self, event, targets=None):
+        for stats in targets or (self._stats, self._own):
+            self._running(stats, event['brand'], event['garment']).add(event['implied_offset'])
+
+    def estimate(self, brand, garment):
+        """Offset estimate shrunk toward the prior"""
+        prior = self.priors[brand][garment]
+        running = self._stats.get(brand, {}).get(garment)
+        if running is None or not running.count:
+            return float(prior)
+        return (prior * self.prior_weight + running.mean * running.count) / (self.prior_weight + running.count)
+
+    def _publish(self, brand, garment):
+        """Write the rounded estimate into the engine's brand table when it changed"""
+        if brand not in self.engine.brand_adjustments:
+            return False
+        offset = int(round(self.estimate(brand, garment)))
+        if self.engine.brand_adjustments[brand].get(garment) == offset:
+            return False
+        logger.info(f"Brand offset {brand}/{garment} changed to {offset}")
+        self.engine.brand_adjustments[brand][garment] = offset
+        self._counters['offset_changes'] += 1
+        self.version += 1
+        return True
+
+    def _publish_all(self):
+        """Publish every brand's estimates; returns {brand: {garment: offset}} of those that changed"""
+        changed = {}
+        for brand in self.priors:
+            for garment in GARMENTS:
+                if self._publish(brand, garment):
+                    changed.setdefault(brand, {})[garment] = self.engine.brand_adjustments[brand][garment]
+        return changed
+
+    def normalize(self, event):
+        """Validated event with its implied offset"""
+        brand = str(event.get('brand', '')).lower()
+        if brand not in self.priors:
+            raise ValueError(f'Unknown brand: {brand}')
+        garment = event.get('garment')
+        if garment not in GARMENTS:
+            raise ValueError(f'garment must be one of {", ".join(GARMENTS)}')
+        if 'size_steps' in event:
+            steps = event['size_steps']
+            if not isinstance(steps, int) or isinstance(steps, bool):
+                raise ValueError('size_steps must be an integer')
+        elif event.get('outcome') in OUTCOMES:
+            steps = OUTCOMES[event['outcome']]
+        else:
+            raise ValueError(f'outcome must be one of {", ".join(OUTCOMES)}')
+
+        # The offset in effect when the size was recommended, unless the client sent it
+        applied = event.get('adjustment', self.engine.brand_adjustments[brand].get(garment, 0))
+        if not isinstance(applied, int) or isinstance(applied, bool):
+            raise ValueError('adjustment must be an integer')
+        return {
+            'brand': brand,
+            'garment': garment,
+            'implied_offset': applied + steps,
+            'received_at': datetime.now().isoformat()
+        }
+
+    def ingest(self, events):
+        """Append events to the log and update the offsets (O(1) per event)"""
+        normalized = []
+        for event in events:
+            try:
+                normalized.append(self.normalize(event))
+            except (ValueError, AttributeError) as e:
+                with self._lock:
+                    self._counters['rejected'] += 1
+                raise ValueError(str(e))
+
+        changed = {}
+        with self._lock:
+            for event in normalized:
+                self._log.write(json.dumps(event) + '\n')
+            self._log.flush()
+            touched = set()
+            for event in normalized:
+                self._apply(event)
+                touched.add((event['brand'], event['garment']))
+            for brand, garment in sorted(touched):
+                if self._publish(brand, garment):
+                    changed.setdefault(brand, {})[garment] = self.engine.brand_adjustments[brand][garment]
+            self._counters['events'] += len(normalized)
+            self._since_compaction += len(normalized)
+            if self._since_compaction >= self.compact_every:
+                with self._directory_lock():
+                    self._compact()
+
+        if changed:
+            negotiation.invalidate('get_brands')
+        return {'accepted': len(normalized), 'offset_changes': changed}
+
+    def _compact(self):
+        """Fold this process's log into its state file and start a new log"""
+        self._log.close()
+        self._generation += 1
+        self._log = open(self._log_path(self._generation), 'a')
+
+        state = {
+            'generation': self._generation,
+            'compacted_at': datetime.now().isoformat(),
+            'priors': self.priors,
+            'stats': {brand: {garment: running.to_dict() for garment, running in garments.items()}
+                      for brand, garments in self._own.items()}
+        }
+        temporary = self._state_path() + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self._state_path())
+
+        # This process's older logs and the adopted files are now in the state
+        redundant = [self._log_path(generation) for generation in range(self._generation)]
+        for path in redundant + self._adopted:
+            if path != self._state_path() and os.path.exists(path):
+                os.remove(path)
+        self._adopted = []
+        self._since_compaction = 0
+        self._counters['compactions'] += 1
+
+    def compact(self):
+        with self._lock, self._directory_lock():
+            self._compact()
+
+    def offsets(self):
+        """Learned estimates next to the priors and the published offsets"""
+        with self._lock:
+            result = {}
+            for brand, priors in self.priors.items():
+                result[brand] = {}
+                for garment in GARMENTS:
+                    running = self._stats.get(brand, {}).get(garment, RunningOffset())
+                    result[brand][garment] = {
+                        'prior': priors[garment],
+                        'events': running.count,
+                        'mean_implied_offset': round(running.mean, 3) if running.count else None,
+                        'std': round(running.std, 3),
+                        'estimate': round(self.estimate(brand, garment), 3),
+                        'published': self.engine.brand_adjustments.get(brand, {}).get(garment)
+                    }
+            return result
+
+    def get_metrics(self):
+        with self._lock:
+            return {
+                **self._counters,
+                'since_compaction': self._since_compaction,
+                'log_generation': self._generation,
+                'merged_processes': len(self._peers)
+            }
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            self._log.close()
+            self._owner.close()
+        if self in _learners:
+            _learners.remove(self)
+
+
+# Learners of this process, reopened under the child's pid after a fork
+_learners = []
+
+
+def _reopen_in_child():
+    for learner in _learners:
+        learner._reopen_in_child()
+
+
+os.register_at_fork(after_in_child=_reopen_in_child)
+
+
+def create_feedback_blueprint(learner):
+    """Flask routes for fit-feedback ingestion"""
+    bp = Blueprint('feedback', __name__)
+
+    @bp.route('/api/feedback', methods=['POST'])
+    def post_feedback():
+        """Record one fit-feedback event or a batch under 'events'"""
+        try:
+            data = parse_body()
+            events = data['events'] if isinstance(data, dict) and 'events' in data else [data]
+            if not isinstance(events, list):
+                raise ValueError('events must be a list')
+            result = learner.ingest(events)
+        except (ValueError, TypeError) as e:
+            return render({
+                'success': False,
+                'error': f'Invalid feedback: {str(e)}',
+                'error_code': 'INVALID_FEEDBACK'
+            }), 400
+        except Exception as e:
+            logger.error(f"Error in post_feedback endpoint: {str(e)}")
+            return render({
+                'success': False,
+                'error': str(e),
+                'error_code': 'PROCESSING_ERROR'
+            }), 500
+
+        return render({'success': True, 'data': result}), 202
+
+    @bp.route('/api/feedback/offsets', methods=['GET'])
+    def get_offsets():
+        """Learned brand offsets with their running statistics"""
+        return render({
+            'success': True,
+            'data': learner.offsets(),
+            'timestamp': datetime.now().isoformat()
+        })
+
+    return bp
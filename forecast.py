@@ -0,0 +1,298 @@
+"""
+Professional Fashion Sizing API - Demand Forecasting
+Size-share tables per brand, gender and garment predicted by the vectorized
+engine for an uploaded or synthetic population
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+
+from flask import Blueprint
+
+from negotiation import parse_body, render
+from shared_tables import to_builtin
+
+# numpy and the vectorized engine are imported inside the functions that use
+# them, so a server only pays for them on its first forecast request
+
+logger = logging.getLogger(__name__)
+
+GARMENTS = ['top', 'bottom']
+GENDERS = ['homme', 'femme']
+LETTER_SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL', 'XXXL']
+NUMERIC_COLUMNS = ['poitrine', 'epaules', 'bassin', 'hanches', 'abdomen', 'height']
+CATEGORY_COLUMNS = ['gender', 'morphotype',
+                    'fit_poitrine', 'fit_epaules', 'fit_bassin', 'fit_hanches']
+MAX_POPULATION = 5000000
+# Larger populations run as bulk jobs instead of on the request thread
+# (about 0.4 s and 55 MB at this size, against 2.5 s and 275 MB for 1M rows)
+SYNC_POPULATION = 200000
+
+# Adult body measurements in centimetres (mean, standard deviation)
+DEFAULT_DISTRIBUTION = {
+    'genders': {
+        'homme': {
+            'share': 0.5,
+            'measurements': {
+                'poitrine': {'mean': 100, 'std': 8},
+                'epaules': {'mean': 46, 'std': 3},
+                'bassin': {'mean': 88, 'std': 10},
+                'hanches': {'mean': 100, 'std': 7},
+                'height': {'mean': 176, 'std': 7}
+            }
+        },
+        'femme': {
+            'share': 0.5,
+            'measurements': {
+                'poitrine': {'mean': 92, 'std': 8},
+                'epaules': {'mean': 39, 'std': 2.5},
+                'bassin': {'mean': 76, 'std': 10},
+                'hanches': {'mean': 100, 'std': 8},
+                'height': {'mean': 163, 'std': 6}
+            }
+        }
+    },
+    'morphotypes': {'normal': 0.6, 'mince': 0.2, 'fort': 0.15, 'athletique': 0.05},
+    # Correlation of every measurement with a shared body-size factor
+    'correlation': 0.7
+}
+
+
+def _shares(weights):
+    import numpy as np
+    names = list(weights)
+    shares = np.array([float(weights[name]) for name in names])
+    if (shares < 0).any() or shares.sum() <= 0:
+        raise ValueError('Shares must be non-negative and not all zero')
+    return names, shares / shares.sum()
+
+
+def synthesize_population(distribution, size, seed=0):
+    """
+    Expand distribution parameters into population columns
+    Measurements are normal per gender and correlated through one shared
+    body-size factor, so large chests go with large waists and hips.
+    """
+    import numpy as np
+    if size <= 0 or size > MAX_POPULATION:
+        raise ValueError(f'Population size must be between 1 and {MAX_POPULATION}')
+    rng = np.random.default_rng(seed)
+    genders = distribution.get('genders', DEFAULT_DISTRIBUTION['genders'])
+    morphotypes = distribution.get('morphotypes', DEFAULT_DISTRIBUTION['morphotypes'])
+    correlation = float(distribution.get('correlation', DEFAULT_DISTRIBUTION['correlation']))
+    if not 0 <= correlation <= 1:
+        raise ValueError('correlation must be between 0 and 1')
+
+    gender_names, gender_shares = _shares({name: spec.get('share', 1) for name, spec in genders.items()})
+    gender_codes = rng.choice(len(gender_names), size=size, p=gender_shares).astype(np.int32)
+    morphotype_names, morphotype_shares = _shares(morphotypes)
+    morphotype_codes = rng.choice(len(morphotype_names), size=size, p=morphotype_shares).astype(np.int32)
+
+    factor = rng.standard_normal(size)
+    columns = {name: np.full(size, np.nan) for name in NUMERIC_COLUMNS}
+    for code, name in enumerate(gender_names):
+        mask = gender_codes == code
+        rows = int(mask.sum())
+        for measurement, params in genders[name].get('measurements', {}).items():
+            if measurement not in columns:
+                raise ValueError(f'Unknown measurement: {measurement}')
+            noise = rng.standard_normal(rows)
+            z = correlation * factor[mask] + np.sqrt(1 - correlation ** 2) * noise
+            columns[measurement][mask] = np.round(params['mean'] + params.get('std', 0) * z, 1)
+
+    columns['gender'] = (gender_codes, gender_names)
+    columns['morphotype'] = (morphotype_codes, morphotype_names)
+    return columns
+
+
+def population_from_arrays(arrays):
+    """Uploaded population arrays (lists of numbers or strings) as columns"""
+    import numpy as np
+    from vectorized import as_categorical
+    if 'gender' not in arrays:
+        raise ValueError('Missing required array: gender')
+    size = len(arrays['gender'])
+    if size == 0 or size > MAX_POPULATION:
+        raise ValueError(f'Population size must be between 1 and {MAX_POPULATION}')
+
+    columns = {}
+    for name, values in arrays.items():
+        if len(values) != size:
+            raise ValueError(f'Array {name} has {len(values)} values, expected {size}')
+        if name in NUMERIC_COLUMNS:
+            columns[name] = np.array(values, dtype=np.float64)
+        elif name in CATEGORY_COLUMNS:
+            columns[name] = as_categorical(values)
+        else:
+            raise ValueError(f'Unknown array: {name}')
+    return columns
+
+
+def _size_order(label):
+    if label.isdigit():
+        return (0, int(label), label)
+    if label in LETTER_SIZES:
+        return (1, LETTER_SIZES.index(label), label)
+    return (2, 0, label)
+
+
+def _share_table(codes, labels, mask, include):
+    """Share of each size label among the rows in mask"""
+    import numpy as np
+    total = int(mask.sum())
+    counts = np.bincount(codes[mask & (codes >= 0)], minlength=len(labels))
+    table = {}
+    for code in np.flatnonzero(counts | include):
+        table[labels[code]] = table.get(labels[code], 0) + int(counts[code])
+    return {label: round(table[label] / total, 4) if total else 0.0
+            for label in sorted(table, key=_size_order)}
+
+
+def forecast_demand(vectorized_engine, columns, brands=None):
+    """Size-share tables of a population, base and per brand"""
+    import numpy as np
+    started = time.perf_counter()
+    engine = vectorized_engine.engine
+    brands = list(engine.brand_adjustments) if brands is None else [brand.lower() for brand in brands]
+    unknown = [brand for brand in brands if brand not in engine.brand_adjustments]
+    if unknown:
+        raise ValueError(f"Unknown brands: {', '.join(unknown)}")
+
+    rows = len(columns['gender'][0])
+    male = vectorized_engine.is_male(columns['gender'])
+    top, bottom = vectorized_engine.size_codes(columns)
+    garments = {
+        'top': (top, vectorized_engine.top_labels, len(vectorized_engine.top_charts[0]['labels'])),
+        'bottom': (bottom, vectorized_engine.bottom_labels, len(vectorized_engine.bottom_charts[0]['labels']))
+    }
+    masks = {'homme': male, 'femme': ~male}
+
+    base = {}
+    unsized = {}
+    for gender, mask in masks.items():
+        base[gender] = {}
+        unsized[gender] = {}
+        for garment, (codes, labels, men_sizes) in garments.items():
+            # Every size of the gender's own chart is listed, even with no demand
+            include = np.zeros(len(labels), dtype=bool)
+            include[:men_sizes] = gender == 'homme'
+            include[men_sizes:] = gender == 'femme'
+            base[gender][garment] = _share_table(codes, labels, mask, include)
+            total = int(mask.sum())
+            unsized[gender][garment] = round(int((mask & (codes < 0)).sum()) / total, 4) if total else 0.0
+
+    by_brand = {}
+    no_rows = np.zeros(rows, dtype=np.int32)
+    for brand in brands:
+        by_brand[brand] = {}
+        for gender, mask in masks.items():
+            by_brand[brand][gender] = {}
+            for garment, (codes, labels, _) in garments.items():
+                brand_codes, brand_labels = vectorized_engine.brand_sizes(codes, labels, (no_rows, [brand]), garment)
+                by_brand[brand][gender][garment] = _share_table(
+                    brand_codes, brand_labels, mask, np.zeros(len(brand_labels), dtype=bool))
+
+    return {
+        'population': rows,
+        'genders': {gender: int(mask.sum()) for gender, mask in masks.items()},
+        'base': base,
+        'brands': by_brand,
+        'unsized': unsized,
+        'processing_time_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
+
+
+def requested_population(data):
+    """Rows a forecast request asks for, before building any columns"""
+    if 'population' in data:
+        population = data['population']
+        if not isinstance(population, dict) or not isinstance(population.get('gender'), list):
+            raise ValueError('Missing required array: gender')
+        return len(population['gender'])
+    return int(data.get('size', 100000))
+
+
+def forecast_from_request(vectorized_engine, data):
+    """Forecast for a request body of uploaded arrays or distribution parameters"""
+    if 'population' in data:
+        columns = population_from_arrays(data['population'])
+    else:
+        columns = synthesize_population(data.get('distribution', {}), int(data.get('size', 100000)),
+                                        int(data.get('seed', 0)))
+    return forecast_demand(vectorized_engine, columns, data.get('brands'))
+
+
+def create_forecast_blueprint(engine, job_manager=None):
+    """Flask route for population demand forecasts"""
+    bp = Blueprint('forecast', __name__)
+    vectorized = {}
+    lock = threading.Lock()
+
+    def vectorized_engine():
+        with lock:
+            if 'engine' not in vectorized:
+                from vectorized import VectorizedEngine
+                vectorized['engine'] = VectorizedEngine(engine)
+            return vectorized['engine']
+
+    @bp.route('/api/forecast', methods=['POST'])
+    def forecast():
+        """Predict the size mix of an uploaded or synthetic population"""
+        try:
+            data = parse_body() or {}
+            rows = requested_population(data)
+            if rows <= 0 or rows > MAX_POPULATION:
+                raise ValueError(f'Population size must be between 1 and {MAX_POPULATION}')
+            if rows > SYNC_POPULATION and job_manager is not None:
+                # The job's worker process gets the offsets in effect now
+                spec = {**data, 'brand_adjustments': to_builtin(engine.brand_adjustments)}
+                job_id = job_manager.create_task_job('forecast', spec, rows)
+                return render({'success': True, 'data': job_manager.status(job_id)}), 202
+            if rows > SYNC_POPULATION:
+                raise ValueError(f'Populations above {SYNC_POPULATION} need the bulk job system')
+            result = forecast_from_request(vectorized_engine(), data)
+        except (ValueError, TypeError, KeyError) as e:
+            return render({
+                'success': False,
+                'error': f'Invalid population: {str(e)}',
+                'error_code': 'INVALID_POPULATION'
+            }), 400
+        except Exception as e:
+            logger.error(f"Error in forecast endpoint: {str(e)}")
+            return render({
+                'success': False,
+                'error': str(e),
+                'error_code': 'PROCESSING_ERROR'
+            }), 500
+
+        return render({'success': True, 'data': result})
+
+    return bp
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Forecast the size mix of a population')
+    parser.add_argument('--size', type=int, default=1000000, help='Synthetic population size')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed of the synthetic population')
+    parser.add_argument('--distribution', help='JSON file of distribution parameters (defaults to adult averages)')
+    parser.add_argument('--population', help='JSON file of population arrays instead of a synthetic one')
+    parser.add_argument('--brand', action='append', help='Brand to forecast (repeatable, defaults to all)')
+    args = parser.parse_args()
+
+    from engine import ProfessionalSizeRecommendationEngine
+    from vectorized import VectorizedEngine
+    if args.population:
+        with open(args.population) as f:
+            population = population_from_arrays(json.load(f))
+    else:
+        distribution = {}
+        if args.distribution:
+            with open(args.distribution) as f:
+                distribution = json.load(f)
+        population = synthesize_population(distribution, args.size, args.seed)
+
+    report = forecast_demand(VectorizedEngine(ProfessionalSizeRecommendationEngine()), population, args.brand)
+    print(json.dumps(report, indent=2))
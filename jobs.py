@@ -0,0 +1,571 @@
+"""
+Professional Fashion Sizing API - Bulk Jobs
+Asynchronous bulk scoring of uploaded JSONL/CSV files with a persistent SQLite
+job store and a process pool running the recommendation engine
+"""
+
+import csv
+import io
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import Blueprint, Response, request
+
+from negotiation import render
+
+logger = logging.getLogger(__name__)
+
+MEASUREMENT_FIELDS = ['poitrine', 'epaules', 'bassin', 'hanches', 'abdomen']
+RESULT_FIELDS = ['row', 'id', 'top_size', 'bottom_size', 'brand_top_size', 'brand_bottom_size',
+                 'body_type', 'confidence', 'error']
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    input_format TEXT NOT NULL,
+    total_rows INTEGER NOT NULL,
+    total_chunks INTEGER NOT NULL,
+    completed_chunks INTEGER NOT NULL DEFAULT 0,
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT,
+    owner_pid INTEGER
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    job_id TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    first_row INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (job_id, chunk_index)
+);
+"""
+
+
+def payload_from_csv_row(row):
+    """Convert a flat CSV row into a recommendation payload"""
+    payload = {
+        'measurements': {},
+        'fit_preferences': {}
+    }
+    for field in MEASUREMENT_FIELDS:
+        if row.get(field):
+            payload['measurements'][field] = float(row[field])
+        if row.get('fit_' + field):
+            payload['fit_preferences'][field] = row['fit_' + field]
+    if row.get('height'):
+        payload['height'] = float(row['height'])
+    for field in ['id', 'gender', 'morphotype', 'brand']:
+        if row.get(field):
+            payload[field] = row[field]
+    return payload
+
+
+# Worker process state: one engine per process, built by the pool initializer
+_worker_engine = None
+
+
+def _init_worker():
+    """Build the engine once per worker process"""
+    global _worker_engine
+    from engine import ProfessionalSizeRecommendationEngine
+    logging.getLogger().setLevel(logging.WARNING)
+    _worker_engine = ProfessionalSizeRecommendationEngine()
+
+
+def _score_chunk(input_path, output_path, first_row):
+    """Score one chunk file and write its results (runs in a worker process)"""
+    from parallel import score_payload
+    rows = 0
+    tmp_path = output_path + '.tmp'
+    with open(input_path, encoding='utf-8') as src, open(tmp_path, 'w', encoding='utf-8') as dst:
+        for offset, line in enumerate(src):
+            payload = json.loads(line)
+            result = {'row': first_row + offset, 'id': payload.get('id')}
+            result.update(score_payload(_worker_engine, payload))
+            dst.write(json.dumps(result) + '\n')
+            rows += 1
+    # Atomic rename so a crash never leaves a partial chunk marked complete
+    os.replace(tmp_path, output_path)
+    return rows
+
+
+def _forecast_chunk(input_path, output_path, first_row):
+    """Run the demand forecast of a task job (runs in a worker process)"""
+    import copy
+    from forecast import forecast_from_request
+    from vectorized import VectorizedEngine
+    with open(input_path, encoding='utf-8') as f:
+        spec = json.loads(f.readline())
+    # The server's offsets for this forecast only; bulk scoring keeps the worker's
+    engine = copy.copy(_worker_engine)
+    engine.brand_adjustments = spec.pop('brand_adjustments', engine.brand_adjustments)
+    report = forecast_from_request(VectorizedEngine(engine), spec)
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as dst:
+        dst.write(json.dumps(report) + '\n')
+    os.replace(tmp_path, output_path)
+    return report['population']
+
+
+# Chunk functions of the job kinds that are not uploads to score
+TASK_WORKERS = {
+    'forecast': _forecast_chunk
+}
+
+
+def try_lock(f, blocking=False):
+    """Take an exclusive lock on an open file; False if another process holds it"""
+    try:
+        if os.name == 'nt':
+            import msvcrt
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return False
+    return True
+
+
+class JobStore:
+    """SQLite persistence for jobs and their chunks"""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.executescript(SCHEMA)
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+            if 'owner_pid' not in columns:
+                # Stores created before jobs had owners
+                self._conn.execute('ALTER TABLE jobs ADD COLUMN owner_pid INTEGER')
+
+    def create_job(self, job_id, input_format, chunks, owner_pid):
+        """Insert a job with its chunk layout, owned by the process that dispatches it"""
+        total_rows = sum(rows for _, rows in chunks)
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO jobs (id, status, input_format, total_rows, total_chunks, created_at, owner_pid) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, 'queued', input_format, total_rows, len(chunks), time.time(), owner_pid)
+            )
+            self._conn.executemany(
+                'INSERT INTO chunks (job_id, chunk_index, first_row, rows, status) VALUES (?, ?, ?, ?, ?)',
+                [(job_id, index, first_row, rows, 'pending') for index, (first_row, rows) in enumerate(chunks)]
+            )
+
+    def get_job(self, job_id):
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def pending_chunks(self, job_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT chunk_index, first_row, rows FROM chunks WHERE job_id = ? AND status != 'done' "
+                'ORDER BY chunk_index', (job_id,)
+            ).fetchall()
+        return [tuple(row) for row in rows]
+
+    def unfinished_jobs(self):
+        return [job_id for job_id, _ in self.unfinished_owners()]
+
+    def unfinished_owners(self):
+        """(job id, owner pid) of every queued or running job"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, owner_pid FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [(row['id'], row['owner_pid']) for row in rows]
+
+    def claim(self, job_id, previous_owner, owner_pid):
+        """Take over a job from previous_owner; False if another process claimed it first"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                'UPDATE jobs SET owner_pid = ? WHERE id = ? AND owner_pid IS ?',
+                (owner_pid, job_id, previous_owner)
+            )
+        return cursor.rowcount == 1
+
+    def mark_started(self, job_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), job_id)
+            )
+
+    def mark_chunk_done(self, job_id, chunk_index, rows):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE chunks SET status = 'done' WHERE job_id = ? AND chunk_index = ?", (job_id, chunk_index)
+            )
+            self._conn.execute(
+                'UPDATE jobs SET completed_chunks = completed_chunks + 1, rows_done = rows_done + ? WHERE id = ?',
+                (rows, job_id)
+            )
+
+    def mark_finished(self, job_id, status, error=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?',
+                (status, time.time(), error, job_id)
+            )
+
+
+class JobManager:
+    """Splits uploads into chunks and dispatches them to a process pool"""
+
+    def __init__(self, data_dir, max_workers=None, chunk_size=2000, resume=True):
+        self.data_dir = data_dir
+        self.max_workers = max_workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.owners_dir = os.path.join(data_dir, 'owners')
+        os.makedirs(self.owners_dir, exist_ok=True)
+        self.store = JobStore(os.path.join(data_dir, 'jobs.sqlite3'))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._owner_lock = None
+        self._owner_pid = None
+        # Rows completed per job since this process started dispatching it
+        self._run_stats = {}
+        if resume:
+            self.resume()
+
+    def _owner_path(self, pid):
+        return os.path.join(self.owners_dir, f'{pid}.lock')
+
+    def _hold_owner_lock(self):
+        """
+        Hold this process's owner lock file for as long as it lives
+        Other processes treat a job as orphaned once its owner's lock is free.
+        """
+        pid = os.getpid()
+        with self._pool_lock:
+            if self._owner_pid != pid:
+                # A forked child inherits the parent's lock, not its identity
+                f = open(self._owner_path(pid), 'a+b')
+                if not try_lock(f):
+                    f.close()
+                    raise RuntimeError(f'Owner lock {self._owner_path(pid)} is held by another process')
+                self._owner_lock = f
+                self._owner_pid = pid
+        return pid
+
+    def _owner_alive(self, pid):
+        """Whether the process that owns a job still holds its owner lock"""
+        if pid == os.getpid():
+            return True
+        path = self._owner_path(pid)
+        try:
+            f = open(path, 'a+b')
+        except OSError:
+            return False
+        with f:
+            if not try_lock(f):
+                return True
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return False
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                import multiprocessing
+                from concurrent.futures import ProcessPoolExecutor
+                # Spawn avoids forking a multi-threaded server process
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker
+                )
+            return self._pool
+
+    def _job_dir(self, job_id):
+        return os.path.join(self.data_dir, job_id)
+
+    def _chunk_path(self, job_id, chunk_index, kind):
+        return os.path.join(self._job_dir(job_id), f'{kind}_{chunk_index:06d}.jsonl')
+
+    def _iter_payloads(self, stream, input_format):
+        text = io.TextIOWrapper(stream, encoding='utf-8', newline='')
+        if input_format == 'csv':
+            for row in csv.DictReader(text):
+                yield payload_from_csv_row(row)
+        else:
+            for line in text:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+    def create_job(self, stream, input_format):
+        """Persist an uploaded file as chunked input and queue the job"""
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._job_dir(job_id))
+
+        chunks = []
+        out = None
+        rows_in_chunk = 0
+        first_row = 0
+        try:
+            for row_index, payload in enumerate(self._iter_payloads(stream, input_format)):
+                if out is None:
+                    out = open(self._chunk_path(job_id, len(chunks), 'input'), 'w', encoding='utf-8')
+                    first_row = row_index
+                out.write(json.dumps(payload) + '\n')
+                rows_in_chunk += 1
+                if rows_in_chunk == self.chunk_size:
+                    out.close()
+                    out = None
+                    chunks.append((first_row, rows_in_chunk))
+                    rows_in_chunk = 0
+        except Exception:
+            # A rejected upload leaves no job behind
+            if out is not None:
+                out.close()
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+            raise
+        if out is not None:
+            out.close()
+            chunks.append((first_row, rows_in_chunk))
+
+        self.store.create_job(job_id, input_format, chunks, self._hold_owner_lock())
+        self.start(job_id)
+        return job_id
+
+    def create_task_job(self, kind, spec, rows):
+        """Queue a single-chunk job of one of the TASK_WORKERS kinds, covering rows rows"""
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._job_dir(job_id))
+        with open(self._chunk_path(job_id, 0, 'input'), 'w', encoding='utf-8') as f:
+            f.write(json.dumps(spec) + '\n')
+        self.store.create_job(job_id, kind, [(0, rows)], self._hold_owner_lock())
+        self.start(job_id)
+        return job_id
+
+    def start(self, job_id):
+        """Dispatch the remaining chunks of a job in a background thread"""
+        thread = threading.Thread(target=self._run, args=(job_id,), name=f'job-{job_id[:8]}', daemon=True)
+        thread.start()
+
+    def resume(self):
+        """
+        Restart every unfinished job whose owning process is gone
+        Jobs still owned by a live process (another server worker, or the
+        debug reloader's watcher) are left to it; claiming is atomic, so two
+        processes starting together never dispatch the same job.
+        """
+        pid = None
+        for job_id, owner in self.store.unfinished_owners():
+            if owner is not None and self._owner_alive(owner):
+                continue
+            pid = pid or self._hold_owner_lock()
+            if self.store.claim(job_id, owner, pid):
+                logger.info(f"Resuming bulk job {job_id}")
+                self.start(job_id)
+        # Drop the lock files of exited processes
+        for name in os.listdir(self.owners_dir):
+            if name.endswith('.lock') and name[:-5].isdigit():
+                self._owner_alive(int(name[:-5]))
+
+    def _run(self, job_id):
+        from concurrent.futures import as_completed
+        self.store.mark_started(job_id)
+        self._run_stats[job_id] = {'started': time.monotonic(), 'rows': 0}
+        futures = {}
+        try:
+            worker = TASK_WORKERS.get(self.store.get_job(job_id)['input_format'], _score_chunk)
+            pool = self._get_pool()
+            for chunk_index, first_row, _ in self.store.pending_chunks(job_id):
+                future = pool.submit(
+                    worker,
+                    self._chunk_path(job_id, chunk_index, 'input'),
+                    self._chunk_path(job_id, chunk_index, 'output'),
+                    first_row
+                )
+                futures[future] = chunk_index
+
+            for future in as_completed(futures):
+                rows = future.result()
+                self.store.mark_chunk_done(job_id, futures[future], rows)
+                self._run_stats[job_id]['rows'] += rows
+        except Exception as e:
+            logger.error(f"Bulk job {job_id} failed: {str(e)}")
+            for future in futures:
+                future.cancel()
+            self.store.mark_finished(job_id, 'failed', str(e))
+            return
+
+        self.store.mark_finished(job_id, 'completed')
+
+    def status(self, job_id):
+        """Job status with progress and throughput"""
+        job = self.store.get_job(job_id)
+        if job is None:
+            return None
+
+        progress = job['rows_done'] / job['total_rows'] if job['total_rows'] else 1.0
+        rows_per_sec = 0.0
+        run = self._run_stats.get(job_id)
+        if run and run['rows']:
+            rows_per_sec = run['rows'] / max(time.monotonic() - run['started'], 1e-6)
+
+        return {
+            'job_id': job_id,
+            'status': job['status'],
+            'input_format': job['input_format'],
+            'total_rows': job['total_rows'],
+            'rows_done': job['rows_done'],
+            'chunks_done': job['completed_chunks'],
+            'total_chunks': job['total_chunks'],
+            'progress': round(progress, 4),
+            'rows_per_sec': round(rows_per_sec, 1),
+            'created_at': job['created_at'],
+            'finished_at': job['finished_at'],
+            'error': job['error']
+        }
+
+    def iter_results(self, job_id, output_format):
+        """Stream the results of a completed job in row order"""
+        job = self.store.get_job(job_id)
+        writer_buffer = io.StringIO()
+        writer = csv.DictWriter(writer_buffer, fieldnames=RESULT_FIELDS, extrasaction='ignore')
+        if output_format == 'csv':
+            writer.writeheader()
+            yield writer_buffer.getvalue()
+
+        for chunk_index in range(job['total_chunks']):
+            with open(self._chunk_path(job_id, chunk_index, 'output'), encoding='utf-8') as f:
+                if output_format != 'csv':
+                    yield from f
+                    continue
+                for line in f:
+                    writer_buffer.seek(0)
+                    writer_buffer.truncate()
+                    writer.writerow(json.loads(line))
+                    yield writer_buffer.getvalue()
+
+    def close(self):
+        """Stop the worker processes"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def get_metrics(self):
+        """Bulk job counters"""
+        return {
+            'active_jobs': len(self.store.unfinished_jobs()),
+            'max_workers': self.max_workers,
+            'chunk_size': self.chunk_size
+        }
+
+
+def create_jobs_blueprint(manager):
+    """Flask routes for the bulk job API"""
+    bp = Blueprint('jobs', __name__)
+
+    def job_not_found(job_id):
+        return render({
+            'success': False,
+            'error': f'Job not found: {job_id}',
+            'error_code': 'NOT_FOUND'
+        }), 404
+
+    @bp.route('/api/jobs', methods=['POST'])
+    def create_job():
+        """Accept a JSONL or CSV upload for asynchronous scoring"""
+        upload = request.files.get('file')
+        filename = upload.filename if upload else ''
+        input_format = request.args.get('format')
+        if not input_format:
+            if filename.lower().endswith('.csv') or request.mimetype == 'text/csv':
+                input_format = 'csv'
+            else:
+                input_format = 'jsonl'
+        if input_format not in ('csv', 'jsonl'):
+            return render({
+                'success': False,
+                'error': f'Unsupported format: {input_format}',
+                'error_code': 'INVALID_FORMAT'
+            }), 400
+
+        stream = upload.stream if upload else request.stream
+        try:
+            job_id = manager.create_job(stream, input_format)
+        except (ValueError, KeyError, csv.Error) as e:
+            return render({
+                'success': False,
+                'error': f'Invalid upload: {str(e)}',
+                'error_code': 'INVALID_UPLOAD'
+            }), 400
+
+        return render({
+            'success': True,
+            'data': manager.status(job_id)
+        }), 202
+
+    @bp.route('/api/jobs/<job_id>', methods=['GET'])
+    def get_job(job_id):
+        """Poll job status and progress"""
+        status = manager.status(job_id)
+        if status is None:
+            return job_not_found(job_id)
+        return render({
+            'success': True,
+            'data': status
+        })
+
+    @bp.route('/api/jobs/<job_id>/events', methods=['GET'])
+    def job_events(job_id):
+        """Server-Sent Events stream of job progress"""
+        if manager.status(job_id) is None:
+            return job_not_found(job_id)
+
+        def stream():
+            while True:
+                status = manager.status(job_id)
+                yield f"event: progress\ndata: {json.dumps(status)}\n\n"
+                if status['status'] in ('completed', 'failed'):
+                    return
+                time.sleep(1)
+
+        return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+    @bp.route('/api/jobs/<job_id>/results', methods=['GET'])
+    def job_results(job_id):
+        """Download the results of a completed job"""
+        status = manager.status(job_id)
+        if status is None:
+            return job_not_found(job_id)
+        if status['status'] != 'completed':
+            return render({
+                'success': False,
+                'error': f"Job is {status['status']}",
+                'error_code': 'JOB_NOT_COMPLETE'
+            }), 409
+
+        output_format = request.args.get('format', status['input_format'])
+        if status['input_format'] in TASK_WORKERS:
+            # Task results are one JSON line, not scored rows
+            output_format = 'jsonl'
+        extension = 'csv' if output_format == 'csv' else 'jsonl'
+        mimetype = 'text/csv' if output_format == 'csv' else 'application/x-ndjson'
+        return Response(
+            manager.iter_results(job_id, output_format),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename={job_id}.{extension}'}
+        )
+
+    return bp
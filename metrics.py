@@ -0,0 +1,22 @@
+"""
+Professional Fashion Sizing API - Metrics Registry
+Collects runtime counters from the serving components for /api/metrics
+"""
+
+import threading
+
+_providers = {}
+_lock = threading.Lock()
+
+
+def register(name, provider):
+    """Register a callable returning a JSON-serializable metrics dict"""
+    with _lock:
+        _providers[name] = provider
+
+
+def snapshot():
+    """Collect the current metrics from every registered provider"""
+    with _lock:
+        providers = list(_providers.items())
+    return {name: provider() for name, provider in providers}
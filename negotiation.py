@@ -0,0 +1,99 @@
+"""
+Professional Fashion Sizing API - Content Negotiation
+JSON, MessagePack and CBOR request/response bodies selected through the
+Accept and Content-Type headers, with JSON as the default
+"""
+
+import threading
+
+from flask import Response, jsonify, request
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+MSGPACK_LEGACY = 'application/x-msgpack'
+CBOR = 'application/cbor'
+
+
+def _load_codecs():
+    """Binary codecs whose optional packages are installed"""
+    codecs = {}
+    try:
+        import msgpack
+        codec = (lambda payload: msgpack.packb(payload, use_bin_type=True),
+                 lambda body: msgpack.unpackb(body, raw=False))
+        codecs[MSGPACK] = codec
+        codecs[MSGPACK_LEGACY] = codec
+    except ImportError:
+        pass
+    try:
+        import cbor2
+        codecs[CBOR] = (cbor2.dumps, cbor2.loads)
+    except ImportError:
+        pass
+    return codecs
+
+
+# Codec packages are imported on the first negotiated request, not at startup
+_codecs = None
+_offered = None
+
+# Pre-encoded bodies of static endpoints, keyed by (endpoint, mimetype)
+_static_cache = {}
+_static_lock = threading.Lock()
+
+
+def _get_codecs():
+    global _codecs, _offered
+    if _codecs is None:
+        codecs = _load_codecs()
+        _offered = [JSON] + list(codecs)
+        _codecs = codecs
+    return _codecs
+
+
+def response_format():
+    """Mimetype to answer with; JSON unless the client prefers a binary format"""
+    _get_codecs()
+    return request.accept_mimetypes.best_match(_offered, default=JSON)
+
+
+def parse_body():
+    """Decode the request body according to its Content-Type"""
+    if request.mimetype == JSON:
+        return request.json
+    codec = _get_codecs().get(request.mimetype)
+    if codec is None:
+        return request.json
+    return codec[1](request.get_data())
+
+
+def render(payload, static=False):
+    """
+    Encode a response payload in the negotiated format
+    JSON responses go through jsonify unchanged. With static=True the binary
+    encoding is computed once per endpoint and reused. Every response carries
+    Vary: Accept so shared caches keep one copy per format.
+    """
+    mimetype = response_format()
+    if mimetype == JSON:
+        response = jsonify(payload)
+    elif not static:
+        response = Response(_codecs[mimetype][0](payload), mimetype=mimetype)
+    else:
+        key = (request.endpoint, mimetype)
+        body = _static_cache.get(key)
+        if body is None:
+            body = _codecs[mimetype][0](payload)
+            with _static_lock:
+                _static_cache[key] = body
+        response = Response(body, mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+
+def invalidate(endpoint=None):
+    """Drop pre-encoded bodies after the data behind a static endpoint changed"""
+    with _static_lock:
+        for key in list(_static_cache):
+            if endpoint is None or key[0] == endpoint:
+                del _static_cache[key]
@@ -0,0 +1,358 @@
+"""
+Professional Fashion Sizing API - Parallel Batch Scoring
+Process-pool batch executor around ProfessionalSizeRecommendationEngine with
+adaptive chunking and compact columnar transport between processes
+"""
+
+import logging
+import math
+import multiprocessing
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from shared_tables import attach_shared_memory, publish_shared_memory
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ['measurements', 'fit_preferences', 'gender', 'height', 'morphotype']
+
+# Columnar layout of a recommendation payload
+MEASUREMENT_COLUMNS = ['poitrine', 'epaules', 'bassin', 'hanches', 'abdomen']
+CATEGORY_COLUMNS = ['gender', 'morphotype', 'brand']
+FIT_COLUMNS = ['fit_' + name for name in MEASUREMENT_COLUMNS]
+
+# The engine compares measurements as numbers, so strings such as '100' are
+# rejected rather than converted
+NUMBER_TYPES = (int, float)
+
+HAS_MEASUREMENTS = 1
+HAS_FIT_PREFERENCES = 2
+# Rows that could not be encoded; workers skip them and the encoder's error is returned
+INVALID = 4
+
+RESULT_COLUMNS = ['top_size', 'bottom_size', 'brand_top_size', 'brand_bottom_size', 'body_type']
+
+
+def score_payload(engine, payload):
+    """Score one payload into a compact result row"""
+    missing = [field for field in REQUIRED_FIELDS if field not in payload]
+    if missing:
+        return {'error': f'Missing required field: {missing[0]}'}
+    try:
+        recommendation = engine.recommend_size(payload)
+    except Exception as e:
+        return {'error': str(e)}
+
+    brand = recommendation['brand_recommendations']
+    return {
+        'top_size': recommendation['sizes']['top']['size'],
+        'bottom_size': recommendation['sizes']['bottom']['size'],
+        'brand_top_size': brand['top']['size'] if brand else None,
+        'brand_bottom_size': brand['bottom']['size'] if brand else None,
+        'body_type': recommendation['body_analysis']['classification']['type'],
+        'confidence': recommendation['confidence']
+    }
+
+
+class _Vocabulary:
+    """String interning for categorical columns; code 0 means missing"""
+
+    def __init__(self):
+        self.values = [None]
+        self._codes = {None: 0}
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+
+def _row_error(payload):
+    """Why a payload could not be encoded"""
+    if not isinstance(payload, dict):
+        return 'Payload must be an object'
+    measurements = payload.get('measurements') or {}
+    fit_preferences = payload.get('fit_preferences') or {}
+    for name, value in (('measurements', measurements), ('fit_preferences', fit_preferences)):
+        if not isinstance(value, dict):
+            return f'{name} must be an object'
+    numbers = [(name, measurements) for name in MEASUREMENT_COLUMNS] + [('height', payload)]
+    for name, source in numbers:
+        if name not in source:
+            continue
+        value = source[name]
+        if not isinstance(value, NUMBER_TYPES):
+            return f'{name} must be a number, got {value!r}'
+        try:
+            float(value)
+        except OverflowError:
+            return f'{name} is out of range'
+    categories = [(name, payload.get(name)) for name in CATEGORY_COLUMNS] + \
+                 [('fit_' + name, fit_preferences.get(name)) for name in MEASUREMENT_COLUMNS]
+    for name, value in categories:
+        try:
+            hash(value)
+        except TypeError:
+            return f'{name} must be a string, got {value!r}'
+    return 'Invalid payload'
+
+
+def encode_payloads(payloads):
+    """
+    Encode payload dicts as typed arrays plus shared vocabularies
+    A malformed row is encoded as an INVALID placeholder and its message kept
+    under 'errors', so one bad value does not fail the whole batch.
+    """
+    numeric = {name: array('d') for name in MEASUREMENT_COLUMNS + ['height']}
+    # 32-bit codes: one batch can hold more than 65535 distinct strings
+    codes = {name: array('I') for name in CATEGORY_COLUMNS + FIT_COLUMNS}
+    flags = array('B')
+    vocab = _Vocabulary()
+    errors = {}
+    nan = float('nan')
+
+    for index, payload in enumerate(payloads):
+        try:
+            measurements = payload.get('measurements')
+            fit_preferences = payload.get('fit_preferences')
+            flags.append((HAS_MEASUREMENTS if isinstance(measurements, dict) else 0) |
+                         (HAS_FIT_PREFERENCES if isinstance(fit_preferences, dict) else 0))
+            measurements = measurements or {}
+            fit_preferences = fit_preferences or {}
+
+            # Absent numbers are encoded as NaN; present ones must be numbers
+            for name in MEASUREMENT_COLUMNS:
+                value = measurements.get(name, nan)
+                if not isinstance(value, NUMBER_TYPES):
+                    raise TypeError(name)
+                numeric[name].append(value)
+                codes['fit_' + name].append(vocab.code(fit_preferences.get(name)))
+
+            height = payload.get('height', nan)
+            if not isinstance(height, NUMBER_TYPES):
+                raise TypeError('height')
+            numeric['height'].append(height)
+            for name in CATEGORY_COLUMNS:
+                codes[name].append(vocab.code(payload.get(name)))
+        except (AttributeError, TypeError, ValueError, OverflowError):
+            # Rare, so the valid rows keep the single-pass encoding
+            errors[index] = _row_error(payload)
+            for column in [flags, *numeric.values(), *codes.values()]:
+                del column[index:]
+            flags.append(INVALID)
+            for column in numeric.values():
+                column.append(nan)
+            for column in codes.values():
+                column.append(0)
+
+    return {'numeric': numeric, 'codes': codes, 'flags': flags, 'vocab': vocab.values, 'errors': errors}
+
+
+def slice_batch(batch, start, stop):
+    """Slice an encoded batch without touching the vocabulary"""
+    return {
+        'numeric': {name: column[start:stop] for name, column in batch['numeric'].items()},
+        'codes': {name: column[start:stop] for name, column in batch['codes'].items()},
+        'flags': batch['flags'][start:stop],
+        'vocab': batch['vocab'],
+        'errors': {index - start: error for index, error in batch.get('errors', {}).items()
+                   if start <= index < stop}
+    }
+
+
+def decode_payload(batch, index):
+    """Rebuild the payload dict of one encoded row"""
+    numeric = batch['numeric']
+    codes = batch['codes']
+    vocab = batch['vocab']
+    flags = batch['flags'][index]
+
+    payload = {}
+    if flags & HAS_MEASUREMENTS:
+        payload['measurements'] = {
+            name: numeric[name][index] for name in MEASUREMENT_COLUMNS
+            if not math.isnan(numeric[name][index])
+        }
+    if flags & HAS_FIT_PREFERENCES:
+        payload['fit_preferences'] = {
+            name: vocab[codes['fit_' + name][index]] for name in MEASUREMENT_COLUMNS
+            if codes['fit_' + name][index]
+        }
+    if not math.isnan(numeric['height'][index]):
+        payload['height'] = numeric['height'][index]
+    for name in CATEGORY_COLUMNS:
+        if codes[name][index]:
+            payload[name] = vocab[codes[name][index]]
+    return payload
+
+
+# Worker process state: one engine per process, built by the pool initializer
+_worker_engine = None
+
+
+def _init_worker(tables_name=None):
+    """Build the engine once per worker process"""
+    global _worker_engine
+    from engine import ProfessionalSizeRecommendationEngine
+    logging.getLogger().setLevel(logging.WARNING)
+    if tables_name:
+        _worker_engine = ProfessionalSizeRecommendationEngine.from_tables(attach_shared_memory(tables_name).tables)
+    else:
+        _worker_engine = ProfessionalSizeRecommendationEngine()
+
+
+def _score_encoded(start, batch):
+    """Score an encoded chunk and return encoded results (runs in a worker process)"""
+    began = time.perf_counter()
+    rows = len(batch['flags'])
+    vocab = _Vocabulary()
+    result_codes = {name: array('H') for name in RESULT_COLUMNS}
+    confidence = array('d')
+    errors = {}
+
+    encode_errors = batch.get('errors', {})
+    for index in range(rows):
+        if batch['flags'][index] & INVALID:
+            result = {'error': encode_errors.get(index, 'Invalid payload')}
+        else:
+            result = score_payload(_worker_engine, decode_payload(batch, index))
+        if 'error' in result:
+            errors[index] = result['error']
+        for name in RESULT_COLUMNS:
+            result_codes[name].append(vocab.code(result.get(name)))
+        confidence.append(result.get('confidence', float('nan')))
+
+    return start, {
+        'codes': result_codes,
+        'confidence': confidence,
+        'errors': errors,
+        'vocab': vocab.values,
+        'seconds': time.perf_counter() - began
+    }
+
+
+class ParallelBatchScorer:
+    """
+    Parallel batch executor for the recommendation engine
+    Input is split into chunks sized from measured per-row cost, scored by
+    worker processes that each hold a pre-built engine, and reassembled in
+    input order. With shared_tables the engine tables are published once to
+    shared memory and every worker attaches to them instead of holding its
+    own copy.
+    """
+
+    def __init__(self, max_workers=None, target_chunk_seconds=0.2, min_chunk_rows=16,
+                 max_chunk_rows=20000, chunks_per_worker=4, shared_tables=False):
+        self.max_workers = max_workers or os.cpu_count()
+        self.shared_tables = shared_tables
+        self._tables_block = None
+        self.target_chunk_seconds = target_chunk_seconds
+        self.min_chunk_rows = min_chunk_rows
+        self.max_chunk_rows = max_chunk_rows
+        self.chunks_per_worker = chunks_per_worker
+        self._pool = None
+        self._row_seconds = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_pool(self):
+        if self._pool is None:
+            tables_name = None
+            if self.shared_tables:
+                from engine import ProfessionalSizeRecommendationEngine
+                self._tables_block = publish_shared_memory(ProfessionalSizeRecommendationEngine())
+                tables_name = self._tables_block.name
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(tables_name,)
+            )
+        return self._pool
+
+    def close(self):
+        """Shut the worker processes down"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if self._tables_block is not None:
+            self._tables_block.close()
+            self._tables_block.unlink()
+            self._tables_block = None
+
+    def _chunk_rows(self, remaining):
+        """Rows per chunk from the measured per-row cost"""
+        if self._row_seconds is None:
+            return self.min_chunk_rows
+        by_time = int(self.target_chunk_seconds / max(self._row_seconds, 1e-9))
+        # Keep enough chunks in flight for every worker to stay busy
+        by_balance = math.ceil(remaining / (self.max_workers * self.chunks_per_worker))
+        return max(self.min_chunk_rows, min(self.max_chunk_rows, by_time, by_balance))
+
+    def _observe(self, rows, seconds):
+        row_seconds = seconds / max(rows, 1)
+        if self._row_seconds is None:
+            self._row_seconds = row_seconds
+        else:
+            self._row_seconds = 0.7 * self._row_seconds + 0.3 * row_seconds
+
+    def score(self, payloads):
+        """Score payload dicts in parallel, results in input order"""
+        payloads = list(payloads)
+        # Each chunk is encoded just before it is sent, overlapping the workers' scoring
+        return self._dispatch(len(payloads), lambda start, stop: encode_payloads(payloads[start:stop]))
+
+    def score_encoded(self, batch):
+        """Score an already encoded batch in parallel, results in input order"""
+        return self._dispatch(len(batch['flags']), lambda start, stop: slice_batch(batch, start, stop))
+
+    def _dispatch(self, total, make_chunk):
+        results = [None] * total
+        pool = self._get_pool()
+        pending = {}
+        position = 0
+
+        def submit(rows):
+            nonlocal position
+            stop = min(total, position + rows)
+            future = pool.submit(_score_encoded, position, make_chunk(position, stop))
+            pending[future] = stop - position
+            position = stop
+
+        # Probe chunks calibrate the per-row cost before sizing the rest
+        while position < total and len(pending) < self.max_workers:
+            submit(self._chunk_rows(total - position))
+
+        while pending:
+            future = next(as_completed(pending))
+            rows = pending.pop(future)
+            start, encoded = future.result()
+            self._observe(rows, encoded['seconds'])
+            self._decode_results(results, start, rows, encoded)
+
+            while position < total and len(pending) < self.max_workers * 2:
+                submit(self._chunk_rows(total - position))
+
+        return results
+
+    @staticmethod
+    def _decode_results(results, start, rows, encoded):
+        vocab = encoded['vocab']
+        codes = encoded['codes']
+        errors = encoded['errors']
+        for index in range(rows):
+            if index in errors:
+                results[start + index] = {'error': errors[index]}
+                continue
+            row = {name: vocab[codes[name][index]] for name in RESULT_COLUMNS}
+            row['confidence'] = encoded['confidence'][index]
+            results[start + index] = row
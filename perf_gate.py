@@ -0,0 +1,263 @@
+"""
+Professional Fashion Sizing API - Performance Regression Gate
+Runs the engine and endpoint benchmarks repeatedly and compares them with a
+committed baseline using noise-aware thresholds
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks import SAMPLE_PAYLOAD
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'perf_baseline.json')
+CORPUS_SIZE = 300
+CORPUS_SEED = 0
+
+# metric: (unit, True when higher is better, scaled by machine speed)
+METRICS = {
+    'engine_recommend_us': ('us', False, True),
+    'engine_throughput_rps': ('req/s', True, True),
+    'endpoint_recommend_us': ('us', False, True),
+    'engine_peak_alloc_kb': ('KB', False, False)
+}
+
+# Runs in a fresh interpreter inside an empty directory so the server's data
+# directories do not touch the checkout: time Flask requests to /api/recommend
+ENDPOINT_PROBE = """
+import json, logging, sys, time
+sys.path.insert(0, sys.argv[1])
+logging.disable(logging.CRITICAL)
+import api
+app = api.create_app()
+client = app.test_client()
+payload = json.loads(sys.argv[2])
+requests, repeats = int(sys.argv[3]), int(sys.argv[4])
+for _ in range(requests):
+    client.post('/api/recommend', json=payload)
+samples = []
+for _ in range(repeats):
+    began = time.perf_counter()
+    for _ in range(requests):
+        client.post('/api/recommend', json=payload)
+    samples.append((time.perf_counter() - began) / requests * 1e6)
+app.extensions['sizing']['event_log'].close()
+print(json.dumps(samples), flush=True)
+"""
+
+
+def calibrate(rounds=15):
+    """
+    Time of a fixed pure-Python workload, used to scale timings across machines
+    The fastest round is the least disturbed by other load on the machine.
+    """
+    def workload():
+        table = {}
+        for i in range(20000):
+            table[f'key{i % 500}'] = table.get(f'key{i % 500}', 0) + i * 0.5
+        return sorted(table.items(), key=lambda item: item[1])
+
+    samples = []
+    for _ in range(rounds):
+        began = time.perf_counter()
+        workload()
+        samples.append((time.perf_counter() - began) * 1000)
+    return min(samples)
+
+
+def machine_fingerprint():
+    """Interpreter and hardware identity; timings are only rescaled across different machines"""
+    return f'{platform.python_implementation()}-{platform.python_version()}-{platform.machine()}-{os.cpu_count()}cpu'
+
+
+def _corpus():
+    from vectorized import random_profiles
+    return random_profiles(CORPUS_SIZE, CORPUS_SEED)
+
+
+def bench_engine(repeats):
+    """Per-call latency and throughput of recommend_size over a fixed corpus"""
+    from engine import ProfessionalSizeRecommendationEngine
+    engine = ProfessionalSizeRecommendationEngine()
+    corpus = _corpus()
+    for payload in corpus:
+        engine.recommend_size(payload)
+
+    latency, throughput = [], []
+    for _ in range(repeats):
+        began = time.perf_counter()
+        for payload in corpus:
+            engine.recommend_size(payload)
+        elapsed = time.perf_counter() - began
+        latency.append(elapsed / len(corpus) * 1e6)
+        throughput.append(len(corpus) / elapsed)
+    return latency, throughput
+
+
+def bench_allocations(calls=50):
+    """
+    Peak bytes allocated during one recommend_size call (deterministic)
+    Every result is kept until the end: freed results refill the interpreter's
+    dict and list free lists, which tracemalloc does not see being reused, and
+    the next call would appear to allocate a fraction of what it does.
+    """
+    from engine import ProfessionalSizeRecommendationEngine
+    engine = ProfessionalSizeRecommendationEngine()
+    corpus = _corpus()[:calls]
+    peaks = []
+    results = []
+    tracemalloc.start()
+    try:
+        for payload in corpus:
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            results.append(engine.recommend_size(payload))
+            peaks.append((tracemalloc.get_traced_memory()[1] - current) / 1024)
+    finally:
+        tracemalloc.stop()
+    return [statistics.mean(peaks)]
+
+
+def bench_endpoint(repeats, requests=200):
+    """Per-request latency of /api/recommend through the Flask test client"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    with tempfile.TemporaryDirectory() as workdir:
+        output = subprocess.run(
+            [sys.executable, '-c', ENDPOINT_PROBE, root, json.dumps(SAMPLE_PAYLOAD), str(requests), str(repeats)],
+            capture_output=True, text=True, cwd=workdir,
+            # The probe repeats one payload; measure the engine path, not result cache hits
+            env={**os.environ, 'SIZING_CACHE_L1_SIZE': '0'}
+        )
+    if output.returncode != 0:
+        raise RuntimeError(f'Endpoint benchmark failed: {output.stderr.strip()[-500:]}')
+    return json.loads(output.stdout)
+
+
+def measure(repeats):
+    """Raw samples of every metric plus the machine calibration"""
+    engine_latency, engine_throughput = bench_engine(repeats)
+    return {
+        'machine': machine_fingerprint(),
+        'calibration_ms': calibrate(),
+        'samples': {
+            'engine_recommend_us': engine_latency,
+            'engine_throughput_rps': engine_throughput,
+            'endpoint_recommend_us': bench_endpoint(repeats),
+            'engine_peak_alloc_kb': bench_allocations()
+        }
+    }
+
+
+def _mad(values):
+    """Median absolute deviation scaled to a standard deviation estimate"""
+    if len(values) < 2:
+        return 0.0
+    median = statistics.median(values)
+    return 1.4826 * statistics.median(abs(v - median) for v in values)
+
+
+def _median_error(values):
+    """Standard error of the median, which shrinks as runs are repeated"""
+    return 1.2533 * _mad(values) / len(values) ** 0.5
+
+
+def machine_scale(baseline, current):
+    """Calibration ratio of a different machine, 1.0 on the baseline's own machine"""
+    if baseline.get('machine') == current.get('machine'):
+        return 1.0
+    return current['calibration_ms'] / baseline['calibration_ms']
+
+
+def compare(baseline, current, tolerance=0.10, noise_factor=3.0):
+    """
+    Verdict per metric
+    A metric regresses when its median moves the wrong way by more than the
+    larger of the relative tolerance and noise_factor times the combined
+    standard error of both medians. The spread of single runs is not the
+    noise of their median: with 7 runs it let a 16% slowdown pass. Timings
+    are scaled by the calibration ratio so a baseline from another machine
+    stays comparable.
+    """
+    scale = machine_scale(baseline, current)
+    results = []
+    for metric, (unit, higher_is_better, scaled) in METRICS.items():
+        if metric not in baseline['samples'] or metric not in current['samples']:
+            continue
+        factor = 1.0
+        if scaled:
+            factor = 1 / scale if higher_is_better else scale
+        expected = [value * factor for value in baseline['samples'][metric]]
+        observed = current['samples'][metric]
+
+        expected_median = statistics.median(expected)
+        observed_median = statistics.median(observed)
+        noise = noise_factor * (_median_error(expected) ** 2 + _median_error(observed) ** 2) ** 0.5
+        margin = max(tolerance * expected_median, noise)
+        if higher_is_better:
+            threshold = expected_median - margin
+            regressed = observed_median < threshold
+        else:
+            threshold = expected_median + margin
+            regressed = observed_median > threshold
+
+        results.append({
+            'metric': metric,
+            'unit': unit,
+            'baseline': round(expected_median, 2),
+            'current': round(observed_median, 2),
+            'change_pct': round((observed_median / expected_median - 1) * 100, 1) if expected_median else 0.0,
+            'threshold': round(threshold, 2),
+            'noise': round(noise, 2),
+            'regressed': regressed
+        })
+    return results
+
+
+def print_report(results, scale):
+    print(f"Performance gate (machine speed ratio {scale:.2f} vs baseline)")
+    print(f"  {'metric':<24} {'baseline':>12} {'current':>12} {'change':>8} {'limit':>12}  status")
+    for row in results:
+        status = 'REGRESSED' if row['regressed'] else 'ok'
+        print(f"  {row['metric']:<24} {row['baseline']:>12.2f} {row['current']:>12.2f} "
+              f"{row['change_pct']:>+7.1f}% {row['threshold']:>12.2f}  {status}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Fail when engine or endpoint performance regresses')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON file')
+    parser.add_argument('--update', action='store_true', help='Record a new baseline instead of comparing')
+    parser.add_argument('--repeats', type=int, default=15, help='Repeated runs per benchmark')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Relative regression budget')
+    parser.add_argument('--noise-factor', type=float, default=3.0, help='Noise multiples allowed beyond the median')
+    parser.add_argument('--json', action='store_true', help='Print the raw JSON comparison')
+    args = parser.parse_args()
+
+    current = measure(args.repeats)
+    if args.update:
+        current['recorded_at'] = datetime.now().isoformat()
+        with open(args.baseline, 'w') as f:
+            json.dump(current, f, indent=2)
+            f.write('\n')
+        print(f'Wrote baseline to {args.baseline}')
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f'No baseline at {args.baseline}, record one with --update', file=sys.stderr)
+        sys.exit(2)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    results = compare(baseline, current, args.tolerance, args.noise_factor)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results, machine_scale(baseline, current))
+    sys.exit(1 if any(row['regressed'] for row in results) else 0)
@@ -0,0 +1,439 @@
+"""
+Professional Fashion Sizing API - Decision Region Cache
+Engine subclass that caches whole regions of measurement space with a
+constant answer: certified boxes of the size charts and threshold cells of
+the body type classifier
+"""
+
+import argparse
+import bisect
+import math
+import random
+import sys
+import threading
+import time
+
+from engine import ProfessionalSizeRecommendationEngine
+
+# States of a RegionNode besides a certified size
+UNKNOWN = object()
+SPLIT = object()
+DIRECT = object()
+# RegionIndex.find() result without a cached answer
+MISS = object()
+
+# Thresholds of determine_professional_body_type per axis; every comparison
+# in the classifier is strict against one of these values
+BODY_TYPE_THRESHOLDS = {
+    True: {'shoulder_hip': [0.95, 1.08], 'waist_hip': [0.85, 0.95]},
+    False: {'shoulder_hip': [0.95, 1.05], 'waist_hip': [0.75, 0.85]}
+}
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _interval_distance(lo, hi, low, high):
+    """Smallest distance between the closed intervals [lo, hi] and [low, high]"""
+    if hi < low:
+        return low - hi
+    if lo > high:
+        return lo - high
+    return 0.0
+
+
+def _point_distance(x, low, high):
+    return low - x if x < low else x - high if x > high else 0.0
+
+
+class RegionNode:
+    """A box (lo, hi] per axis: unknown, certified for a size, split in two, or too small to certify"""
+
+    __slots__ = ['box', 'state', 'axis', 'middle', 'low', 'high']
+
+    def __init__(self, box):
+        self.box = box
+        self.state = UNKNOWN
+        self.axis = self.middle = self.low = self.high = None
+
+
+class RegionIndex:
+    """
+    Memoized decision regions of one size chart
+    The score of a size is a weighted sum of squared distances to its ranges,
+    so the engine picks the first size with the lowest score. Space is cut
+    into boxes (lo, hi] at the chart's range boundaries, with fixed-width
+    boxes beyond them. A box is certified for a size when that size wins
+    everywhere in it: its worst score in the box is below every other size's
+    best score, or it is exactly zero and no earlier size reaches zero in
+    the box. Uncertified boxes are halved along their widest side, down to
+    min_width. Each box is certified once, so any later input inside a
+    certified box is a hit. Answers are also kept by exact adjusted point,
+    which is cheaper to look up than a walk down the tree.
+    """
+
+    def __init__(self, sizes, weights, min_width=0.25, tail_width=4.0, max_nodes=200000, max_points=100000):
+        # sizes: [(size, [(low, high) or None per axis])] in chart order
+        self.sizes = sizes
+        self.weights = weights
+        self.min_width = min_width
+        self.tail_width = tail_width
+        self.max_nodes = max_nodes
+        self.breakpoints = [
+            sorted({bound for _, ranges in sizes if ranges[axis] for bound in ranges[axis]})
+            for axis in range(len(weights))
+        ]
+        self.max_points = max_points
+        self.roots = {}
+        self.node_count = 0
+        # Exact answers by adjusted point, checked before the tree
+        self.points = {}
+        self.point_hits = 0
+        self.region_hits = 0
+        self.misses = 0
+
+    def _axis_cell(self, axis, x):
+        points = self.breakpoints[axis]
+        if not points:
+            return (-math.inf, math.inf)
+        i = bisect.bisect_left(points, x)
+        if 0 < i < len(points):
+            return (points[i - 1], points[i])
+        if i == 0:
+            steps = math.floor((points[0] - x) / self.tail_width)
+            return (points[0] - (steps + 1) * self.tail_width, points[0] - steps * self.tail_width)
+        steps = math.ceil((x - points[-1]) / self.tail_width) - 1
+        return (points[-1] + steps * self.tail_width, points[-1] + (steps + 1) * self.tail_width)
+
+    def _certify(self, box, winner):
+        """True when winner is the engine's answer everywhere in box"""
+        position = None
+        worst = 0.0
+        for index, (size, ranges) in enumerate(self.sizes):
+            if size == winner:
+                position = index
+                for (lo, hi), weight, interval in zip(box, self.weights, ranges):
+                    if interval:
+                        # A squared distance is convex, so its maximum is at an end of the side
+                        worst += weight * max(_point_distance(lo, *interval), _point_distance(hi, *interval)) ** 2
+                if math.isinf(worst):
+                    return False
+                break
+
+        for index, (size, ranges) in enumerate(self.sizes):
+            if size == winner:
+                continue
+            if worst == 0.0:
+                # The winner scores exactly 0 everywhere; a rival only ties where its own
+                # ranges all contain the point, and a tie goes to the earlier size
+                overlaps = all(interval is None or (interval[0] <= hi and interval[1] > lo)
+                               for (lo, hi), interval in zip(box, ranges))
+                if overlaps and index < position:
+                    return False
+                continue
+            best = sum(weight * _interval_distance(lo, hi, *interval) ** 2
+                       for (lo, hi), weight, interval in zip(box, self.weights, ranges) if interval)
+            # A margin keeps float rounding in the engine's own arithmetic from flipping the order
+            if not worst * (1 + 1e-9) + 1e-9 < best:
+                return False
+        return True
+
+    def _root(self, point, create):
+        box = tuple(self._axis_cell(axis, x) for axis, x in enumerate(point))
+        node = self.roots.get(box)
+        if node is None and create and self.node_count < self.max_nodes:
+            # Tail boxes come from float division; never file a point outside its box
+            if all(lo < x <= hi for (lo, hi), x in zip(box, point)):
+                node = self.roots.setdefault(box, RegionNode(box))
+                self.node_count += 1
+        return node
+
+    def find(self, point):
+        """Cached size of an adjusted point, or MISS"""
+        size = self.points.get(point, MISS)
+        if size is not MISS:
+            self.point_hits += 1
+            return size
+        node = self._root(point, False)
+        while node is not None:
+            state = node.state
+            if state is SPLIT:
+                node = node.low if point[node.axis] <= node.middle else node.high
+            elif state is UNKNOWN or state is DIRECT:
+                break
+            else:
+                self.region_hits += 1
+                self._remember(point, state)
+                return state
+        self.misses += 1
+        return MISS
+
+    def _remember(self, point, size):
+        if len(self.points) < self.max_points:
+            self.points[point] = size
+
+    def learn(self, point, size):
+        """Record the engine's answer at point and certify the largest box around it"""
+        self._remember(point, size)
+        node = self._root(point, True)
+        while node is not None:
+            state = node.state
+            if state is SPLIT:
+                node = node.low if point[node.axis] <= node.middle else node.high
+                continue
+            if state is not UNKNOWN:
+                return
+            if self._certify(node.box, size):
+                node.state = size
+                return
+            widths = [hi - lo for lo, hi in node.box]
+            axis = widths.index(max(widths))
+            if widths[axis] <= self.min_width or self.node_count >= self.max_nodes:
+                node.state = DIRECT
+                return
+            lo, hi = node.box[axis]
+            middle = (lo + hi) / 2
+            node.axis, node.middle = axis, middle
+            node.low = RegionNode(node.box[:axis] + ((lo, middle),) + node.box[axis + 1:])
+            node.high = RegionNode(node.box[:axis] + ((middle, hi),) + node.box[axis + 1:])
+            self.node_count += 2
+            # Children first, so a concurrent reader never sees a split without them
+            node.state = SPLIT
+
+
+class RegionCachedEngine(ProfessionalSizeRecommendationEngine):
+    """
+    Sizing engine whose piecewise-constant decisions are cached by region
+    Sizes are looked up in RegionIndex trees over the adjusted measurements,
+    so fit preferences, morphotype, height and brand never split the cache.
+    Body types are cached per threshold cell of (shoulder_hip, waist_hip).
+    Call clear_regions() after changing a size chart.
+    """
+
+    def __init__(self, tables=None):
+        super().__init__(tables)
+        self._region_lock = threading.Lock()
+        self._indexes = {}
+        self._body_types = {}
+        self._region_counters = {'body_type_hits': 0, 'body_type_misses': 0}
+
+    def clear_regions(self):
+        with self._region_lock:
+            self._indexes = {}
+            self._body_types = {}
+
+    def _index(self, name, chart, axes, weights):
+        index = self._indexes.get(name)
+        if index is None:
+            with self._region_lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    sizes = [(size, [tuple(ranges[axis]) if axis in ranges else None for axis in axes])
+                             for size, ranges in chart.items()]
+                    index = self._indexes[name] = RegionIndex(sizes, weights)
+        return index
+
+    def find_best_top_size(self, measurements, fit_preferences, gender, morphotype):
+        """Find the best top size based on measurements"""
+        chest = measurements.get('poitrine', 0)
+        shoulders = measurements.get('epaules', 0)
+        if not (_number(chest) and _number(shoulders)) or chest <= 0:
+            return super().find_best_top_size(measurements, fit_preferences, gender, morphotype)
+
+        adjusted_chest = self.adjust_measurement(chest, fit_preferences.get('poitrine', 'standard'), morphotype, 'chest')
+        adjusted_shoulders = self.adjust_measurement(
+            shoulders, fit_preferences.get('epaules', 'standard'), morphotype, 'chest') if shoulders > 0 else 0
+
+        men = gender.lower() == 'homme'
+        chart = self.men_top_sizes if men else self.women_top_sizes
+        if adjusted_shoulders > 0:
+            index = self._index(('top', men, True), chart, ['chest', 'shoulders'], [1.0, 0.3])
+            point = (adjusted_chest, adjusted_shoulders)
+        else:
+            index = self._index(('top', men, False), chart, ['chest'], [1.0])
+            point = (adjusted_chest,)
+
+        size = index.find(point)
+        if size is MISS:
+            size = super().find_best_top_size(measurements, fit_preferences, gender, morphotype)
+            index.learn(point, size)
+        return size
+
+    def find_best_bottom_size(self, measurements, fit_preferences, gender, morphotype):
+        """Find the best bottom size based on measurements"""
+        waist = measurements.get('bassin', 0)
+        hips = measurements.get('hanches', 0)
+        if not (_number(waist) and _number(hips)) or waist <= 0 or hips <= 0:
+            return super().find_best_bottom_size(measurements, fit_preferences, gender, morphotype)
+
+        adjusted_waist = self.adjust_measurement(waist, fit_preferences.get('bassin', 'standard'), morphotype, 'waist')
+        adjusted_hips = self.adjust_measurement(hips, fit_preferences.get('hanches', 'standard'), morphotype, 'hips')
+
+        men = gender.lower() == 'homme'
+        chart = self.men_bottom_sizes if men else self.women_bottom_sizes
+        index = self._index(('bottom', men), chart, ['waist', 'hips'], [1.0, 1.0])
+
+        point = (adjusted_waist, adjusted_hips)
+        size = index.find(point)
+        if size is MISS:
+            size = super().find_best_bottom_size(measurements, fit_preferences, gender, morphotype)
+            index.learn(point, size)
+        return size
+
+    def determine_professional_body_type(self, ratios, gender):
+        """Professional body type classification"""
+        shoulder_hip = ratios.get('shoulder_hip', 1)
+        waist_hip = ratios.get('waist_hip', 0.8)
+        if not (_number(shoulder_hip) and _number(waist_hip)):
+            return super().determine_professional_body_type(ratios, gender)
+
+        men = gender.lower() == 'homme'
+        cell = [men]
+        for name, value in [('shoulder_hip', shoulder_hip), ('waist_hip', waist_hip)]:
+            # Open intervals between thresholds and the thresholds themselves
+            thresholds = BODY_TYPE_THRESHOLDS[men][name]
+            i = bisect.bisect_left(thresholds, value)
+            cell.append(2 * i + 1 if i < len(thresholds) and thresholds[i] == value else 2 * i)
+        cell = tuple(cell)
+
+        body_types = self._body_types
+        classification = body_types.get(cell)
+        self._region_counters['body_type_hits' if classification is not None else 'body_type_misses'] += 1
+        if classification is None:
+            classification = body_types[cell] = super().determine_professional_body_type(ratios, gender)
+        return dict(classification)
+
+    def get_region_metrics(self):
+        indexes = list(self._indexes.values())
+        counters = dict(self._region_counters)
+        point_hits = sum(index.point_hits for index in indexes)
+        region_hits = sum(index.region_hits for index in indexes)
+        sizes = point_hits + region_hits + sum(index.misses for index in indexes)
+        body_types = counters['body_type_hits'] + counters['body_type_misses']
+        return {
+            'size_point_hits': point_hits,
+            'size_region_hits': region_hits,
+            'size_misses': sizes - point_hits - region_hits,
+            'size_hit_rate': round((point_hits + region_hits) / sizes, 4) if sizes else 0.0,
+            'size_regions': sum(index.node_count for index in indexes),
+            **counters,
+            'body_type_hit_rate': round(counters['body_type_hits'] / body_types, 4) if body_types else 0.0,
+            'body_type_cells': len(self._body_types)
+        }
+
+
+def random_inputs(rows, seed=0):
+    """Sizing inputs on a continuous scale plus values exactly on chart boundaries"""
+    from vectorized import random_profiles
+
+    rng = random.Random(seed)
+    payloads = random_profiles(rows, seed)
+    boundaries = [76, 79, 82, 85, 86, 88, 90, 91, 92, 94, 95, 97, 98, 100, 101, 102, 104, 106, 110, 113, 116]
+    for payload in payloads[::3]:
+        for name in payload['measurements']:
+            draw = rng.random()
+            if draw < 0.4:
+                payload['measurements'][name] = round(rng.uniform(30, 130), rng.choice([0, 1, 2, 6]))
+            elif draw < 0.6:
+                payload['measurements'][name] = float(rng.choice(boundaries)) - rng.choice([0, 2, 4, 6, 0.5])
+    return payloads
+
+
+def check_regions(payloads):
+    """Mismatches against the base engine and hit rates of region vs exact-key caching"""
+    base = ProfessionalSizeRecommendationEngine()
+    cached = RegionCachedEngine()
+    mismatches = []
+    exact_keys = {'top': set(), 'bottom': set(), 'body_type': set()}
+    exact_hits = {'top': 0, 'bottom': 0, 'body_type': 0}
+    for payload in payloads:
+        measurements, preferences = payload['measurements'], payload['fit_preferences']
+        gender, morphotype = payload['gender'], payload['morphotype']
+        for name, method, key in [
+            ('top', 'find_best_top_size', (measurements.get('poitrine'), measurements.get('epaules'),
+                                           preferences.get('poitrine'), preferences.get('epaules'))),
+            ('bottom', 'find_best_bottom_size', (measurements.get('bassin'), measurements.get('hanches'),
+                                                 preferences.get('bassin'), preferences.get('hanches')))
+        ]:
+            expected = getattr(base, method)(measurements, preferences, gender, morphotype)
+            actual = getattr(cached, method)(measurements, preferences, gender, morphotype)
+            if expected != actual:
+                mismatches.append(f'{name} {payload}: {actual} != {expected}')
+            key = key + (gender, morphotype)
+            exact_hits[name] += key in exact_keys[name]
+            exact_keys[name].add(key)
+
+        ratios = base.calculate_professional_ratios(
+            measurements.get('poitrine', 0), measurements.get('abdomen', measurements.get('bassin', 0)),
+            measurements.get('hanches', 0), measurements.get('epaules', 0), payload['height'])
+        expected = base.determine_professional_body_type(ratios, gender)
+        actual = cached.determine_professional_body_type(ratios, gender)
+        if expected != actual:
+            mismatches.append(f'body type {ratios}: {actual} != {expected}')
+        key = (ratios.get('shoulder_hip'), ratios.get('waist_hip'), gender.lower())
+        exact_hits['body_type'] += key in exact_keys['body_type']
+        exact_keys['body_type'].add(key)
+
+    metrics = cached.get_region_metrics()
+    return mismatches, {
+        'region_size_hit_rate': metrics['size_hit_rate'],
+        'exact_size_hit_rate': round((exact_hits['top'] + exact_hits['bottom']) / (2 * len(payloads)), 4),
+        'region_body_type_hit_rate': metrics['body_type_hit_rate'],
+        'exact_body_type_hit_rate': round(exact_hits['body_type'] / len(payloads), 4),
+        'size_regions': metrics['size_regions'],
+        'body_type_cells': metrics['body_type_cells']
+    }
+
+
+def check_thresholds():
+    """Body types on and around every threshold, where a wrong cell boundary would show"""
+    base = ProfessionalSizeRecommendationEngine()
+    cached = RegionCachedEngine()
+    values = set()
+    for thresholds in BODY_TYPE_THRESHOLDS.values():
+        for points in thresholds.values():
+            for point in points:
+                values.update([point, math.nextafter(point, 0), math.nextafter(point, 2),
+                               point - 0.001, point + 0.001])
+    values.update(step / 1000 for step in range(500, 1500))
+    mismatches = []
+    for gender in ['homme', 'femme']:
+        for shoulder_hip in values:
+            for waist_hip in values:
+                ratios = {'shoulder_hip': shoulder_hip, 'waist_hip': waist_hip}
+                if base.determine_professional_body_type(ratios, gender) != \
+                        cached.determine_professional_body_type(ratios, gender):
+                    mismatches.append(f'{gender} {ratios}')
+    return mismatches, len(values) ** 2 * 2
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the region cache against the engine and report hit rates')
+    parser.add_argument('--rows', type=int, default=50000, help='Number of random inputs')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    payloads = random_inputs(args.rows, args.seed)
+    mismatches, report = check_regions(payloads)
+    threshold_mismatches, cells_checked = check_thresholds()
+    for mismatch in (mismatches + threshold_mismatches)[:5]:
+        print(f'  MISMATCH {mismatch}')
+    print(f'sizes and body types: {len(mismatches)} mismatches in {len(payloads)} inputs')
+    print(f'body type thresholds: {len(threshold_mismatches)} mismatches in {cells_checked} ratio pairs')
+    print(f"  size hit rate       region {report['region_size_hit_rate']:.2%}  "
+          f"exact key {report['exact_size_hit_rate']:.2%}  ({report['size_regions']} region nodes)")
+    print(f"  body type hit rate  region {report['region_body_type_hit_rate']:.2%}  "
+          f"exact key {report['exact_body_type_hit_rate']:.2%}  ({report['body_type_cells']} cells)")
+
+    engine, base = RegionCachedEngine(), ProfessionalSizeRecommendationEngine()
+    timings = {}
+    for name, subject in [('engine', base), ('region cached', engine)]:
+        for payload in payloads:
+            subject.recommend_size(payload)
+        started = time.perf_counter()
+        for payload in payloads:
+            subject.recommend_size(payload)
+        timings[name] = (time.perf_counter() - started) / len(payloads) * 1e6
+    print(f"  recommend_size      engine {timings['engine']:.1f} us  region cached {timings['region cached']:.1f} us")
+    sys.exit(1 if mismatches or threshold_mismatches else 0)
@@ -0,0 +1,348 @@
+"""
+Professional Fashion Sizing API - Replay Harness
+Replays a captured traffic corpus through two engine versions or servers,
+reporting output differences and per-stage latency distributions side by side
+"""
+
+import argparse
+import importlib.util
+import itertools
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+
+from engine import STAGE_METHODS
+
+STAGES = [stage for stage, _ in STAGE_METHODS] + ['total']
+
+# Latency histogram: log-spaced bins from 100 ns to 10 s
+LATENCY_BINS = np.logspace(-4, 4, 321)
+
+MAX_EXAMPLES = 10
+
+
+def compared_fields(result):
+    """Output fields whose changes are reported"""
+    brand = result.get('brand_recommendations') or {}
+    fitting = result.get('virtual_fitting') or {}
+    return {
+        'top_size': result['sizes']['top']['size'],
+        'bottom_size': result['sizes']['bottom']['size'],
+        'brand_top_size': brand.get('top', {}).get('size'),
+        'brand_bottom_size': brand.get('bottom', {}).get('size'),
+        'body_type': result['body_analysis']['classification']['type'],
+        'proportional_harmony': result['body_analysis'].get('proportional_harmony'),
+        'confidence': result.get('confidence'),
+        'comfort_prediction': fitting.get('comfort_prediction'),
+        'top_fit': fitting.get('fit_analysis', {}).get('top', {}).get('fit'),
+        'bottom_fit': fitting.get('fit_analysis', {}).get('bottom', {}).get('fit')
+    }
+
+
+def _same(a, b):
+    if isinstance(a, float) and isinstance(b, float):
+        return a == b or (math.isnan(a) and math.isnan(b))
+    return a == b
+
+
+class EngineTarget:
+    """An engine version loaded from a source file, with per-stage timing"""
+
+    def __init__(self, path, name):
+        spec = importlib.util.spec_from_file_location(f'replay_engine_{name}', path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        self.engine = module.ProfessionalSizeRecommendationEngine()
+        self.timings = {}
+        for stage, method in STAGE_METHODS:
+            if hasattr(self.engine, method):
+                setattr(self.engine, method, self._timed(stage, getattr(self.engine, method)))
+
+    def _timed(self, stage, method):
+        timings = self.timings
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - started) * 1000
+        return timed
+
+    def run(self, payload):
+        self.timings.clear()
+        started = time.perf_counter()
+        result = self.engine.recommend_size(payload)
+        self.timings['total'] = (time.perf_counter() - started) * 1000
+        return result, dict(self.timings)
+
+
+class ServerTarget:
+    """A running API server; only the end-to-end latency is measured"""
+
+    def __init__(self, url):
+        self.url = url.rstrip('/') + '/api/recommend'
+
+    def run(self, payload):
+        request = urllib.request.Request(self.url, data=json.dumps(payload).encode('utf-8'),
+                                         headers={'Content-Type': 'application/json'})
+        started = time.perf_counter()
+        with urllib.request.urlopen(request, timeout=30) as response:
+            body = json.loads(response.read())
+        elapsed = (time.perf_counter() - started) * 1000
+        if not body.get('success'):
+            raise RuntimeError(body.get('error', 'request failed'))
+        return body['data'], {'total': elapsed}
+
+
+def resolve_target(spec, workdir):
+    """
+    Source of a target spec: a server URL, 'git:<ref>' for engine.py at a
+    git revision, or the path of an engine source file
+    """
+    if spec.startswith(('http://', 'https://')):
+        return spec
+    if spec.startswith('git:'):
+        ref = spec[len('git:'):]
+        root = os.path.dirname(os.path.abspath(__file__))
+        source = subprocess.run(['git', 'show', f'{ref}:engine.py'], cwd=root, capture_output=True,
+                                text=True, check=True).stdout
+        path = os.path.join(workdir, f"engine_{ref.replace('/', '_').replace('~', '_')}.py")
+        with open(path, 'w') as f:
+            f.write(source)
+        return path
+    if not os.path.exists(spec):
+        raise ValueError(f'No such engine source: {spec}')
+    return os.path.abspath(spec)
+
+
+def _make_target(source, name):
+    if source.startswith(('http://', 'https://')):
+        return ServerTarget(source)
+    return EngineTarget(source, name)
+
+
+_targets = None
+
+
+def _init_worker(baseline, candidate):
+    global _targets
+    import logging
+    logging.disable(logging.CRITICAL)
+    _targets = (_make_target(baseline, 'baseline'), _make_target(candidate, 'candidate'))
+
+
+def _empty_summary():
+    return {
+        'rows': 0,
+        'identical': 0,
+        'changed': 0,
+        'errors': {'baseline': 0, 'candidate': 0},
+        'field_diffs': {},
+        'examples': [],
+        'latency': {side: {stage: np.zeros(len(LATENCY_BINS) + 1, dtype=np.int64) for stage in STAGES}
+                    for side in ['baseline', 'candidate']}
+    }
+
+
+def _replay_chunk(chunk):
+    """Run one chunk of (line number, payload) pairs through both targets"""
+    summary = _empty_summary()
+    for line_number, payload in chunk:
+        summary['rows'] += 1
+        outputs = {}
+        # Alternate the order so warm caches do not favour one side
+        order = [0, 1] if line_number % 2 == 0 else [1, 0]
+        for index in order:
+            side = ['baseline', 'candidate'][index]
+            try:
+                result, timings = _targets[index].run(payload)
+                outputs[side] = result
+                for stage, elapsed in timings.items():
+                    summary['latency'][side][stage][np.searchsorted(LATENCY_BINS, elapsed)] += 1
+            except Exception as e:
+                outputs[side] = None
+                summary['errors'][side] += 1
+                if len(summary['examples']) < MAX_EXAMPLES:
+                    summary['examples'].append({'line': line_number, 'side': side, 'error': str(e)})
+
+        baseline, candidate = outputs['baseline'], outputs['candidate']
+        if baseline is None or candidate is None:
+            continue
+        if baseline == candidate:
+            summary['identical'] += 1
+            continue
+        summary['changed'] += 1
+        before, after = compared_fields(baseline), compared_fields(candidate)
+        changed = {name: {'baseline': before[name], 'candidate': after[name]}
+                   for name in before if not _same(before[name], after[name])}
+        for name in changed:
+            summary['field_diffs'][name] = summary['field_diffs'].get(name, 0) + 1
+        if changed and len(summary['examples']) < MAX_EXAMPLES:
+            summary['examples'].append({'line': line_number, 'payload': payload, 'changes': changed})
+    return summary
+
+
+def _merge(total, part):
+    total['rows'] += part['rows']
+    total['identical'] += part['identical']
+    total['changed'] += part['changed']
+    for side in total['errors']:
+        total['errors'][side] += part['errors'][side]
+    for name, count in part['field_diffs'].items():
+        total['field_diffs'][name] = total['field_diffs'].get(name, 0) + count
+    total['examples'].extend(part['examples'][:MAX_EXAMPLES - len(total['examples'])])
+    for side, stages in part['latency'].items():
+        for stage, counts in stages.items():
+            total['latency'][side][stage] += counts
+
+
+def _percentile(counts, q):
+    total = counts.sum()
+    if not total:
+        return None
+    index = int(np.searchsorted(np.cumsum(counts), q * total))
+    upper = LATENCY_BINS[min(index, len(LATENCY_BINS) - 1)]
+    return round(float(upper), 4)
+
+
+def latency_table(latency):
+    """p50/p90/p99 per stage and side, in milliseconds (upper bin edges)"""
+    table = {}
+    for stage in STAGES:
+        row = {}
+        for side in ['baseline', 'candidate']:
+            counts = latency[side][stage]
+            if counts.sum():
+                row[side] = {f'p{int(q * 100)}': _percentile(counts, q) for q in (0.5, 0.9, 0.99)}
+        if row:
+            table[stage] = row
+    return table
+
+
+def read_corpus(path):
+    """(line number, payload) pairs of a JSONL file or an event log directory"""
+    if os.path.isdir(path):
+        from event_log import EventLogReader, log_files
+        row = 0
+        for file_path in log_files(path):
+            reader = EventLogReader(file_path)
+            payloads = reader.iter_payloads()
+            try:
+                for payload in payloads:
+                    row += 1
+                    yield row, payload
+            finally:
+                # A consumer that stops early leaves the generator holding a block of the map
+                payloads.close()
+                reader.close()
+        return
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if line.strip():
+                yield line_number, json.loads(line)
+
+
+def _chunks(corpus, size):
+    chunk = []
+    for item in corpus:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def replay(corpus, baseline, candidate, workers=None, chunk_size=500):
+    """Replay a corpus through both targets in parallel worker processes"""
+    import multiprocessing
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+    total = _empty_summary()
+    started = time.perf_counter()
+    workers = workers or os.cpu_count()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=(baseline, candidate)) as pool:
+        pending = set()
+        for chunk in _chunks(corpus, chunk_size):
+            pending.add(pool.submit(_replay_chunk, chunk))
+            # Bound the chunks in flight so huge corpora stream through
+            if len(pending) >= workers * 4:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _merge(total, future.result())
+        for future in pending:
+            _merge(total, future.result())
+
+    return {
+        'rows': total['rows'],
+        'identical': total['identical'],
+        'changed': total['changed'],
+        'errors': total['errors'],
+        'field_diffs': dict(sorted(total['field_diffs'].items())),
+        'examples': total['examples'],
+        'latency_ms': latency_table(total['latency']),
+        'elapsed_seconds': round(time.perf_counter() - started, 2)
+    }
+
+
+def print_report(report, baseline, candidate):
+    print(f"Replayed {report['rows']} requests in {report['elapsed_seconds']} s")
+    print(f"  baseline  {baseline}")
+    print(f"  candidate {candidate}")
+    print(f"  identical {report['identical']}  changed {report['changed']}  "
+          f"errors {report['errors']['baseline']}/{report['errors']['candidate']}")
+    for name, count in report['field_diffs'].items():
+        print(f"    {name:<22} {count} rows differ")
+    for example in report['examples']:
+        print(f"    line {example['line']}: {json.dumps(example.get('changes') or example.get('error'))}")
+
+    print(f"  {'stage':<16} {'baseline p50/p90/p99 ms':>32} {'candidate p50/p90/p99 ms':>32}")
+    for stage, row in report['latency_ms'].items():
+        cells = []
+        for side in ['baseline', 'candidate']:
+            values = row.get(side)
+            cells.append('/'.join(f'{v:.4f}' for v in values.values()) if values else '-')
+        print(f"  {stage:<16} {cells[0]:>32} {cells[1]:>32}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay captured traffic through two engine versions')
+    parser.add_argument('corpus', help='JSONL file of recommendation payloads, or an event log directory')
+    parser.add_argument('--baseline', default='git:HEAD',
+                        help='Engine source file, git:<ref> or server URL (default: git:HEAD)')
+    parser.add_argument('--candidate', default='engine.py', help='Engine source file, git:<ref> or server URL')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--chunk-size', type=int, default=500, help='Payloads per worker task')
+    parser.add_argument('--limit', type=int, help='Replay only the first N payloads')
+    parser.add_argument('--json', action='store_true', help='Print the raw JSON report')
+    parser.add_argument('--fail-on-diff', action='store_true', help='Exit 1 when any output changed')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            baseline_source = resolve_target(args.baseline, workdir)
+            candidate_source = resolve_target(args.candidate, workdir)
+        except (ValueError, subprocess.CalledProcessError) as e:
+            print(f'Cannot resolve target: {e}', file=sys.stderr)
+            sys.exit(2)
+
+        corpus = read_corpus(args.corpus)
+        if args.limit:
+            corpus = itertools.islice(corpus, args.limit)
+        report = replay(corpus, baseline_source, candidate_source, args.workers, args.chunk_size)
+
+    if args.json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_report(report, args.baseline, args.candidate)
+    sys.exit(1 if args.fail_on_diff and (report['changed'] or any(report['errors'].values())) else 0)
@@ -0,0 +1,233 @@
+"""
+Professional Fashion Sizing API - Sampling Profiler
+Background thread that samples every thread's Python stack at a low rate,
+aggregates the samples in memory and exports collapsed stacks for flamegraphs
+"""
+
+import hmac
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import Blueprint, Response, request
+
+from negotiation import render
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HZ = 19.0
+TRUNCATED_STACK = ('[truncated]',)
+
+# Leaf frames of threads that are parked rather than running
+IDLE_FRAMES = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('selectors.py', 'select'),
+    ('socketserver.py', 'serve_forever'),
+    ('queue.py', 'get'),
+    ('connection.py', 'wait'),
+    ('connection.py', '_recv'),
+    ('popen_fork.py', 'poll'),
+    ('socket.py', 'accept'),
+    ('socket.py', 'readinto')
+}
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for live traffic
+    A daemon thread wakes hz times a second (with jitter, so periodic work is
+    not aliased), reads sys._current_frames() and counts each stack. Nothing
+    is hooked into the profiled code, so the cost is the sampling itself; the
+    thread measures its own duty cycle and reports it as overhead.
+    """
+
+    def __init__(self, hz=DEFAULT_HZ, max_stacks=20000, max_depth=96, include_idle=False):
+        self.hz = hz
+        self.max_stacks = max_stacks
+        self.max_depth = max_depth
+        self.include_idle = include_idle
+        self._lock = threading.Lock()
+        self._stacks = Counter()
+        self._labels = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._since = time.time()
+        self._counters = {'samples': 0, 'stacks_sampled': 0, 'idle_skipped': 0, 'truncated': 0}
+        self._sampling_seconds = 0.0
+        self._running_seconds = 0.0
+
+    @property
+    def enabled(self):
+        return self.hz > 0
+
+    def start(self):
+        """Start the sampling thread (no-op when disabled or already running)"""
+        if not self.enabled or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        logger.info(f"Sampling profiler started at {self.hz} Hz")
+        if not hasattr(self, '_fork_hook'):
+            # A forked worker inherits the state but not the thread
+            self._fork_hook = True
+            os.register_at_fork(after_in_child=self._restart_in_child)
+
+    def _restart_in_child(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.reset()
+        self.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f'{os.path.basename(code.co_filename)}:{code.co_name}'
+        return label
+
+    def _run(self):
+        own = threading.get_ident()
+        interval = 1.0 / self.hz
+        previous = time.perf_counter()
+        while not self._stop.wait(interval * random.uniform(0.5, 1.5)):
+            began = time.perf_counter()
+            self.sample(skip=own)
+            finished = time.perf_counter()
+            with self._lock:
+                self._sampling_seconds += finished - began
+                self._running_seconds += finished - previous
+            previous = finished
+
+    def sample(self, skip=None):
+        """Record the current stack of every thread except skip"""
+        stacks = []
+        idle = 0
+        frame = None
+        for ident, frame in sys._current_frames().items():
+            if ident == skip:
+                continue
+            code = frame.f_code
+            if not self.include_idle and (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                idle += 1
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.reverse()
+            stacks.append(tuple(stack))
+        del frame
+
+        with self._lock:
+            self._counters['samples'] += 1
+            self._counters['idle_skipped'] += idle
+            for stack in stacks:
+                self._counters['stacks_sampled'] += 1
+                if stack not in self._stacks and len(self._stacks) >= self.max_stacks:
+                    self._counters['truncated'] += 1
+                    stack = TRUNCATED_STACK
+                self._stacks[stack] += 1
+
+    def reset(self):
+        with self._lock:
+            self._stacks = Counter()
+            self._since = time.time()
+            for name in self._counters:
+                self._counters[name] = 0
+            self._sampling_seconds = 0.0
+            self._running_seconds = 0.0
+
+    def collapsed(self, reset=False):
+        """Samples in collapsed-stack format: 'frame;frame;frame count' per line"""
+        with self._lock:
+            stacks = self._stacks
+            if reset:
+                self._stacks = Counter()
+                self._since = time.time()
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(stacks.items()))
+
+    def top_functions(self, limit=20):
+        """Functions by self samples (leaf frame) and total samples (anywhere on the stack)"""
+        with self._lock:
+            stacks = list(self._stacks.items())
+        own, total = Counter(), Counter()
+        for stack, count in stacks:
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        samples = sum(own.values()) or 1
+        return [
+            {
+                'function': label,
+                'self_samples': count,
+                'self_pct': round(count / samples * 100, 2),
+                'total_pct': round(total[label] / samples * 100, 2)
+            }
+            for label, count in own.most_common(limit)
+        ]
+
+    def get_metrics(self):
+        with self._lock:
+            return {
+                **self._counters,
+                'hz': self.hz,
+                'running': self._thread is not None and self._thread.is_alive(),
+                'distinct_stacks': len(self._stacks),
+                'since': datetime.fromtimestamp(self._since).isoformat(),
+                'overhead_pct': round(self._sampling_seconds / self._running_seconds * 100, 4)
+                if self._running_seconds else 0.0
+            }
+
+
+def create_profiler_blueprint(profiler, admin_token=None):
+    """Admin routes for the sampling profiler"""
+    bp = Blueprint('profiler', __name__)
+
+    @bp.before_request
+    def check_token():
+        if not admin_token:
+            # Without a token the routes do not exist
+            return render({
+                'success': False,
+                'error': 'Admin routes are disabled; set SIZING_ADMIN_TOKEN to enable them',
+                'error_code': 'NOT_FOUND'
+            }), 404
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token):
+            return render({
+                'success': False,
+                'error': 'Admin token required',
+                'error_code': 'UNAUTHORIZED'
+            }), 401
+
+    @bp.route('/api/admin/profile', methods=['GET'])
+    def get_profile():
+        """Collapsed stacks (default) or a JSON summary with ?format=json; ?reset=true starts a new window"""
+        if not profiler.enabled:
+            return render({
+                'success': False,
+                'error': 'Sampling profiler is disabled (SIZING_PROFILER_HZ=0)',
+                'error_code': 'PROFILER_DISABLED'
+            }), 404
+
+        reset = request.args.get('reset', 'false').lower() == 'true'
+        if request.args.get('format', 'collapsed') == 'json':
+            data = {'metrics': profiler.get_metrics(), 'top_functions': profiler.top_functions(
+                request.args.get('limit', 20, type=int))}
+            if reset:
+                profiler.reset()
+            return render({'success': True, 'data': data, 'timestamp': datetime.now().isoformat()})
+        return Response(profiler.collapsed(reset=reset), mimetype='text/plain')
+
+    return bp
@@ -0,0 +1,368 @@
+"""
+Professional Fashion Sizing API - Measurement Sessions
+Interactive sessions that keep the last inputs and intermediate results and
+recompute only the pipeline stages affected by a delta of changed fields
+"""
+
+import copy
+import logging
+import pickle
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from flask import Blueprint
+
+from negotiation import parse_body, render
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ['measurements', 'fit_preferences', 'gender', 'height', 'morphotype']
+NESTED_FIELDS = ['measurements', 'fit_preferences']
+SCALAR_FIELDS = ['gender', 'height', 'morphotype', 'brand']
+
+# Pipeline of recommend_size as (stage, dependencies, compute). A dependency
+# is an input path ('measurements.hanches'), a whole input ('measurements'
+# matches every measurement), an earlier stage, or 'brand_offsets' for the
+# brand offsets learned from fit feedback.
+STAGES = [
+    ('body_analysis', ['measurements', 'gender', 'height'],
+     lambda engine, i, s: engine.analyze_body_proportions_professional(
+         i['measurements'], i['gender'], i['height'])),
+    ('top_size', ['measurements.poitrine', 'measurements.epaules',
+                  'fit_preferences.poitrine', 'fit_preferences.epaules', 'gender', 'morphotype'],
+     lambda engine, i, s: engine.find_best_top_size(
+         i['measurements'], i['fit_preferences'], i['gender'], i['morphotype'])),
+    ('bottom_size', ['measurements.bassin', 'measurements.hanches',
+                     'fit_preferences.bassin', 'fit_preferences.hanches', 'gender', 'morphotype'],
+     lambda engine, i, s: engine.find_best_bottom_size(
+         i['measurements'], i['fit_preferences'], i['gender'], i['morphotype'])),
+    ('sizes', ['top_size', 'bottom_size', 'gender'],
+     lambda engine, i, s: engine.build_sizes(s['top_size'], s['bottom_size'], i['gender'])),
+    ('brand_recommendations', ['top_size', 'bottom_size', 'brand', 'brand_offsets'],
+     lambda engine, i, s: engine.get_brand_recommendations(s['top_size'], s['bottom_size'], i['brand'])),
+    ('outfit_recommendations', ['body_analysis', 'sizes', 'gender', 'morphotype'],
+     lambda engine, i, s: engine.generate_professional_outfit_recommendations(
+         s['body_analysis'], s['sizes'], i['gender'], i['morphotype'])),
+    ('virtual_fitting', ['measurements', 'sizes', 'body_analysis'],
+     lambda engine, i, s: engine.generate_virtual_fitting(i['measurements'], s['sizes'], s['body_analysis'])),
+    ('confidence', ['measurements', 'fit_preferences', 'body_analysis'],
+     lambda engine, i, s: engine.calculate_professional_confidence(
+         i['measurements'], i['fit_preferences'], s['body_analysis'])),
+    ('recommendation', ['sizes', 'brand_recommendations', 'body_analysis', 'virtual_fitting',
+                        'confidence', 'outfit_recommendations'],
+     lambda engine, i, s: engine.assemble_recommendation(
+         s['sizes'], s['brand_recommendations'], s['body_analysis'], s['virtual_fitting'],
+         s['confidence'], s['outfit_recommendations'])),
+]
+
+STAGE_NAMES = [name for name, _, _ in STAGES]
+
+
+def normalize_inputs(data):
+    """Keep only the fields the pipeline reads, with an empty brand by default"""
+    inputs = {field: copy.deepcopy(dict(data[field])) for field in NESTED_FIELDS}
+    for field in SCALAR_FIELDS:
+        inputs[field] = data.get(field, '') if field == 'brand' else data[field]
+    return inputs
+
+
+def apply_delta(inputs, delta):
+    """New inputs with the delta merged in, and the set of changed input paths"""
+    updated = {field: dict(inputs[field]) for field in NESTED_FIELDS}
+    updated.update({field: inputs[field] for field in SCALAR_FIELDS})
+    changed = set()
+
+    for field, value in delta.items():
+        if field in NESTED_FIELDS:
+            if not isinstance(value, dict):
+                raise ValueError(f'{field} must be an object of changed values')
+            for key, item in value.items():
+                if updated[field].get(key) != item:
+                    updated[field][key] = copy.deepcopy(item)
+                    changed.add(f'{field}.{key}')
+        elif field in SCALAR_FIELDS:
+            if updated[field] != value:
+                updated[field] = value
+                changed.add(field)
+        else:
+            raise ValueError(f'Unknown field: {field}')
+
+    return updated, changed
+
+
+def estimate_size(inputs, results):
+    """
+    Estimated footprint of a session in bytes
+    The pickled size counts shared objects once, as memory does; resident
+    objects take about 2.5 times as much, which max_bytes allows for.
+    """
+    return len(pickle.dumps((inputs, results), pickle.HIGHEST_PROTOCOL))
+
+
+def _is_dirty(dependencies, dirty):
+    for dependency in dependencies:
+        if dependency in dirty:
+            return True
+        if '.' not in dependency and any(path.startswith(dependency + '.') for path in dirty):
+            return True
+    return False
+
+
+def run_stages(engine, inputs, previous, dirty):
+    """
+    Recompute the stages reachable from the dirty paths
+    A stage whose output is unchanged stops the propagation to its dependents.
+    Returns the new stage results and the names of the stages that ran.
+    """
+    results = dict(previous)
+    dirty = set(dirty)
+    recomputed = []
+
+    for name, dependencies, compute in STAGES:
+        if name in results and not _is_dirty(dependencies, dirty):
+            continue
+        value = compute(engine, inputs, results)
+        recomputed.append(name)
+        if name not in results or results[name] != value:
+            dirty.add(name)
+        results[name] = value
+
+    return results, recomputed
+
+
+class SizingSession:
+    """Inputs and stage results of one interactive fitting session"""
+
+    def __init__(self, session_id, inputs, results, offsets_version=0):
+        self.session_id = session_id
+        self.inputs = inputs
+        self.results = results
+        self.offsets_version = offsets_version
+        self.size = estimate_size(inputs, results)
+        self.updates = 0
+        self.lock = threading.Lock()
+        self.touched_at = time.monotonic()
+
+    def to_dict(self, recomputed=None):
+        data = {
+            'session_id': self.session_id,
+            'inputs': self.inputs,
+            'recommendation': self.results['recommendation'],
+            'updates': self.updates
+        }
+        if recomputed is not None:
+            data['recomputed_stages'] = recomputed
+        return data
+
+
+class SessionStore:
+    """
+    LRU of sizing sessions bounded by their estimated size, with idle expiry
+    With a feedback learner, an update after its brand offsets changed also
+    recomputes the brand recommendations.
+    """
+
+    def __init__(self, engine, max_bytes=48 * 1024 * 1024, ttl_seconds=1800, feedback_learner=None):
+        self.engine = engine
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.feedback_learner = feedback_learner
+        self._sessions = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'created': 0, 'updated': 0, 'expired': 0, 'evicted': 0, 'deleted': 0}
+        self._stage_runs = {name: 0 for name in STAGE_NAMES}
+        self._stage_skips = {name: 0 for name in STAGE_NAMES}
+
+    def _expire(self, now):
+        """Drop idle sessions; the least recently used ones are at the front"""
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.touched_at < self.ttl_seconds:
+                break
+            self._remove(session.session_id)
+            self._stats['expired'] += 1
+
+    def _remove(self, session_id):
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._bytes -= session.size
+        return session
+
+    def _evict(self):
+        """Drop the least recently used sessions until the rest fit in max_bytes"""
+        while self._bytes > self.max_bytes and len(self._sessions) > 1:
+            self._remove(next(iter(self._sessions)))
+            self._stats['evicted'] += 1
+
+    def _offsets_version(self):
+        return self.feedback_learner.version if self.feedback_learner is not None else 0
+
+    def _count_stages(self, recomputed):
+        with self._lock:
+            for name in STAGE_NAMES:
+                if name in recomputed:
+                    self._stage_runs[name] += 1
+                else:
+                    self._stage_skips[name] += 1
+
+    def create(self, data):
+        """Start a session from a full recommendation payload"""
+        inputs = normalize_inputs(data)
+        # Read before computing, so offsets changing meanwhile are picked up by the next update
+        offsets_version = self._offsets_version()
+        results, recomputed = run_stages(self.engine, inputs, {}, set())
+        session = SizingSession(uuid.uuid4().hex, inputs, results, offsets_version)
+
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            session.touched_at = now
+            self._sessions[session.session_id] = session
+            self._bytes += session.size
+            self._evict()
+            self._stats['created'] += 1
+        self._count_stages(recomputed)
+        return session.to_dict(recomputed)
+
+    def get(self, session_id):
+        """Session by id, refreshing its LRU position (None when unknown or expired)"""
+        with self._lock:
+            now = time.monotonic()
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is not None:
+                session.touched_at = now
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def update(self, session_id, delta):
+        """Apply a delta of changed fields and recompute the affected stages"""
+        session = self.get(session_id)
+        if session is None:
+            return None
+
+        with session.lock:
+            inputs, changed = apply_delta(session.inputs, delta)
+            offsets_version = self._offsets_version()
+            if offsets_version != session.offsets_version:
+                changed.add('brand_offsets')
+            results, recomputed = run_stages(self.engine, inputs, session.results, changed)
+            session.inputs = inputs
+            session.results = results
+            session.offsets_version = offsets_version
+            session.updates += 1
+            data = session.to_dict(recomputed)
+            size = estimate_size(inputs, results)
+
+        with self._lock:
+            # A session expired or deleted meanwhile is no longer counted
+            if self._sessions.get(session_id) is session:
+                self._bytes += size - session.size
+                session.size = size
+                self._evict()
+            self._stats['updated'] += 1
+        self._count_stages(recomputed)
+        return data
+
+    def delete(self, session_id):
+        with self._lock:
+            if self._remove(session_id) is None:
+                return False
+            self._stats['deleted'] += 1
+            return True
+
+    def get_metrics(self):
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                'active': len(self._sessions),
+                'estimated_bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds,
+                **self._stats,
+                'stage_runs': dict(self._stage_runs),
+                'stage_skips': dict(self._stage_skips)
+            }
+
+
+def create_sessions_blueprint(store):
+    """Flask routes for interactive measurement sessions"""
+    bp = Blueprint('sessions', __name__)
+
+    def session_not_found(session_id):
+        return render({
+            'success': False,
+            'error': f'Session not found or expired: {session_id}',
+            'error_code': 'SESSION_NOT_FOUND'
+        }), 404
+
+    @bp.route('/api/sessions', methods=['POST'])
+    def create_session():
+        """Start a session from a full recommendation payload"""
+        try:
+            data = parse_body()
+            for field in REQUIRED_FIELDS:
+                if field not in data:
+                    return render({
+                        'success': False,
+                        'error': f'Missing required field: {field}',
+                        'error_code': 'MISSING_FIELD'
+                    }), 400
+
+            return render({'success': True, 'data': store.create(data)}), 201
+
+        except Exception as e:
+            logger.error(f"Error in create_session endpoint: {str(e)}")
+            return render({
+                'success': False,
+                'error': str(e),
+                'error_code': 'PROCESSING_ERROR'
+            }), 500
+
+    @bp.route('/api/sessions/<session_id>', methods=['PATCH'])
+    def update_session(session_id):
+        """Apply changed fields and return the updated recommendation"""
+        try:
+            delta = parse_body()
+            if not isinstance(delta, dict):
+                raise ValueError('Expected an object of changed fields')
+            data = store.update(session_id, delta)
+        except ValueError as e:
+            return render({
+                'success': False,
+                'error': str(e),
+                'error_code': 'INVALID_DELTA'
+            }), 400
+        except Exception as e:
+            logger.error(f"Error in update_session endpoint: {str(e)}")
+            return render({
+                'success': False,
+                'error': str(e),
+                'error_code': 'PROCESSING_ERROR'
+            }), 500
+
+        if data is None:
+            return session_not_found(session_id)
+        return render({'success': True, 'data': data})
+
+    @bp.route('/api/sessions/<session_id>', methods=['GET'])
+    def get_session(session_id):
+        """Current inputs and recommendation of a session"""
+        session = store.get(session_id)
+        if session is None:
+            return session_not_found(session_id)
+        with session.lock:
+            data = session.to_dict()
+        return render({'success': True, 'data': data})
+
+    @bp.route('/api/sessions/<session_id>', methods=['DELETE'])
+    def delete_session(session_id):
+        """End a session"""
+        if not store.delete(session_id):
+            return session_not_found(session_id)
+        return render({'success': True, 'data': {'session_id': session_id}})
+
+    return bp
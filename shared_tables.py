@@ -0,0 +1,324 @@
+"""
+Professional Fashion Sizing API - Shared Engine Tables
+Compiles the engine's size charts, brand, fit and morphotype tables into one
+flat binary image that is built once and attached read-only by every worker,
+either through multiprocessing.shared_memory or a memory-mapped file
+"""
+
+import atexit
+import json
+import math
+import mmap
+import struct
+from array import array
+from collections.abc import Mapping
+
+MAGIC = b'SZTBL001'
+PREAMBLE = struct.Struct('<8sI4x')
+
+# Engine attributes stored in the image, in build order
+TABLE_ATTRIBUTES = [
+    'men_top_sizes',
+    'women_top_sizes',
+    'men_bottom_sizes',
+    'women_bottom_sizes',
+    'brand_adjustments',
+    'fit_adjustments',
+    'morphotype_adjustments'
+]
+
+
+def _align(data):
+    data.extend(b'\0' * (-len(data) % 8))
+
+
+class _ImageBuilder:
+    """Accumulates aligned arrays and a deduplicated string blob"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.blob = bytearray()
+        self._strings = {}
+
+    def add_array(self, typecode, values):
+        _align(self.data)
+        offset = len(self.data)
+        self.data.extend(array(typecode, values).tobytes())
+        return offset
+
+    def add_string(self, value):
+        if value not in self._strings:
+            encoded = value.encode('utf-8')
+            self._strings[value] = (len(self.blob), len(self.blob) + len(encoded))
+            self.blob.extend(encoded)
+        return self._strings[value]
+
+    def add_strings(self, values):
+        """Store strings as (start, end) pairs into the blob; (-1, -1) marks absent"""
+        bounds = []
+        for value in values:
+            bounds.extend((-1, -1) if value is None else self.add_string(value))
+        return self.add_array('q', bounds)
+
+
+def _column_kind(name, value):
+    if isinstance(value, bool):
+        raise ValueError(f'Unsupported boolean value in column {name}')
+    if isinstance(value, tuple) and len(value) == 2 and all(isinstance(v, (int, float)) for v in value):
+        return 'int_range' if all(isinstance(v, int) for v in value) else 'float_range'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, str):
+        return 'str'
+    raise ValueError(f'Unsupported value for column {name}: {value!r}')
+
+
+def _build_table(builder, rows):
+    """Lay out one {row_name: {column: value}} table column by column"""
+    names = list(rows)
+    columns = {}
+    for row in rows.values():
+        for column, value in row.items():
+            kind = _column_kind(column, value)
+            previous = columns.setdefault(column, kind)
+            if previous != kind:
+                if {previous, kind} <= {'int', 'float'} or {previous, kind} <= {'int_range', 'float_range'}:
+                    columns[column] = kind if kind.startswith('float') else previous
+                else:
+                    raise ValueError(f'Column {column} mixes {previous} and {kind} values')
+
+    nan = float('nan')
+    layout = []
+    for column, kind in columns.items():
+        values = [row.get(column) for row in rows.values()]
+        entry = {'name': column, 'kind': kind}
+        if kind == 'str':
+            entry['offset'] = builder.add_strings(values)
+        elif kind.endswith('range'):
+            entry['offset'] = builder.add_array('d', [nan if v is None else v[0] for v in values])
+            entry['offset_hi'] = builder.add_array('d', [nan if v is None else v[1] for v in values])
+        else:
+            entry['offset'] = builder.add_array('d', [nan if v is None else v for v in values])
+        layout.append(entry)
+
+    return {
+        'rows': len(names),
+        'names': builder.add_strings(names),
+        'order': builder.add_array('i', sorted(range(len(names)), key=names.__getitem__)),
+        'columns': layout
+    }
+
+
+def compile_tables(engine, metadata=None):
+    """Compile the engine tables into a binary image"""
+    builder = _ImageBuilder()
+    tables = {attr: _build_table(builder, getattr(engine, attr)) for attr in TABLE_ATTRIBUTES}
+
+    _align(builder.data)
+    header = json.dumps({
+        'version': 1,
+        'metadata': metadata or {},
+        'tables': tables,
+        'blob': {'offset': len(builder.data), 'length': len(builder.blob)}
+    }).encode('utf-8')
+    header += b' ' * (-(PREAMBLE.size + len(header)) % 8)
+
+    return PREAMBLE.pack(MAGIC, len(header)) + header + bytes(builder.data) + bytes(builder.blob)
+
+
+class _RowView(Mapping):
+    """Read-only row of a shared table, decoded once when the table is attached"""
+
+    __slots__ = ('_values',)
+
+    def __init__(self, table, index):
+        self._values = {}
+        for column in table.column_names:
+            value = table.value(column, index)
+            if value is not None:
+                self._values[column] = value
+
+    def __getitem__(self, column):
+        return self._values[column]
+
+    def get(self, column, default=None):
+        return self._values.get(column, default)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def items(self):
+        return self._values.items()
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class SharedTable(Mapping):
+    """
+    Read-only view of one engine table in row order
+    The columns stay in the shared buffer; row names and rows are decoded
+    once at attach time, so lookups on the request path are dict lookups.
+    """
+
+    def __init__(self, data, blob, layout, views):
+        self._blob = blob
+        self._rows = layout['rows']
+
+        def cast(offset, width, typecode):
+            raw = data[offset:offset + width * self._rows]
+            view = raw.cast(typecode)
+            views.extend((raw, view))
+            return view
+
+        self._names = cast(layout['names'], 16, 'q')
+        self._columns = {}
+        for entry in layout['columns']:
+            kind = entry['kind']
+            column = {'kind': kind}
+            if kind == 'str':
+                column['values'] = cast(entry['offset'], 16, 'q')
+            else:
+                column['values'] = cast(entry['offset'], 8, 'd')
+            if kind.endswith('range'):
+                column['hi'] = cast(entry['offset_hi'], 8, 'd')
+            self._columns[entry['name']] = column
+        self.column_names = list(self._columns)
+        self._row_names = [self._string(self._names, index) for index in range(self._rows)]
+        self._index = {name: index for index, name in enumerate(self._row_names)}
+        self._row_views = [_RowView(self, index) for index in range(self._rows)]
+
+    def _string(self, bounds, index):
+        start, end = bounds[2 * index], bounds[2 * index + 1]
+        if start < 0:
+            return None
+        return bytes(self._blob[start:end]).decode('utf-8')
+
+    def name(self, index):
+        return self._row_names[index]
+
+    def value(self, column, index):
+        """Decoded cell value, None when the row has no value for the column"""
+        entry = self._columns.get(column)
+        if entry is None:
+            return None
+        kind = entry['kind']
+        if kind == 'str':
+            return self._string(entry['values'], index)
+        value = entry['values'][index]
+        if math.isnan(value):
+            return None
+        if kind == 'int':
+            return int(value)
+        if kind == 'float':
+            return value
+        hi = entry['hi'][index]
+        return (int(value), int(hi)) if kind == 'int_range' else (value, hi)
+
+    def index_of(self, name):
+        """Row index by name, None when absent"""
+        return self._index.get(name)
+
+    def __getitem__(self, name):
+        index = self._index.get(name)
+        if index is None:
+            raise KeyError(name)
+        return self._row_views[index]
+
+    def get(self, name, default=None):
+        index = self._index.get(name)
+        return default if index is None else self._row_views[index]
+
+    def __contains__(self, name):
+        return isinstance(name, str) and name in self._index
+
+    def __iter__(self):
+        return iter(self._row_names)
+
+    def items(self):
+        return zip(self._row_names, self._row_views)
+
+    def __len__(self):
+        return self._rows
+
+
+class SharedTables:
+    """All engine tables over one read-only buffer"""
+
+    def __init__(self, buffer):
+        view = memoryview(buffer).toreadonly()
+        magic, header_len = PREAMBLE.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError('Not an engine table image')
+        header = json.loads(bytes(view[PREAMBLE.size:PREAMBLE.size + header_len]))
+        data = view[PREAMBLE.size + header_len:]
+        blob = data[header['blob']['offset']:header['blob']['offset'] + header['blob']['length']]
+        self.version = header['version']
+        self.metadata = header.get('metadata', {})
+        self._views = [view, data, blob]
+        self.tables = {
+            name: SharedTable(data, blob, layout, self._views) for name, layout in header['tables'].items()
+        }
+        # Keeps the mapping or shared memory block alive while views exist
+        self._owner = buffer
+        self.block = None
+
+    def table(self, name):
+        return self.tables[name]
+
+    def close(self):
+        """Release every view so the underlying mapping can be closed"""
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if self.block is not None:
+            self.block.close()
+            self.block = None
+
+
+def to_builtin(value):
+    """Convert shared table views back to plain dicts for serialization"""
+    if isinstance(value, (SharedTable, _RowView)):
+        return {key: to_builtin(item) for key, item in value.items()}
+    return value
+
+
+def write_tables_file(engine, path, metadata=None):
+    """Build the image into a file for workers to memory-map"""
+    image = compile_tables(engine, metadata)
+    with open(path, 'wb') as f:
+        f.write(image)
+    return len(image)
+
+
+def map_tables_file(path):
+    """Memory-map a table image file read-only"""
+    with open(path, 'rb') as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return SharedTables(mapping)
+
+
+def publish_shared_memory(engine, name=None):
+    """Build the image into a new shared memory block owned by the caller"""
+    from multiprocessing import shared_memory
+    image = compile_tables(engine)
+    block = shared_memory.SharedMemory(name=name, create=True, size=len(image))
+    block.buf[:len(image)] = image
+    return block
+
+
+def attach_shared_memory(name):
+    """Attach to a published shared memory block read-only"""
+    from multiprocessing import shared_memory
+    block = shared_memory.SharedMemory(name=name)
+    tables = SharedTables(block.buf)
+    tables.block = block
+    # Views must be released before the block is closed at interpreter exit
+    atexit.register(tables.close)
+    return tables
+
@@ -0,0 +1,101 @@
+"""
+Professional Fashion Sizing API - Single-Flight Coalescing
+Concurrent identical recommendation requests share one engine computation
+"""
+
+import json
+import threading
+
+# Payload fields that influence the engine output
+KEY_FIELDS = ['measurements', 'fit_preferences', 'gender', 'height', 'morphotype', 'brand']
+
+# String fields the engine only ever reads through .lower()
+CASE_INSENSITIVE_FIELDS = ['gender', 'morphotype', 'brand']
+
+
+def canonical_key(data):
+    """Build a canonical key for a recommendation payload"""
+    canonical = {}
+    for field in KEY_FIELDS:
+        if field not in data:
+            continue
+        value = data[field]
+        if field in CASE_INSENSITIVE_FIELDS and isinstance(value, str):
+            value = value.lower()
+        elif field == 'fit_preferences' and isinstance(value, dict):
+            value = {k: v.lower() if isinstance(v, str) else v for k, v in value.items()}
+        canonical[field] = value
+    return json.dumps(canonical, sort_keys=True, separators=(',', ':'), default=str)
+
+
+class _Call:
+    """A computation in flight and the requests waiting on it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    In-flight deduplication of identical computations
+    The first caller for a key runs the computation, later callers for the
+    same key wait for it and receive the same result (or exception)
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    def do(self, key, fn):
+        """Run fn once for all concurrent callers sharing the same key"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                self.max_waiters = max(self.max_waiters, call.waiters)
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result
+
+    def get_metrics(self):
+        """Current coalescing counters"""
+        with self._lock:
+            in_flight = len(self._calls)
+            waiting = sum(call.waiters for call in self._calls.values())
+        total = self.executions + self.coalesced
+        return {
+            'in_flight': in_flight,
+            'waiting': waiting,
+            'executions': self.executions,
+            'coalesced': self.coalesced,
+            'max_waiters': self.max_waiters,
+            'coalesce_rate': round(self.coalesced / total, 4) if total else 0.0
+        }
@@ -0,0 +1,173 @@
+"""
+Professional Fashion Sizing API - Slow Request Log
+Keeps the N slowest recommendation requests with their canonical payload,
+per-stage timings and worker id so tail-latency cases can be replayed offline
+"""
+
+import hashlib
+import heapq
+import hmac
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+
+from flask import Blueprint, Response, request
+
+from engine import STAGE_METHODS
+from negotiation import render
+
+TIMED_STAGES = STAGE_METHODS + [('assemble', 'assemble_recommendation')]
+
+
+class StageTimer:
+    """
+    Per-thread stage timings of the serving engine
+    Wraps the engine's stage methods; each request thread starts with begin()
+    and its timings never mix with other threads'.
+    """
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        for stage, method in TIMED_STAGES:
+            setattr(engine, method, self._timed(stage, getattr(engine, method)))
+
+    def _timed(self, stage, method):
+        local = self._local
+
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timings = getattr(local, 'timings', None)
+                if timings is not None:
+                    timings[stage] = timings.get(stage, 0.0) + (time.perf_counter() - started) * 1000
+        return timed
+
+    def begin(self):
+        self._local.timings = {}
+
+    def timings(self):
+        """Stage timings (ms) recorded by the current thread since begin()"""
+        return dict(getattr(self._local, 'timings', None) or {})
+
+
+class SlowRequestLog:
+    """
+    The capacity slowest requests seen, in a fixed-size min-heap
+    The fast path is one comparison against the current floor (the fastest
+    entry once full), read without the lock; only a request slower than the
+    floor takes the lock, re-checks and replaces that entry.
+    """
+
+    def __init__(self, capacity=50, threshold_ms=0.0):
+        self.capacity = capacity
+        self.threshold_ms = threshold_ms
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self._lock = threading.Lock()
+        self._heap = []
+        self._sequence = itertools.count()
+        self._floor = threshold_ms
+        self.observed = 0
+        self.captured = 0
+
+    def record(self, latency_ms, key, stage_timer=None):
+        """Offer one request by its canonical_key(); returns True when it was kept"""
+        # Unlocked: a stale floor only lets a request through to the locked
+        # re-check, and a lost increment of the counter is harmless
+        self.observed += 1
+        if latency_ms <= self._floor:
+            return False
+
+        entry = {
+            'latency_ms': round(latency_ms, 3),
+            'timestamp': datetime.now().isoformat(),
+            'worker': f'{self.worker}:{threading.current_thread().name}',
+            'fingerprint': hashlib.sha1(key.encode('utf-8')).hexdigest()[:16],
+            'stages': {stage: round(ms, 3) for stage, ms in stage_timer.timings().items()} if stage_timer else {},
+            'payload': json.loads(key)
+        }
+        # Cached and coalesced requests reuse a result computed elsewhere
+        entry['reused_result'] = stage_timer is not None and not entry['stages']
+        # Time spent outside the engine stages: cache reads, coalescing waits, contention
+        entry['outside_stages_ms'] = round(latency_ms - sum(entry['stages'].values()), 3)
+
+        with self._lock:
+            if len(self._heap) < self.capacity:
+                heapq.heappush(self._heap, (latency_ms, next(self._sequence), entry))
+            elif latency_ms > self._heap[0][0]:
+                heapq.heapreplace(self._heap, (latency_ms, next(self._sequence), entry))
+            else:
+                return False
+            if len(self._heap) == self.capacity:
+                self._floor = max(self.threshold_ms, self._heap[0][0])
+            self.captured += 1
+        return True
+
+    def entries(self, limit=None):
+        """Kept requests, slowest first"""
+        with self._lock:
+            ordered = sorted(self._heap, key=lambda item: (-item[0], item[1]))
+        return [entry for _, _, entry in ordered[:limit]]
+
+    def reset(self):
+        with self._lock:
+            self._heap = []
+            self._floor = self.threshold_ms
+
+    def get_metrics(self):
+        with self._lock:
+            return {
+                'capacity': self.capacity,
+                'kept': len(self._heap),
+                'observed': self.observed,
+                'captured': self.captured,
+                'floor_ms': round(self._floor, 3),
+                'slowest_ms': round(max(latency for latency, _, _ in self._heap), 3) if self._heap else None
+            }
+
+
+def create_slow_requests_blueprint(slow_log, admin_token=None):
+    """Admin routes for the slow request log"""
+    bp = Blueprint('slow_requests', __name__)
+
+    @bp.before_request
+    def check_token():
+        if not admin_token:
+            # Payloads hold customer measurements; without a token the routes do not exist
+            return render({
+                'success': False,
+                'error': 'Admin routes are disabled; set SIZING_ADMIN_TOKEN to enable them',
+                'error_code': 'NOT_FOUND'
+            }), 404
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token):
+            return render({
+                'success': False,
+                'error': 'Admin token required',
+                'error_code': 'UNAUTHORIZED'
+            }), 401
+
+    @bp.route('/api/admin/slow-requests', methods=['GET'])
+    def get_slow_requests():
+        """Slowest requests first; ?format=jsonl returns their payloads as a replay corpus"""
+        entries = slow_log.entries(request.args.get('limit', type=int))
+        if request.args.get('format') == 'jsonl':
+            return Response(''.join(json.dumps(entry['payload']) + '\n' for entry in entries),
+                            mimetype='application/x-ndjson')
+        return render({
+            'success': True,
+            'data': {'requests': entries, 'metrics': slow_log.get_metrics()},
+            'timestamp': datetime.now().isoformat()
+        })
+
+    @bp.route('/api/admin/slow-requests', methods=['DELETE'])
+    def reset_slow_requests():
+        """Forget the kept requests"""
+        slow_log.reset()
+        return render({'success': True})
+
+    return bp
@@ -0,0 +1,132 @@
+"""
+Professional Fashion Sizing API - Engine Snapshots
+Build step that validates the engine tables and static content and compiles
+them into one versioned binary snapshot, and a loader that memory-maps it at
+startup instead of rebuilding the tables from Python literals
+"""
+
+import argparse
+import sys
+from datetime import datetime
+
+from shared_tables import map_tables_file, write_tables_file
+from static_content import build_static_content
+
+SNAPSHOT_VERSION = 2
+
+STATIC_PAYLOADS = ['measurement_guide', 'health', 'sizes']
+
+TOP_CHARTS = ['men_top_sizes', 'women_top_sizes']
+BOTTOM_CHARTS = ['men_bottom_sizes', 'women_bottom_sizes']
+
+
+def _check_range(problems, where, value):
+    if not (isinstance(value, tuple) and len(value) == 2 and
+            all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)):
+        problems.append(f'{where}: expected a (min, max) tuple, got {value!r}')
+    elif value[0] > value[1]:
+        problems.append(f'{where}: min {value[0]} is above max {value[1]}')
+
+
+def validate_tables(engine):
+    """List every problem in the engine tables (empty when valid)"""
+    problems = []
+
+    for attr in TOP_CHARTS + BOTTOM_CHARTS:
+        chart = getattr(engine, attr)
+        if not chart:
+            problems.append(f'{attr}: chart is empty')
+        required = ['chest'] if attr in TOP_CHARTS else ['waist', 'hips']
+        for size, ranges in chart.items():
+            for dimension in required:
+                if dimension not in ranges:
+                    problems.append(f'{attr}[{size}]: missing {dimension} range')
+            for dimension, value in ranges.items():
+                _check_range(problems, f'{attr}[{size}][{dimension}]', value)
+
+    for brand, data in engine.brand_adjustments.items():
+        if brand != brand.lower():
+            problems.append(f'brand_adjustments[{brand}]: keys are looked up lowercased')
+        for field in ['top', 'bottom']:
+            if not isinstance(data.get(field), int) or isinstance(data.get(field), bool):
+                problems.append(f'brand_adjustments[{brand}][{field}]: expected an integer offset')
+        for field in ['note', 'fit_style']:
+            if not isinstance(data.get(field), str):
+                problems.append(f'brand_adjustments[{brand}][{field}]: expected a string')
+
+    for fit, data in engine.fit_adjustments.items():
+        if fit != fit.lower():
+            problems.append(f'fit_adjustments[{fit}]: keys are looked up lowercased')
+        if not isinstance(data.get('ease'), (int, float)):
+            problems.append(f'fit_adjustments[{fit}][ease]: expected a number')
+
+    for morphotype, data in engine.morphotype_adjustments.items():
+        if morphotype != morphotype.lower():
+            problems.append(f'morphotype_adjustments[{morphotype}]: keys are looked up lowercased')
+        for field in ['chest', 'waist', 'hips']:
+            if not isinstance(data.get(field), (int, float)):
+                problems.append(f'morphotype_adjustments[{morphotype}][{field}]: expected a number')
+
+    return problems
+
+
+def validate_static_content(content):
+    """List every problem in the static endpoint payloads (empty when valid)"""
+    problems = []
+
+    for name in STATIC_PAYLOADS:
+        if not isinstance(content.get(name), dict) or not content[name]:
+            problems.append(f'static_content[{name}]: expected a non-empty object')
+
+    for field, guide in content.get('measurement_guide', {}).get('measurements', {}).items():
+        for key in ['name', 'description', 'professional_notes']:
+            if not isinstance(guide.get(key), str):
+                problems.append(f'measurement_guide[{field}][{key}]: expected a string')
+        for key in ['instructions', 'tips']:
+            if not (isinstance(guide.get(key), list) and all(isinstance(item, str) for item in guide[key])):
+                problems.append(f'measurement_guide[{field}][{key}]: expected a list of strings')
+
+    return problems
+
+
+def build_snapshot(engine, path):
+    """Validate the engine tables and static content and write them as a snapshot file"""
+    static_content = build_static_content(engine)
+    problems = validate_tables(engine) + validate_static_content(static_content)
+    if problems:
+        raise ValueError('Invalid snapshot data:\n' + '\n'.join(problems))
+    # The static payloads are small, so they ride in the JSON header
+    metadata = {
+        'snapshot_version': SNAPSHOT_VERSION,
+        'built_at': datetime.now().isoformat(),
+        'static_content': static_content
+    }
+    return write_tables_file(engine, path, metadata)
+
+
+def load_snapshot(engine_class, path):
+    """Engine whose tables are a memory-mapped snapshot, and the snapshot's static payloads"""
+    tables = map_tables_file(path)
+    version = tables.metadata.get('snapshot_version')
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f'Unsupported snapshot version {version} in {path}, rebuild it')
+    return engine_class.from_tables(tables.tables), tables.metadata['static_content']
+
+
+def load_engine(engine_class, path):
+    """Create an engine whose tables are a memory-mapped snapshot"""
+    return load_snapshot(engine_class, path)[0]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build a validated engine snapshot')
+    parser.add_argument('output', help='Path of the snapshot file')
+    args = parser.parse_args()
+
+    from engine import ProfessionalSizeRecommendationEngine
+    try:
+        size = build_snapshot(ProfessionalSizeRecommendationEngine(), args.output)
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
+    print(f'Wrote {size} byte snapshot to {args.output}')
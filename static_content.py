@@ -0,0 +1,122 @@
+"""
+Professional Fashion Sizing API - Static Content
+Measurement guide, service description and size chart payloads served by the
+static endpoints, built into engine snapshots alongside the tables
+"""
+
+from shared_tables import to_builtin
+
+MEASUREMENT_GUIDE = {
+    'measurements': {
+        'poitrine': {
+            'name': 'Chest Circumference',
+            'description': 'Measure around the fullest part of the chest',
+            'professional_notes': 'Critical measurement for top sizing - ensure tape is level',
+            'instructions': [
+                'Stand straight with arms at sides',
+                'Place tape around fullest part of chest',
+                'Keep tape level and parallel to floor',
+                'Breathe normally and take measurement'
+            ],
+            'tips': [
+                'Wear properly fitted undergarments',
+                'Do not compress the tape',
+                'Take measurement over light clothing if necessary'
+            ],
+            'common_errors': [
+                'Measuring too high or too low',
+                'Tape not level around body',
+                'Compressing chest with tape'
+            ]
+        },
+        'epaules': {
+            'name': 'Shoulder Width',
+            'description': 'Distance between shoulder points',
+            'professional_notes': 'Key measurement for jacket and shirt fit',
+            'instructions': [
+                'Measure from shoulder point to shoulder point',
+                'Across the back at widest point',
+                'Keep shoulders relaxed and natural',
+                'Measure over light clothing'
+            ],
+            'tips': [
+                'Use a friend to help with accuracy',
+                'Keep posture natural',
+                'Measure at the acromion process (shoulder bone)'
+            ]
+        },
+        'bassin': {
+            'name': 'Waist Circumference',
+            'description': 'Natural waist measurement',
+            'professional_notes': 'Essential for trouser and skirt fitting',
+            'instructions': [
+                'Find natural waist (narrowest point)',
+                'Usually 2-3 inches above hip bone',
+                'Keep tape snug but not tight',
+                'Stand naturally, do not suck in'
+            ],
+            'tips': [
+                'Bend to side to find natural waist',
+                'Measure over light undergarments',
+                'Take measurement at end of normal exhale'
+            ]
+        },
+        'hanches': {
+            'name': 'Hip Circumference',
+            'description': 'Fullest part of hips and buttocks',
+            'professional_notes': 'Critical for bottom garment fit',
+            'instructions': [
+                'Find fullest part of hips/buttocks',
+                'Usually 7-9 inches below natural waist',
+                'Keep feet together',
+                'Ensure tape is level all around'
+            ],
+            'tips': [
+                'Use a mirror to check tape position',
+                'Do not compress soft tissue',
+                'Take multiple measurements for accuracy'
+            ]
+        }
+    },
+    'professional_standards': {
+        'accuracy_tolerance': '±0.5cm',
+        'measurement_conditions': 'Light undergarments, natural posture',
+        'recommended_tools': 'Flexible measuring tape, mirror, assistant',
+        'industry_standards': ['ISO 3635', 'EN 13402', 'ASTM D5585']
+    }
+}
+
+SERVICE_INFO = {
+    'status': 'healthy',
+    'service': 'Professional Fashion Sizing API',
+    'version': '2.0',
+    'engine': 'Professional Fashion Sizing Engine',
+    'uptime': 'Available',
+    'features': [
+        'Professional body analysis',
+        'Brand-specific recommendations',
+        'Virtual fitting simulation',
+        'Professional outfit curation'
+    ]
+}
+
+
+def size_charts(engine):
+    """Payload of /api/sizes for the engine's charts"""
+    return {
+        'men_tops': to_builtin(engine.men_top_sizes),
+        'women_tops': to_builtin(engine.women_top_sizes),
+        'men_bottoms': to_builtin(engine.men_bottom_sizes),
+        'women_bottoms': to_builtin(engine.women_bottom_sizes),
+        'standards': ['ISO 3635', 'EN 13402'],
+        'regions': ['European', 'International']
+    }
+
+
+def build_static_content(engine):
+    """Payloads of the static endpoints, as stored in snapshots"""
+    return {
+        'measurement_guide': MEASUREMENT_GUIDE,
+        'health': SERVICE_INFO,
+        'sizes': size_charts(engine)
+    }
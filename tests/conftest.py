@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+# The API modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The API built in an empty working directory, without the profiler thread"""
+    import api
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('SIZING_PROFILER_HZ', '0')
+    monkeypatch.delenv('SIZING_ADMIN_TOKEN', raising=False)
+    app = api.create_app()
+    yield app
+    components = app.extensions['sizing']
+    components['event_log'].close()
+    components['feedback_learner'].close()
+    components['cache'].close()
+    components['job_manager'].close()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,109 @@
+"""
+Admission control: adaptive limit, bounded queue and load shedding
+"""
+
+import threading
+
+import pytest
+from flask import Flask
+
+from admission import AdmissionController, Rejected
+
+
+@pytest.fixture
+def blocked_app():
+    """App whose /work view blocks until released, behind a limit of one and no queue"""
+    controller = AdmissionController(initial_limit=1, min_limit=1, max_queue=0, queue_timeout=0.05)
+    release = threading.Event()
+    entered = threading.Event()
+    app = Flask(__name__)
+
+    @app.route('/work')
+    @controller.guard
+    def work():
+        entered.set()
+        release.wait(5)
+        return {'success': True}
+
+    yield app, controller, entered, release
+    release.set()
+
+
+def test_limit_grows_under_target_and_backs_off_above():
+    controller = AdmissionController(initial_limit=4, target_latency=0.1)
+    for _ in range(8):
+        controller.acquire()
+        controller.release(0.01)
+    assert controller.limit > 5
+
+    before = controller.limit
+    controller.acquire()
+    controller.release(1.0)
+    assert controller.limit == pytest.approx(before * 0.8)
+    # Only one decrease per target latency window
+    controller.acquire()
+    controller.release(1.0)
+    assert controller.limit == pytest.approx(before * 0.8)
+
+
+def test_limit_stays_within_bounds():
+    controller = AdmissionController(initial_limit=2, min_limit=2, max_limit=3, target_latency=0.0)
+    controller.acquire()
+    controller.release(1.0)
+    assert controller.limit == 2
+    controller.target_latency = 10
+    for _ in range(50):
+        controller.acquire()
+        controller.release(0.0)
+    assert controller.limit == 3
+
+
+def test_full_queue_is_rejected_with_429():
+    controller = AdmissionController(initial_limit=1, min_limit=1, max_queue=0)
+    controller.acquire()
+    with pytest.raises(Rejected) as rejected:
+        controller.acquire()
+    assert (rejected.value.status, rejected.value.error_code) == (429, 'OVERLOADED')
+    assert rejected.value.retry_after >= 1
+    assert controller.get_metrics()['rejected_queue_full'] == 1
+
+
+def test_queue_wait_past_the_timeout_is_rejected_with_503():
+    controller = AdmissionController(initial_limit=1, min_limit=1, max_queue=1, queue_timeout=0.05)
+    controller.acquire()
+    with pytest.raises(Rejected) as rejected:
+        controller.acquire()
+    assert (rejected.value.status, rejected.value.error_code) == (503, 'QUEUE_TIMEOUT')
+    metrics = controller.get_metrics()
+    assert (metrics['rejected_timeout'], metrics['waiting'], metrics['in_flight']) == (1, 0, 1)
+
+
+def test_queued_request_is_admitted_on_release():
+    controller = AdmissionController(initial_limit=1, min_limit=1, max_queue=1, queue_timeout=5)
+    controller.acquire()
+    admitted = threading.Event()
+    waiter = threading.Thread(target=lambda: (controller.acquire(), admitted.set()))
+    waiter.start()
+    assert not admitted.wait(0.05)
+    controller.release(0.01)
+    waiter.join()
+    assert admitted.is_set()
+    assert controller.get_metrics()['admitted'] == 2
+
+
+def test_guarded_view_sheds_with_retry_after(blocked_app):
+    app, controller, entered, release = blocked_app
+    first = threading.Thread(target=lambda: app.test_client().get('/work'))
+    first.start()
+    assert entered.wait(5)
+
+    response = app.test_client().get('/work')
+    assert response.status_code == 429
+    assert response.get_json() == {'success': False, 'error': 'Server is at capacity, retry later',
+                                   'error_code': 'OVERLOADED'}
+    assert int(response.headers['Retry-After']) >= 1
+
+    release.set()
+    first.join()
+    assert controller.get_metrics()['in_flight'] == 0
+    assert app.test_client().get('/work').status_code == 200
@@ -0,0 +1,37 @@
+"""
+Per-request allocation budgets of the recommendation pipeline
+"""
+
+import pytest
+
+from alloc_profile import ALLOCATION_BUDGETS, check_budgets, profile_corpus
+from engine import ProfessionalSizeRecommendationEngine
+from vectorized import random_profiles
+
+
+@pytest.fixture(scope='module')
+def report():
+    return profile_corpus(random_profiles(300, 0))
+
+
+def test_every_stage_is_profiled(report):
+    assert set(report) == set(ALLOCATION_BUDGETS)
+
+
+def test_requests_stay_within_allocation_budgets(report):
+    assert check_budgets(report) == []
+
+
+def test_budget_check_catches_a_stage_regression(monkeypatch):
+    original = ProfessionalSizeRecommendationEngine.generate_professional_outfit_recommendations
+    leaked = []
+
+    def allocating(self, *args, **kwargs):
+        # A hot-path regression: a few hundred objects kept per request
+        leaked.append([[index] for index in range(100)])
+        return original(self, *args, **kwargs)
+
+    monkeypatch.setattr(ProfessionalSizeRecommendationEngine, 'generate_professional_outfit_recommendations', allocating)
+    failures = check_budgets(profile_corpus(random_profiles(50, 0)))
+    assert any(failure.startswith('outfits objects') for failure in failures)
+    assert any(failure.startswith('total objects') for failure in failures)
@@ -0,0 +1,85 @@
+"""
+Live size analytics: histogram sketches, time buckets and demand curves
+"""
+
+import random
+
+import pytest
+
+from analytics import OTHER, HistogramSketch, SizeAnalytics
+from benchmarks import SAMPLE_PAYLOAD
+from engine import ProfessionalSizeRecommendationEngine
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return ProfessionalSizeRecommendationEngine()
+
+
+def record(analytics, engine, payload, now):
+    analytics.record(payload, engine.recommend_size(payload), now=now)
+
+
+def test_sketch_quantiles_are_within_a_bin():
+    rng = random.Random(0)
+    values = [rng.gauss(95, 8) for _ in range(20000)]
+    sketch = HistogramSketch(50, 160, 0.5)
+    for value in values:
+        sketch.add(value)
+    values.sort()
+    for q in [0.1, 0.5, 0.9]:
+        assert sketch.quantile(q) == pytest.approx(values[int(q * len(values))], abs=0.5)
+    summary = sketch.to_dict()
+    assert summary['count'] == 20000 and summary['out_of_range'] == 0
+
+
+def test_sketch_out_of_range_and_merge():
+    left, right = HistogramSketch(50, 60, 1), HistogramSketch(50, 60, 1)
+    for value in [40, 55, float('nan'), float('inf')]:
+        left.add(value)
+    right.add(70)
+    left.merge(right)
+    assert (left.count, left.underflow, left.overflow) == (3, 1, 1)
+    assert left.quantile(0) == 50 and left.quantile(1) == 60
+    assert HistogramSketch(50, 60, 1).quantile(0.5) is None
+
+
+def test_demand_counts_brand_adjusted_sizes(engine):
+    analytics = SizeAnalytics(engine.brand_adjustments)
+    record(analytics, engine, SAMPLE_PAYLOAD, now=1000)
+    record(analytics, engine, {**SAMPLE_PAYLOAD, 'brand': ''}, now=1000)
+    demand = analytics.snapshot(now=1000)['size_demand']
+    # SAMPLE_PAYLOAD is an S top at zara, shown as XS; without a brand it stays S
+    assert demand['zara']['homme']['top'] == {'XS': 1}
+    assert demand['none']['homme']['top'] == {'S': 1}
+
+
+def test_unknown_brands_and_genders_are_folded(engine):
+    analytics = SizeAnalytics(engine.brand_adjustments)
+    record(analytics, engine, {**SAMPLE_PAYLOAD, 'brand': 'nobody', 'gender': 'X'}, now=1000)
+    snapshot = analytics.snapshot(now=1000)
+    assert list(snapshot['size_demand']) == [OTHER]
+    assert list(snapshot['size_demand'][OTHER]) == [OTHER]
+    assert snapshot['measurements'][OTHER]['poitrine']['count'] == 1
+
+
+def test_windows_expire_and_filter(engine):
+    analytics = SizeAnalytics(engine.brand_adjustments, window_seconds=60, windows=3)
+    for minute in range(5):
+        record(analytics, engine, SAMPLE_PAYLOAD, now=minute * 60)
+    record(analytics, engine, {**SAMPLE_PAYLOAD, 'gender': 'femme', 'height': float('nan')}, now=4 * 60)
+
+    snapshot = analytics.snapshot(now=4 * 60)
+    assert [entry['requests'] for entry in snapshot['timeline']] == [1, 1, 2]
+    assert analytics.snapshot(windows=1, now=4 * 60)['requests'] == 2
+    femme = analytics.snapshot(gender='femme', now=4 * 60)
+    assert list(femme['body_types']) == ['femme']
+    assert 'height' not in femme['measurements']['femme']
+    assert analytics.get_metrics()['buckets'] == 3
+
+
+def test_analytics_endpoint(client):
+    client.post('/api/recommend', json=SAMPLE_PAYLOAD)
+    data = client.get('/api/analytics?brand=ZARA').get_json()['data']
+    assert data['requests'] == 1
+    assert list(data['size_demand']) == ['zara']
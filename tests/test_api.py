@@ -0,0 +1,44 @@
+"""
+App factory of the sizing API
+"""
+
+import os
+import subprocess
+import sys
+
+from benchmarks import SAMPLE_PAYLOAD
+
+API_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api.py')
+
+# What a spawned pool worker does with the server's main module
+MP_MAIN_PROBE = """
+import os, runpy, sys, threading
+sys.path.insert(0, os.path.dirname(sys.argv[1]))
+runpy.run_path(sys.argv[1], run_name='__mp_main__')
+print(threading.active_count())
+"""
+
+
+def test_spawned_workers_build_no_components(tmp_path):
+    output = subprocess.run([sys.executable, '-c', MP_MAIN_PROBE, API_PATH], cwd=tmp_path,
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '1'
+    assert os.listdir(tmp_path) == []
+
+
+def test_factory_serves_recommendations(client):
+    response = client.post('/api/recommend', json=SAMPLE_PAYLOAD)
+    assert response.status_code == 200
+    assert response.get_json()['data']['sizes']['top']['size']
+
+
+def test_request_payloads_are_not_logged(client, caplog):
+    with caplog.at_level('DEBUG'):
+        client.post('/api/recommend', json=SAMPLE_PAYLOAD)
+    assert 'Received recommendation request' in caplog.text
+    assert 'poitrine' not in caplog.text
+
+
+def test_factory_keeps_data_in_the_working_directory(app, tmp_path):
+    assert {'jobs_data', 'feedback_data'} <= set(os.listdir(tmp_path))
+    assert app.extensions['sizing']['job_manager'].data_dir == 'jobs_data'
@@ -0,0 +1,79 @@
+"""
+Size chart optimizer: histograms, optimal ranges and engine-equivalent scoring
+"""
+
+import numpy as np
+import pytest
+
+from chart_optimizer import (DIMENSION_BOUNDS, GARMENTS, SECONDARY_WEIGHTS, JointHistogram, evaluate_chart,
+                             histogram_from_synthetic, new_histogram, optimal_ranges, optimize_chart)
+from engine import ProfessionalSizeRecommendationEngine
+
+
+def engine_penalty(chart, garment, primary, secondary):
+    """Lowest total score over the chart, computed as find_best_*_size does"""
+    primary_dimension, secondary_dimension = GARMENTS[garment][1][0], GARMENTS[garment][2][0]
+
+    def outside(value, value_range):
+        lo, hi = value_range
+        return (lo - value) ** 2 if value < lo else (value - hi) ** 2 if value > hi else 0.0
+
+    scores = []
+    for ranges in chart.values():
+        score = outside(primary, ranges[primary_dimension])
+        if secondary > 0 and secondary_dimension in ranges:
+            score += SECONDARY_WEIGHTS[garment] * outside(secondary, ranges[secondary_dimension])
+        scores.append(score)
+    return min(scores)
+
+
+def test_histogram_counts_rows_and_missing_secondaries():
+    histogram = JointHistogram((60, 160), (30, 70), resolution=1)
+    histogram.add([95.5, 95.2, 0, 200], [45.5, np.nan, 44, 80])
+    assert histogram.rows == 3
+    assert histogram.counts[35, 15] == 1
+    assert histogram.counts[35, -1] == 1
+    # Out-of-bounds values are clamped into the edge bins
+    assert histogram.counts[-1, -2] == 1
+
+
+def test_optimal_ranges_cover_the_population():
+    centers = np.arange(80, 120, 0.5) + 0.25
+    counts = np.ones_like(centers)
+    ranges = optimal_ranges(centers, counts, 4, max_width=10)
+    assert len(ranges) == 4
+    assert all(ranges[index][1] == ranges[index + 1][0] for index in range(3))
+    assert ranges[0][0] <= centers[0] and ranges[-1][1] >= centers[-1]
+    with pytest.raises(ValueError):
+        optimal_ranges(centers, counts, 2, max_width=5, min_width=6)
+
+
+@pytest.mark.parametrize('garment', ['top', 'bottom'])
+def test_evaluation_scores_every_dimension_like_the_engine(garment):
+    engine = ProfessionalSizeRecommendationEngine()
+    chart = engine.men_top_sizes if garment == 'top' else engine.men_bottom_sizes
+    rng = np.random.default_rng(0)
+    # Bin centres, inside the histogram bounds so that nothing is clamped
+    primary = rng.normal(98 if garment == 'top' else 88, 12, 400).round(0) + 0.5
+    secondary = rng.normal(46 if garment == 'top' else 100, 5, 400).round(0) + 0.5
+    for values, dimension in [(primary, GARMENTS[garment][1][0]), (secondary, GARMENTS[garment][2][0])]:
+        np.clip(values, DIMENSION_BOUNDS[dimension][0] + 0.5, DIMENSION_BOUNDS[dimension][1] - 0.5, out=values)
+    secondary[:20] = np.nan
+    histogram = new_histogram(garment, resolution=1)
+    histogram.add(primary, secondary)
+
+    expected = [engine_penalty(chart, garment, p, 0 if np.isnan(s) else s) for p, s in zip(primary, secondary)]
+    report = evaluate_chart(histogram, garment, chart)
+    assert report['total_penalty'] == pytest.approx(sum(expected))
+    assert report['between_sizes_share'] == pytest.approx(np.mean(np.array(expected) > 0), abs=1e-4)
+
+
+def test_optimized_chart_keeps_fewer_customers_between_sizes():
+    engine = ProfessionalSizeRecommendationEngine()
+    histogram = histogram_from_synthetic(50000, 'top', 'homme', resolution=0.5)
+    labels = list(engine.men_top_sizes)
+    chart = optimize_chart(histogram, 'top', len(labels), labels, primary_width=8, secondary_width=2)
+    assert list(chart) == labels
+    assert all({'chest', 'shoulders'} <= set(ranges) for ranges in chart.values())
+    assert evaluate_chart(histogram, 'top', chart)['between_sizes_share'] < \
+        evaluate_chart(histogram, 'top', engine.men_top_sizes)['between_sizes_share']
@@ -0,0 +1,66 @@
+"""
+Columnar bulk scoring of Arrow record batches and Parquet files
+"""
+
+import pytest
+
+from columnar import score_parquet, score_record_batch
+from engine import ProfessionalSizeRecommendationEngine
+from parallel import score_payload
+from vectorized import VectorizedEngine, random_profiles
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+RESULT_FIELDS = ['top_size', 'bottom_size', 'brand_top_size', 'brand_bottom_size', 'body_type', 'confidence']
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return ProfessionalSizeRecommendationEngine()
+
+
+def record_batch(payloads):
+    """Payloads as a record batch with one column per measurement and preference"""
+    columns = {'id': list(range(len(payloads)))}
+    for name in ['poitrine', 'epaules', 'bassin', 'hanches', 'abdomen']:
+        columns[name] = [payload['measurements'].get(name) for payload in payloads]
+        columns[f'fit_{name}'] = [payload['fit_preferences'].get(name) for payload in payloads]
+    for name in ['height', 'gender', 'morphotype', 'brand']:
+        columns[name] = [payload[name] for payload in payloads]
+    del columns['fit_abdomen']
+    return pa.RecordBatch.from_pydict(columns)
+
+
+def expected_rows(engine, payloads):
+    rows = []
+    for payload in payloads:
+        result = score_payload(engine, payload)
+        rows.append({field: result[field] for field in RESULT_FIELDS})
+    return rows
+
+
+def test_record_batch_scores_match_the_scalar_engine(engine):
+    payloads = random_profiles(500, 3)
+    result = score_record_batch(VectorizedEngine(engine), record_batch(payloads)).to_pylist()
+    assert [row['id'] for row in result] == list(range(len(payloads)))
+    assert [{field: row[field] for field in RESULT_FIELDS} for row in result] == expected_rows(engine, payloads)
+
+
+def test_parquet_is_streamed_in_batches(engine, tmp_path):
+    payloads = random_profiles(1000, 4)
+    source, output = str(tmp_path / 'in.parquet'), str(tmp_path / 'out.parquet')
+    pq.write_table(pa.Table.from_batches([record_batch(payloads)]), source)
+
+    assert score_parquet(engine, source, output, batch_size=128, include_fitting=True) == 1000
+    table = pq.read_table(output)
+    assert {'comfort_prediction', 'overall_fit', 'top_fit_precision'} <= set(table.column_names)
+    assert pa.types.is_dictionary(table.schema.field('top_size').type)
+    rows = table.select(RESULT_FIELDS).to_pylist()
+    assert rows == expected_rows(engine, payloads)
+
+
+def test_gender_column_is_required(engine):
+    batch = pa.RecordBatch.from_pydict({'poitrine': [95.0]})
+    with pytest.raises(ValueError, match='gender'):
+        score_record_batch(VectorizedEngine(engine), batch)
@@ -0,0 +1,37 @@
+"""
+Standalone recommendation engine module
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks import SAMPLE_PAYLOAD, WEB_FRAMEWORK_MODULES
+from engine import ProfessionalSizeRecommendationEngine
+from shared_tables import TABLE_ATTRIBUTES, to_builtin
+
+
+def test_engine_imports_without_the_web_framework_or_numpy():
+    probe = 'import json, sys; import engine; print(json.dumps(sorted(sys.modules)))'
+    loaded = json.loads(subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True,
+                                       cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout)
+    assert {name.split('.')[0] for name in loaded} & {*WEB_FRAMEWORK_MODULES, 'numpy'} == set()
+
+
+def test_recommendation_of_the_form_defaults():
+    result = ProfessionalSizeRecommendationEngine().recommend_size(SAMPLE_PAYLOAD)
+    assert list(result) == ['sizes', 'brand_recommendations', 'body_analysis', 'virtual_fitting', 'confidence',
+                            'outfit_recommendations', 'professional_insights', 'api_metadata']
+    assert (result['sizes']['top']['size'], result['sizes']['bottom']['size']) == ('S', '40')
+    assert (result['brand_recommendations']['top']['size'], result['brand_recommendations']['bottom']['size']) == \
+        ('XS', '36')
+    assert result['confidence'] == 98
+
+
+def test_engine_from_tables_matches_the_built_in_tables():
+    engine = ProfessionalSizeRecommendationEngine()
+    tables = {attr: to_builtin(getattr(engine, attr)) for attr in TABLE_ATTRIBUTES}
+    rebuilt = ProfessionalSizeRecommendationEngine.from_tables(tables)
+    for payload in (SAMPLE_PAYLOAD, {**SAMPLE_PAYLOAD, 'gender': 'femme', 'brand': 'h&m'}):
+        assert rebuilt.recommend_size(payload)['sizes'] == engine.recommend_size(payload)['sizes']
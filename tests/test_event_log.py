@@ -0,0 +1,141 @@
+"""
+Recommendation event log: binary round trip, rotation and drops
+"""
+
+import os
+
+import pytest
+
+import event_log
+from benchmarks import SAMPLE_PAYLOAD
+from engine import ProfessionalSizeRecommendationEngine
+from event_log import EventLog, EventLogReader, log_files, read_records, self_check
+from vectorized import random_profiles
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return ProfessionalSizeRecommendationEngine()
+
+
+def record_all(log, engine, payloads):
+    for payload in payloads:
+        assert log.record(payload, engine.recommend_size(payload), 2.5)
+
+
+def test_payloads_round_trip(tmp_path, engine):
+    payloads = random_profiles(40, 3)
+    log = EventLog(str(tmp_path))
+    record_all(log, engine, payloads[:25])
+    log.flush()
+    record_all(log, engine, payloads[25:])
+    log.close()
+
+    [path] = log_files(str(tmp_path))
+    reader = EventLogReader(path)
+    assert len(reader) == 40
+    assert list(reader.iter_payloads()) == payloads
+    records = reader.records()
+    assert set(records['latency_ms']) == {2.5}
+    assert list(reader.decode(records['top_size'])) == \
+        [engine.recommend_size(payload)['sizes']['top']['size'] for payload in payloads]
+    reader.close()
+    assert log.get_metrics()['written'] == 40
+
+
+def test_missing_values_decode_as_none(tmp_path, engine):
+    unbranded = {field: value for field, value in SAMPLE_PAYLOAD.items() if field != 'brand'}
+    # The log records whatever the request carried, however incomplete
+    payload = {'measurements': {'poitrine': 96, 'bassin': 80}, 'gender': 'homme', 'height': 'tall'}
+    log = EventLog(str(tmp_path))
+    log.record(payload, engine.recommend_size(unbranded), 1.0)
+    log.close()
+
+    records, strings = read_records(str(tmp_path))
+    assert strings['brand'][0] is None and strings['brand_top_size'][0] is None
+    reader = EventLogReader(log_files(str(tmp_path))[0])
+    [rebuilt] = reader.iter_payloads()
+    reader.close()
+    assert rebuilt == {'measurements': {'poitrine': 96.0, 'bassin': 80.0}, 'fit_preferences': {},
+                       'gender': 'homme', 'height': None, 'morphotype': None}
+
+
+def test_full_string_table_stores_missing(tmp_path, engine, monkeypatch):
+    monkeypatch.setattr(event_log, 'MAX_STRINGS', 4)
+    payload = random_profiles(1, 0)[0]
+    log = EventLog(str(tmp_path))
+    log.record(payload, engine.recommend_size(payload), 1.0)
+    log.close()
+
+    reader = EventLogReader(log_files(str(tmp_path))[0])
+    assert len(reader.strings) == 4
+    assert reader.decode(reader.records()['brand_bottom_size'])[0] is None
+    reader.close()
+
+
+def test_rotates_by_size_with_a_string_table_per_file(tmp_path, engine):
+    payloads = random_profiles(30, 5)
+    log = EventLog(str(tmp_path), flush_interval=60, max_file_bytes=1)
+    for chunk in range(3):
+        record_all(log, engine, payloads[chunk * 10:(chunk + 1) * 10])
+        log.flush()
+    log.close()
+
+    paths = log_files(str(tmp_path))
+    assert len(paths) == 3
+    assert log.get_metrics()['files'] == 3
+    readers = [EventLogReader(path) for path in paths]
+    assert [payload for reader in readers for payload in reader.iter_payloads()] == payloads
+    for reader in readers:
+        reader.close()
+    records, strings = read_records(str(tmp_path))
+    assert len(records) == 30 and len(strings['gender']) == 30
+
+
+def test_full_buffer_drops_instead_of_blocking(tmp_path, engine):
+    payload = random_profiles(1, 0)[0]
+    recommendation = engine.recommend_size(payload)
+    log = EventLog(str(tmp_path), buffer_size=2)
+    # Keep the writer thread from draining the buffer between records
+    log._stopped = True
+    assert [log.record(payload, recommendation, 1.0) for _ in range(3)] == [True, True, False]
+    metrics = log.get_metrics()
+    assert (metrics['recorded'], metrics['dropped'], metrics['buffered']) == (2, 1, 2)
+    log.close()
+    assert len(read_records(str(tmp_path))[0]) == 2
+
+
+def test_write_failure_drops_the_batch(tmp_path, engine):
+    payload = random_profiles(1, 0)[0]
+    directory = tmp_path / 'events'
+    log = EventLog(str(directory), flush_interval=60)
+    log.record(payload, engine.recommend_size(payload), 1.0)
+    os.rmdir(directory)
+    directory.write_text('')
+    assert log.flush() == 0
+    metrics = log.get_metrics()
+    assert (metrics['write_errors'], metrics['dropped'], metrics['written']) == (1, 1, 0)
+    log.close()
+
+
+def test_torn_trailing_block_is_ignored(tmp_path, engine):
+    log = EventLog(str(tmp_path))
+    record_all(log, engine, random_profiles(5, 1))
+    log.close()
+    path = log_files(str(tmp_path))[0]
+    with open(path, 'ab') as f:
+        f.write(event_log.BLOCK_HEADER.pack(event_log.RECORDS_BLOCK, 5, 10_000) + b'\0' * 100)
+    reader = EventLogReader(path)
+    assert len(reader) == 5
+    reader.close()
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'events-x.szev'
+    path.write_bytes(b'not a log')
+    with pytest.raises(ValueError):
+        EventLogReader(str(path))
+
+
+def test_self_check_passes():
+    assert self_check(rows=20) == []
@@ -0,0 +1,140 @@
+"""
+Fit-feedback learning, persistence and merging across worker processes
+"""
+
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+from engine import ProfessionalSizeRecommendationEngine
+from feedback import FeedbackLearner, RunningOffset
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Another server worker: learns from events, then stays alive until told to exit
+WORKER = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from engine import ProfessionalSizeRecommendationEngine
+from feedback import FeedbackLearner
+learner = FeedbackLearner(ProfessionalSizeRecommendationEngine(), sys.argv[2], sync_interval=0)
+learner.ingest([{'brand': 'zara', 'garment': 'top', 'outcome': 'too_small'}] * int(sys.argv[3]))
+print(learner.engine.brand_adjustments['zara']['top'], flush=True)
+sys.stdin.readline()
+"""
+
+
+def learner_for(directory, **kwargs):
+    return FeedbackLearner(ProfessionalSizeRecommendationEngine(), str(directory), sync_interval=0, **kwargs)
+
+
+@pytest.fixture
+def worker(tmp_path):
+    process = subprocess.Popen([sys.executable, '-c', WORKER, ROOT, str(tmp_path), '200'],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    published = int(process.stdout.readline())
+    yield published
+    process.stdin.write('\n')
+    process.stdin.close()
+    process.wait()
+
+
+def test_merge_matches_a_single_pass():
+    values = [random.Random(7).gauss(0, 1) for _ in range(100)]
+    whole, left, right = RunningOffset(), RunningOffset(), RunningOffset()
+    for index, value in enumerate(values):
+        whole.add(value)
+        (left if index < 37 else right).add(value)
+    left.merge(right)
+    assert (left.count, left.mean, left.std) == pytest.approx((whole.count, whole.mean, whole.std))
+
+
+def test_feedback_moves_the_offset_past_the_prior(tmp_path):
+    learner = learner_for(tmp_path)
+    assert learner.engine.brand_adjustments['zara']['top'] == -1
+    result = learner.ingest([{'brand': 'zara', 'garment': 'top', 'outcome': 'too_small'}] * 5)
+    assert result['offset_changes'] == {}
+    result = learner.ingest([{'brand': 'ZARA', 'garment': 'top', 'outcome': 'too_small'}] * 100)
+    assert result['offset_changes'] == {'zara': {'top': 0}}
+    assert learner.version == 1
+    learner.close()
+
+
+@pytest.mark.parametrize('event', [
+    {'brand': 'nobody', 'garment': 'top', 'outcome': 'kept'},
+    {'brand': 'zara', 'garment': 'hat', 'outcome': 'kept'},
+    {'brand': 'zara', 'garment': 'top', 'outcome': 'lost'},
+    {'brand': 'zara', 'garment': 'top', 'size_steps': 1.5}
+])
+def test_invalid_events_are_rejected(tmp_path, event):
+    learner = learner_for(tmp_path)
+    with pytest.raises(ValueError):
+        learner.ingest([event])
+    assert learner.get_metrics()['rejected'] == 1
+    learner.close()
+
+
+def test_restart_replays_the_log_and_compacts(tmp_path):
+    learner = learner_for(tmp_path, compact_every=50)
+    for _ in range(3):
+        learner.ingest([{'brand': 'zara', 'garment': 'top', 'outcome': 'too_small'}] * 50)
+    # These are left in the log, and replayed on top of the state file
+    learner.ingest([{'brand': 'zara', 'garment': 'top', 'outcome': 'kept'}] * 10)
+    offsets = learner.offsets()['zara']['top']
+    assert learner.get_metrics()['compactions'] == 3
+    learner.close()
+
+    restarted = learner_for(tmp_path)
+    assert restarted.offsets()['zara']['top'] == offsets
+    assert restarted.engine.brand_adjustments['zara']['top'] == offsets['published']
+    restarted.close()
+
+
+def test_workers_converge_on_sync(tmp_path):
+    learner = learner_for(tmp_path)
+    process = subprocess.Popen([sys.executable, '-c', WORKER, ROOT, str(tmp_path), '200'],
+                               stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        published = int(process.stdout.readline())
+        assert learner.engine.brand_adjustments['zara']['top'] == -1
+        assert learner.sync() == {'zara': {'top': published}}
+        assert learner.get_metrics()['merged_processes'] == 1
+
+        # Only the lines appended since the last sync are read
+        learner.ingest([{'brand': 'zara', 'garment': 'top', 'outcome': 'kept'}])
+        learner.sync()
+        assert learner.offsets()['zara']['top']['events'] == 201
+    finally:
+        process.stdin.write('\n')
+        process.stdin.close()
+        process.wait()
+
+    # The exited worker's files are adopted by the next process to start
+    learner.close()
+    restarted = learner_for(tmp_path)
+    assert restarted.offsets()['zara']['top']['events'] == 201
+    assert [name for name in os.listdir(tmp_path) if name.startswith('events-') and str(process.pid) in name] == []
+    restarted.close()
+
+
+def test_repeated_syncs_do_not_double_count(tmp_path, worker):
+    learner = learner_for(tmp_path)
+    assert learner.offsets()['zara']['top']['events'] == 200
+    version = learner.version
+    assert learner.sync() == {}
+    assert learner.offsets()['zara']['top']['events'] == 200
+    assert learner.version == version
+    learner.close()
+
+
+def test_feedback_endpoint(client):
+    response = client.post('/api/feedback', json={'events': [{'brand': 'zara', 'garment': 'bottom',
+                                                                'outcome': 'too_large'}]})
+    assert response.status_code == 202
+    assert response.get_json()['data']['accepted'] == 1
+    assert client.post('/api/feedback', json={'brand': 'zara'}).status_code == 400
+    offsets = client.get('/api/feedback/offsets').get_json()['data']
+    assert offsets['zara']['bottom']['events'] == 1
@@ -0,0 +1,93 @@
+"""
+Population demand forecasts: synthetic populations, uploads and bulk jobs
+"""
+
+import json
+import time
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from engine import ProfessionalSizeRecommendationEngine
+from forecast import SYNC_POPULATION, forecast_demand, population_from_arrays, synthesize_population
+from vectorized import VectorizedEngine
+
+UPLOAD = {
+    'gender': ['homme', 'femme', 'homme', 'femme', 'homme'],
+    'poitrine': [95, 88, 104, 0, 110],
+    'epaules': [45, 38, 48, 39, 50],
+    'bassin': [85, 70, 88, 75, 100],
+    'hanches': [95, 96, 100, 98, 108],
+    'height': [175, 165, 182, 160, 190],
+    'morphotype': ['normal', 'mince', 'athletique', 'normal', 'fort']
+}
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return ProfessionalSizeRecommendationEngine()
+
+
+def test_uploaded_population_matches_the_scalar_engine(engine):
+    report = forecast_demand(VectorizedEngine(engine), population_from_arrays(UPLOAD), ['Zara'])
+    assert (report['population'], report['genders']) == (5, {'homme': 3, 'femme': 2})
+
+    for gender in ['homme', 'femme']:
+        rows = [index for index, value in enumerate(UPLOAD['gender']) if value == gender]
+        base, brand = Counter(), Counter()
+        for index in rows:
+            payload = {
+                'measurements': {name: UPLOAD[name][index] for name in ['poitrine', 'epaules', 'bassin', 'hanches']},
+                'fit_preferences': {}, 'gender': gender, 'height': UPLOAD['height'][index],
+                'morphotype': UPLOAD['morphotype'][index], 'brand': 'zara'
+            }
+            result = engine.recommend_size(payload)
+            base[result['sizes']['top']['size']] += 1
+            if result['brand_recommendations']['top']['size']:
+                brand[result['brand_recommendations']['top']['size']] += 1
+        shares = {size: share for size, share in report['base'][gender]['top'].items() if share}
+        assert shares == {size: round(count / len(rows), 4) for size, count in base.items() if size}
+        assert report['brands']['zara'][gender]['top'] == {size: round(count / len(rows), 4)
+                                                           for size, count in brand.items()}
+    assert report['unsized']['femme']['top'] == 0.5
+
+
+def test_synthetic_population_is_reproducible():
+    first = synthesize_population({}, 1000, seed=3)
+    second = synthesize_population({}, 1000, seed=3)
+    assert np.array_equal(first['poitrine'], second['poitrine'], equal_nan=True)
+    assert not np.array_equal(first['poitrine'], synthesize_population({}, 1000, seed=4)['poitrine'])
+    only_women = synthesize_population({'genders': {'femme': {'share': 1, 'measurements': {}}}}, 10)
+    assert only_women['gender'][1] == ['femme']
+
+
+@pytest.mark.parametrize('arrays, message', [
+    ({'poitrine': [95]}, 'gender'),
+    ({'gender': ['homme'], 'poitrine': [95, 96]}, 'expected 1'),
+    ({'gender': ['homme'], 'shoe_size': [42]}, 'Unknown array')
+])
+def test_invalid_uploads_are_rejected(arrays, message):
+    with pytest.raises(ValueError, match=message):
+        population_from_arrays(arrays)
+
+
+def test_forecast_endpoint(client):
+    response = client.post('/api/forecast', json={'population': UPLOAD, 'brands': ['zara']})
+    assert response.status_code == 200
+    assert list(response.get_json()['data']['brands']) == ['zara']
+    assert client.post('/api/forecast', json={'size': 0}).status_code == 400
+    assert client.post('/api/forecast', json={'size': 1000, 'brands': ['nobody']}).status_code == 400
+
+
+def test_large_forecasts_run_as_jobs(client, app):
+    response = client.post('/api/forecast', json={'size': SYNC_POPULATION + 1, 'brands': ['zara']})
+    assert response.status_code == 202
+    manager = app.extensions['sizing']['job_manager']
+    job_id = response.get_json()['data']['job_id']
+    deadline = time.monotonic() + 60
+    while manager.status(job_id)['status'] not in ('completed', 'failed') and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert manager.status(job_id)['status'] == 'completed'
+    report = json.loads(next(iter(manager.iter_results(job_id, 'jsonl'))))
+    assert report['population'] == SYNC_POPULATION + 1
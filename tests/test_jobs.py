@@ -0,0 +1,99 @@
+"""
+Bulk job store, dispatch, resume and upload validation
+"""
+
+import io
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from jobs import JobManager, JobStore
+
+CSV_UPLOAD = (
+    'id,gender,height,morphotype,poitrine,epaules,bassin,hanches\n'
+    'a,homme,175,normal,95,45,85,95\n'
+    'b,femme,165,normal,88,38,70,96\n'
+    'c,homme,182,athletique,104,48,88,100\n'
+)
+
+
+def wait_for(manager, job_id, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = manager.status(job_id)
+        if status['status'] in ('completed', 'failed'):
+            return status
+        time.sleep(0.1)
+    raise AssertionError(f'Job {job_id} did not finish: {manager.status(job_id)}')
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = JobManager(str(tmp_path), max_workers=1, chunk_size=2, resume=False)
+    yield manager
+    manager.close()
+
+
+def test_claim_is_compare_and_set(tmp_path):
+    store = JobStore(str(tmp_path / 'jobs.sqlite3'))
+    store.create_job('job', 'jsonl', [(0, 1)], owner_pid=1)
+    assert store.claim('job', 1, 2)
+    assert not store.claim('job', 1, 3)
+    assert store.get_job('job')['owner_pid'] == 2
+
+
+def test_csv_job_results_in_row_order(manager):
+    job_id = manager.create_job(io.BytesIO(CSV_UPLOAD.encode()), 'csv')
+    status = wait_for(manager, job_id)
+    assert status['status'] == 'completed'
+    assert (status['total_rows'], status['total_chunks']) == (3, 2)
+
+    lines = list(manager.iter_results(job_id, 'csv'))
+    assert lines[0].startswith('row,id,top_size')
+    assert [line.split(',')[1] for line in lines[1:]] == ['a', 'b', 'c']
+
+
+def test_resume_restarts_jobs_of_exited_owners(tmp_path, manager, monkeypatch):
+    owner = dead_pid()
+    monkeypatch.setattr(manager, '_hold_owner_lock', lambda: owner)
+    monkeypatch.setattr(manager, 'start', lambda job_id: None)
+    job_id = manager.create_job(io.BytesIO(CSV_UPLOAD.encode()), 'csv')
+
+    successor = JobManager(str(tmp_path), max_workers=1, resume=True)
+    try:
+        assert wait_for(successor, job_id)['status'] == 'completed'
+        assert successor.store.get_job(job_id)['owner_pid'] == os.getpid()
+    finally:
+        successor.close()
+
+
+def test_resume_leaves_jobs_of_live_owners(tmp_path, manager, monkeypatch):
+    monkeypatch.setattr(manager, '_hold_owner_lock', os.getpid)
+    monkeypatch.setattr(manager, 'start', lambda job_id: None)
+    job_id = manager.create_job(io.BytesIO(CSV_UPLOAD.encode()), 'csv')
+
+    JobManager(str(tmp_path), max_workers=1, resume=True)
+    time.sleep(0.2)
+    assert manager.status(job_id)['status'] == 'queued'
+
+
+@pytest.mark.parametrize('body, filename', [
+    ('id,poitrine\n"' + 'x' * 200000 + '",95\n', 'people.csv'),
+    ('id,poitrine\na,not-a-number\n', 'people.csv'),
+    ('{"measurements": \n', 'people.jsonl')
+], ids=['csv-field-too-large', 'csv-not-a-number', 'jsonl-truncated'])
+def test_malformed_uploads_are_rejected(client, app, body, filename):
+    response = client.post('/api/jobs', data={'file': (io.BytesIO(body.encode()), filename)})
+    assert response.status_code == 400
+    assert response.get_json()['error_code'] == 'INVALID_UPLOAD'
+    data_dir = app.extensions['sizing']['job_manager'].data_dir
+    assert sorted(os.listdir(data_dir)) == ['jobs.sqlite3', 'owners']
@@ -0,0 +1,60 @@
+"""
+Content negotiation: JSON, MessagePack and CBOR bodies and static payloads
+"""
+
+import pytest
+
+from benchmarks import SAMPLE_PAYLOAD
+
+msgpack = pytest.importorskip('msgpack')
+cbor2 = pytest.importorskip('cbor2')
+
+FORMATS = {
+    'application/msgpack': (lambda payload: msgpack.packb(payload, use_bin_type=True), msgpack.unpackb),
+    'application/x-msgpack': (lambda payload: msgpack.packb(payload, use_bin_type=True), msgpack.unpackb),
+    'application/cbor': (cbor2.dumps, cbor2.loads)
+}
+
+
+def test_json_is_the_default(client):
+    response = client.post('/api/recommend', json=SAMPLE_PAYLOAD)
+    assert response.mimetype == 'application/json'
+    assert 'Accept' in response.headers['Vary']
+    assert client.get('/api/brands', headers={'Accept': 'text/html'}).mimetype == 'application/json'
+
+
+@pytest.mark.parametrize('mimetype', list(FORMATS))
+def test_binary_request_and_response(client, mimetype):
+    encode, decode = FORMATS[mimetype]
+    response = client.post('/api/recommend', data=encode(SAMPLE_PAYLOAD),
+                           headers={'Content-Type': mimetype, 'Accept': mimetype})
+    assert response.status_code == 200
+    assert response.mimetype in FORMATS
+    binary = decode(response.get_data())
+    as_json = client.post('/api/recommend', json=SAMPLE_PAYLOAD).get_json()
+    assert binary['data']['sizes'] == as_json['data']['sizes']
+
+
+def test_preference_order_of_the_accept_header(client):
+    headers = {'Accept': 'application/json;q=0.5, application/cbor'}
+    response = client.get('/api/health', headers=headers)
+    assert response.mimetype == 'application/cbor'
+    assert cbor2.loads(response.get_data())['status'] == 'healthy'
+
+
+def test_static_bodies_follow_brand_offset_changes(client):
+    headers = {'Accept': 'application/msgpack'}
+    before = msgpack.unpackb(client.get('/api/brands', headers=headers).get_data())
+    assert before['data']['brand_details']['zara']['top'] == -1
+
+    events = [{'brand': 'zara', 'garment': 'top', 'outcome': 'too_small'}] * 200
+    assert client.post('/api/feedback', json={'events': events}).status_code == 202
+    after = msgpack.unpackb(client.get('/api/brands', headers=headers).get_data())
+    assert after['data']['brand_details']['zara']['top'] == 0
+
+
+def test_errors_are_negotiated_too(client):
+    response = client.post('/api/recommend', data=msgpack.packb({'gender': 'homme'}),
+                           headers={'Content-Type': 'application/msgpack', 'Accept': 'application/msgpack'})
+    assert response.status_code == 400
+    assert msgpack.unpackb(response.get_data())['error_code'] == 'MISSING_FIELD'
@@ -0,0 +1,79 @@
+"""
+Parallel batch scoring: columnar encoding, invalid rows and worker pools
+"""
+
+import pytest
+
+import parallel
+from benchmarks import SAMPLE_PAYLOAD
+from engine import ProfessionalSizeRecommendationEngine
+from parallel import (INVALID, ParallelBatchScorer, _score_encoded, decode_payload, encode_payloads, score_payload,
+                      slice_batch)
+from vectorized import random_profiles
+
+
+def with_measurement(name, value):
+    return {**SAMPLE_PAYLOAD, 'measurements': {**SAMPLE_PAYLOAD['measurements'], name: value}}
+
+
+MALFORMED = [
+    with_measurement('poitrine', '100'),
+    with_measurement('hanches', None),
+    {**SAMPLE_PAYLOAD, 'height': '175'},
+    {**SAMPLE_PAYLOAD, 'height': 10 ** 400},
+    {**SAMPLE_PAYLOAD, 'measurements': [95, 45]},
+    'not a payload'
+]
+
+
+@pytest.fixture
+def worker_engine(monkeypatch):
+    monkeypatch.setattr(parallel, '_worker_engine', ProfessionalSizeRecommendationEngine())
+    return parallel._worker_engine
+
+
+def test_encoding_round_trips():
+    payloads = random_profiles(200, 0) + [SAMPLE_PAYLOAD]
+    batch = encode_payloads(payloads)
+    assert batch['errors'] == {}
+    assert [decode_payload(batch, index) for index in range(len(payloads))] == payloads
+    assert decode_payload(slice_batch(batch, 200, 201), 0) == SAMPLE_PAYLOAD
+
+
+def test_malformed_rows_are_invalid_without_failing_the_batch():
+    batch = encode_payloads([SAMPLE_PAYLOAD, *MALFORMED, SAMPLE_PAYLOAD])
+    assert sorted(batch['errors']) == list(range(1, len(MALFORMED) + 1))
+    assert batch['errors'][1] == "poitrine must be a number, got '100'"
+    assert batch['errors'][4] == 'height is out of range'
+    assert [flags & INVALID for flags in batch['flags']] == [0] + [INVALID] * len(MALFORMED) + [0]
+    assert decode_payload(batch, len(MALFORMED) + 1) == SAMPLE_PAYLOAD
+
+
+def test_encoded_scoring_matches_the_scalar_engine(worker_engine):
+    payloads = random_profiles(50, 1) + MALFORMED[:4]
+    _, encoded = _score_encoded(0, encode_payloads(payloads))
+    results = [None] * len(payloads)
+    ParallelBatchScorer._decode_results(results, 0, len(payloads), encoded)
+    for payload, result in zip(payloads, results):
+        expected = score_payload(worker_engine, payload)
+        # Both paths reject the row; only the encoder's message is more specific
+        assert ('error' in result) == ('error' in expected)
+        if 'error' not in expected:
+            assert result == pytest.approx(expected)
+
+
+def test_more_categories_than_16_bit_codes():
+    payloads = [{**SAMPLE_PAYLOAD, 'brand': f'brand-{index}'} for index in range(70000)]
+    batch = encode_payloads(payloads)
+    assert batch['errors'] == {}
+    assert decode_payload(batch, 69999)['brand'] == 'brand-69999'
+
+
+@pytest.mark.parametrize('shared_tables', [False, True])
+def test_pool_scores_in_input_order(shared_tables):
+    payloads = random_profiles(300, 2) + [MALFORMED[0]]
+    engine = ProfessionalSizeRecommendationEngine()
+    with ParallelBatchScorer(max_workers=2, shared_tables=shared_tables) as scorer:
+        results = scorer.score(payloads)
+    assert results[:-1] == pytest.approx([score_payload(engine, payload) for payload in payloads[:-1]])
+    assert results[-1] == {'error': "poitrine must be a number, got '100'"}
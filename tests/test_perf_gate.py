@@ -0,0 +1,68 @@
+"""
+Performance gate: noise model, machine scaling and the allocation benchmark
+"""
+
+import json
+
+import pytest
+
+from perf_gate import BASELINE_PATH, METRICS, bench_allocations, bench_endpoint, compare
+
+# Endpoint latencies of a noisy baseline run, in microseconds
+NOISY_RUNS = [740.5, 563.1, 625.0, 692.9, 659.4, 634.2, 670.1]
+
+
+def run(samples, machine='CPython-3.11-x86_64-1cpu', calibration_ms=10.0):
+    return {'machine': machine, 'calibration_ms': calibration_ms, 'samples': samples}
+
+
+def verdict(baseline, current, **kwargs):
+    return {row['metric']: row for row in compare(baseline, current, **kwargs)}
+
+
+def test_a_noisy_regression_is_caught():
+    baseline = run({'endpoint_recommend_us': NOISY_RUNS})
+    slower = run({'endpoint_recommend_us': [value * 1.165 for value in NOISY_RUNS]})
+    assert verdict(baseline, slower)['endpoint_recommend_us']['regressed']
+    same = run({'endpoint_recommend_us': list(reversed(NOISY_RUNS))})
+    assert not verdict(baseline, same)['endpoint_recommend_us']['regressed']
+
+
+def test_noise_margin_shrinks_with_repetitions():
+    few = verdict(run({'engine_recommend_us': NOISY_RUNS}), run({'engine_recommend_us': NOISY_RUNS}), tolerance=0)
+    many = verdict(run({'engine_recommend_us': NOISY_RUNS * 4}), run({'engine_recommend_us': NOISY_RUNS * 4}),
+                   tolerance=0)
+    assert many['engine_recommend_us']['noise'] == pytest.approx(few['engine_recommend_us']['noise'] / 2)
+
+
+def test_direction_and_machine_scaling():
+    baseline = run({'engine_throughput_rps': [1000.0] * 5, 'engine_recommend_us': [50.0] * 5,
+                    'engine_peak_alloc_kb': [10.0]})
+    # Twice as slow a machine: timings are scaled, allocations are not
+    current = run({'engine_throughput_rps': [520.0] * 5, 'engine_recommend_us': [98.0] * 5,
+                   'engine_peak_alloc_kb': [12.0]}, machine='other', calibration_ms=20.0)
+    rows = verdict(baseline, current)
+    assert not rows['engine_throughput_rps']['regressed']
+    assert not rows['engine_recommend_us']['regressed']
+    assert rows['engine_peak_alloc_kb']['regressed']
+    # On the baseline's own machine the same numbers are regressions
+    rows = verdict(baseline, {**current, 'machine': baseline['machine']})
+    assert rows['engine_throughput_rps']['regressed'] and rows['engine_recommend_us']['regressed']
+
+
+def test_allocations_include_the_kept_result():
+    peak_kb = bench_allocations(calls=20)[0]
+    # Measured with each result freed first, a call looked like 1.5 KB
+    assert 6 < peak_kb < 20
+
+
+def test_endpoint_probe_runs_against_the_app():
+    samples = bench_endpoint(repeats=2, requests=5)
+    assert len(samples) == 2 and all(sample > 0 for sample in samples)
+
+
+def test_committed_baseline_covers_every_metric():
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    assert set(baseline['samples']) == set(METRICS)
+    assert len(baseline['samples']['endpoint_recommend_us']) >= 15
@@ -0,0 +1,102 @@
+"""
+Decision region cache: agreement with the engine, region hits and invalidation
+"""
+
+import math
+
+import pytest
+
+from benchmarks import SAMPLE_PAYLOAD
+from engine import ProfessionalSizeRecommendationEngine
+from region_cache import (BODY_TYPE_THRESHOLDS, MISS, RegionCachedEngine, RegionIndex, check_regions,
+                          random_inputs)
+
+CHART = [('S', [(80, 90)]), ('M', [(90, 100)]), ('L', [(100, 110)])]
+
+
+@pytest.fixture
+def region_cache_env(monkeypatch):
+    monkeypatch.setenv('SIZING_REGION_CACHE', '1')
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_sizes_and_body_types_match_the_engine(seed):
+    mismatches, report = check_regions(random_inputs(3000, seed))
+    assert mismatches == []
+    assert report['region_size_hit_rate'] > report['exact_size_hit_rate']
+    assert report['region_body_type_hit_rate'] > report['exact_body_type_hit_rate']
+
+
+def test_full_recommendations_match_the_engine():
+    base, cached = ProfessionalSizeRecommendationEngine(), RegionCachedEngine()
+    for payload in random_inputs(300, 2) * 2:
+        assert cached.recommend_size(payload) == base.recommend_size(payload)
+
+
+def test_body_types_on_and_around_the_thresholds():
+    base, cached = ProfessionalSizeRecommendationEngine(), RegionCachedEngine()
+    values = {0.5, 1.5}
+    for thresholds in BODY_TYPE_THRESHOLDS.values():
+        for points in thresholds.values():
+            for point in points:
+                values.update([point, math.nextafter(point, 0), math.nextafter(point, 2)])
+    for gender in ['homme', 'femme']:
+        for shoulder_hip in values:
+            for waist_hip in values:
+                ratios = {'shoulder_hip': shoulder_hip, 'waist_hip': waist_hip}
+                assert cached.determine_professional_body_type(ratios, gender) == \
+                    base.determine_professional_body_type(ratios, gender)
+
+
+def test_certified_box_answers_nearby_points():
+    index = RegionIndex(CHART, [1.0])
+    assert index.find((85.0,)) is MISS
+    index.learn((85.0,), 'S')
+    assert index.find((85.0,)) == 'S'
+    assert index.find((81.5,)) == 'S'
+    # Beyond the box learned so far
+    assert index.find((95.0,)) is MISS
+    assert (index.point_hits, index.region_hits, index.misses) == (1, 1, 2)
+
+
+def test_uncertifiable_box_is_split():
+    # Between two ranges the nearer one wins, so the cell (90, 110] of a gap chart is halved
+    index = RegionIndex([('S', [(80, 90)]), ('L', [(110, 120)])], [1.0])
+    index.learn((92.0,), 'S')
+    assert index.find((94.0,)) == 'S'
+    assert index.find((99.0,)) is MISS
+    assert index.node_count > 1
+
+
+def test_clear_regions_after_changing_a_chart():
+    engine = RegionCachedEngine()
+    assert engine.recommend_size(SAMPLE_PAYLOAD)['sizes']['bottom']['size'] == '40'
+    assert engine.get_region_metrics()['size_regions'] > 0
+    for ranges in engine.men_bottom_sizes.values():
+        ranges['waist'] = (ranges['waist'][0] + 4, ranges['waist'][1] + 4)
+        ranges['hips'] = (ranges['hips'][0] + 4, ranges['hips'][1] + 4)
+    # Regions certified against the old chart keep answering until cleared
+    assert engine.recommend_size(SAMPLE_PAYLOAD)['sizes']['bottom']['size'] == '40'
+    engine.clear_regions()
+    base = ProfessionalSizeRecommendationEngine()
+    base.men_bottom_sizes = engine.men_bottom_sizes
+    assert engine.recommend_size(SAMPLE_PAYLOAD)['sizes'] == base.recommend_size(SAMPLE_PAYLOAD)['sizes']
+    assert engine.recommend_size(SAMPLE_PAYLOAD)['sizes']['bottom']['size'] == '38'
+
+
+def test_non_numeric_measurements_bypass_the_cache():
+    engine = RegionCachedEngine()
+    payload = {**SAMPLE_PAYLOAD, 'measurements': {**SAMPLE_PAYLOAD['measurements'], 'bassin': float('nan')}}
+    expected = ProfessionalSizeRecommendationEngine().recommend_size(payload)
+    assert engine.recommend_size(payload)['sizes'] == expected['sizes']
+    assert engine.get_region_metrics()['size_misses'] == 1
+
+
+def test_metrics_endpoint_reports_the_region_cache(region_cache_env, client):
+    # Different heights miss the result cache but share every size region
+    for height in (181, 182):
+        client.post('/api/recommend', json={**SAMPLE_PAYLOAD, 'height': height})
+    metrics = client.get('/api/metrics').get_json()['data']['region_cache']
+    assert metrics['size_misses'] == 2
+    assert metrics['size_point_hits'] == 2
+    assert metrics['body_type_hits'] == 1
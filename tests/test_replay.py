@@ -0,0 +1,104 @@
+"""
+Replay harness: corpora, output diffs between engine versions and latency tables
+"""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+from benchmarks import SAMPLE_PAYLOAD
+from engine import ProfessionalSizeRecommendationEngine
+from event_log import EventLog
+from replay import (LATENCY_BINS, STAGES, compared_fields, latency_table, read_corpus, replay,
+                    resolve_target)
+from vectorized import random_profiles
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENGINE_SOURCE = os.path.join(ROOT, 'engine.py')
+
+# A candidate version that reports one point less confidence on every request
+LESS_CONFIDENT = """
+from engine import ProfessionalSizeRecommendationEngine as CurrentEngine
+
+
+class ProfessionalSizeRecommendationEngine(CurrentEngine):
+    def calculate_professional_confidence(self, *args, **kwargs):
+        return super().calculate_professional_confidence(*args, **kwargs) - 1
+"""
+
+
+@pytest.fixture
+def corpus_file(tmp_path):
+    path = tmp_path / 'corpus.jsonl'
+    lines = [json.dumps(payload) for payload in random_profiles(30, 2)]
+    # A blank line is skipped; a payload the engine rejects is an error on both sides
+    path.write_text('\n'.join(lines[:10] + [''] + lines[10:] + [json.dumps({'gender': 'homme'})]) + '\n')
+    return str(path)
+
+
+def test_compared_fields_of_a_recommendation():
+    fields = compared_fields(ProfessionalSizeRecommendationEngine().recommend_size(SAMPLE_PAYLOAD))
+    assert (fields['top_size'], fields['bottom_size'], fields['brand_top_size'], fields['brand_bottom_size']) == \
+        ('S', '40', 'XS', '36')
+    assert fields['confidence'] == 98
+
+
+def test_jsonl_corpus_keeps_line_numbers(corpus_file):
+    rows = list(read_corpus(corpus_file))
+    assert len(rows) == 31
+    assert [line for line, _ in rows[9:12]] == [10, 12, 13]
+
+
+def test_event_log_directory_is_a_corpus(tmp_path):
+    engine = ProfessionalSizeRecommendationEngine()
+    payloads = random_profiles(20, 4)
+    log = EventLog(str(tmp_path))
+    for payload in payloads:
+        log.record(payload, engine.recommend_size(payload), 1.0)
+    log.close()
+    assert list(read_corpus(str(tmp_path))) == list(enumerate(payloads, 1))
+
+
+def test_same_engine_replays_identically(corpus_file):
+    report = replay(read_corpus(corpus_file), ENGINE_SOURCE, ENGINE_SOURCE, workers=1, chunk_size=8)
+    assert (report['rows'], report['identical'], report['changed']) == (31, 30, 0)
+    assert report['errors'] == {'baseline': 1, 'candidate': 1}
+    assert report['examples'][0]['line'] == 32
+    assert set(report['latency_ms']) == set(STAGES)
+    assert set(report['latency_ms']['total']) == {'baseline', 'candidate'}
+
+
+def test_changed_engine_reports_the_differing_fields(corpus_file, tmp_path):
+    candidate = tmp_path / 'candidate_engine.py'
+    candidate.write_text(LESS_CONFIDENT)
+    report = replay(read_corpus(corpus_file), ENGINE_SOURCE, str(candidate), workers=1)
+    assert (report['identical'], report['changed']) == (0, 30)
+    assert report['field_diffs'] == {'confidence': 30}
+    change = next(example for example in report['examples'] if 'changes' in example)
+    confidence = change['changes']['confidence']
+    assert confidence['candidate'] == confidence['baseline'] - 1
+
+
+def test_latency_table_reads_upper_bin_edges():
+    counts = np.zeros(len(LATENCY_BINS) + 1, dtype=np.int64)
+    counts[np.searchsorted(LATENCY_BINS, 0.5)] = 98
+    counts[np.searchsorted(LATENCY_BINS, 50.0)] = 2
+    empty = np.zeros_like(counts)
+    latency = {'baseline': {stage: empty for stage in STAGES}, 'candidate': {stage: empty for stage in STAGES}}
+    latency['baseline'] = {**latency['baseline'], 'total': counts}
+    row = latency_table(latency)['total']['baseline']
+    assert 0.5 <= row['p50'] < 0.53 and row['p90'] == row['p50']
+    assert 50.0 <= row['p99'] < 53.0
+    assert list(latency_table(latency)) == ['total']
+
+
+def test_resolve_target(tmp_path):
+    assert resolve_target('http://localhost:5000', str(tmp_path)) == 'http://localhost:5000'
+    path = resolve_target('git:HEAD', str(tmp_path))
+    assert os.path.dirname(path) == str(tmp_path)
+    with open(path) as f:
+        assert 'class ProfessionalSizeRecommendationEngine' in f.read()
+    with pytest.raises(ValueError):
+        resolve_target(str(tmp_path / 'missing.py'), str(tmp_path))
@@ -0,0 +1,104 @@
+"""
+Sampling profiler, collapsed-stack export and its admin routes
+"""
+
+import threading
+
+import pytest
+from flask import Flask
+
+from sampling_profiler import TRUNCATED_STACK, SamplingProfiler, create_profiler_blueprint
+
+TOKEN = 'secret-token'
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(100))
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_loop, args=(stop,), name='busy')
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+def profiler_client(profiler, token=TOKEN):
+    app = Flask(__name__)
+    app.register_blueprint(create_profiler_blueprint(profiler, token))
+    return app.test_client()
+
+
+def test_samples_busy_threads_and_skips_idle_ones(busy_thread):
+    profiler = SamplingProfiler(hz=0)
+    parked = threading.Event()
+    idle = threading.Thread(target=parked.wait)
+    idle.start()
+    try:
+        for _ in range(20):
+            profiler.sample(skip=threading.get_ident())
+    finally:
+        parked.set()
+        idle.join()
+
+    collapsed = profiler.collapsed()
+    assert 'test_sampling_profiler.py:busy_loop' in collapsed
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in collapsed.splitlines())
+    metrics = profiler.get_metrics()
+    assert metrics['samples'] == 20
+    assert metrics['idle_skipped'] >= 20
+    assert profiler.top_functions()[0]['self_samples'] > 0
+
+
+def test_distinct_stacks_are_bounded(busy_thread):
+    profiler = SamplingProfiler(hz=0, max_stacks=1)
+    for _ in range(5):
+        profiler.sample()
+    # One stack is kept; every other sampled stack is counted under the truncated marker
+    assert len(profiler._stacks) == 2
+    assert TRUNCATED_STACK in profiler._stacks
+    assert profiler.get_metrics()['truncated'] >= 5
+
+
+def test_reset_starts_a_new_window(busy_thread):
+    profiler = SamplingProfiler(hz=0)
+    profiler.sample()
+    assert profiler.collapsed(reset=True)
+    assert profiler.collapsed() == ''
+    assert profiler.get_metrics()['distinct_stacks'] == 0
+
+
+def test_admin_routes_are_off_without_a_token(client):
+    assert client.get('/api/admin/profile').status_code == 404
+    assert profiler_client(SamplingProfiler(), token=None).get('/api/admin/profile?reset=true').status_code == 404
+
+
+def test_admin_routes_require_the_token():
+    client = profiler_client(SamplingProfiler())
+    assert client.get('/api/admin/profile').status_code == 401
+    assert client.get('/api/admin/profile', headers={'X-Admin-Token': 'wrong'}).status_code == 401
+
+
+def test_admin_routes_export_with_the_token(busy_thread):
+    profiler = SamplingProfiler()
+    profiler.sample()
+    client = profiler_client(profiler)
+    headers = {'X-Admin-Token': TOKEN}
+
+    response = client.get('/api/admin/profile', headers=headers)
+    assert response.status_code == 200
+    assert 'busy_loop' in response.get_data(as_text=True)
+
+    response = client.get('/api/admin/profile?format=json&reset=true', headers=headers)
+    assert response.get_json()['data']['top_functions']
+    assert profiler.collapsed() == ''
+
+
+def test_disabled_profiler_reports_it():
+    response = profiler_client(SamplingProfiler(hz=0)).get('/api/admin/profile', headers={'X-Admin-Token': TOKEN})
+    assert response.status_code == 404
+    assert response.get_json()['error_code'] == 'PROFILER_DISABLED'
@@ -0,0 +1,96 @@
+"""
+Measurement sessions: delta updates, stage reuse, size bound and expiry
+"""
+
+import pytest
+
+from benchmarks import SAMPLE_PAYLOAD
+from engine import ProfessionalSizeRecommendationEngine
+from feedback import FeedbackLearner
+from sessions import STAGE_NAMES, SessionStore, apply_delta, estimate_size, normalize_inputs
+
+
+@pytest.fixture
+def engine():
+    return ProfessionalSizeRecommendationEngine()
+
+
+def test_delta_reports_only_changed_paths():
+    inputs = normalize_inputs(SAMPLE_PAYLOAD)
+    updated, changed = apply_delta(inputs, {'measurements': {'hanches': inputs['measurements']['hanches'] + 4,
+                                                             'poitrine': inputs['measurements']['poitrine']},
+                                            'gender': inputs['gender']})
+    assert changed == {'measurements.hanches'}
+    assert inputs['measurements']['hanches'] != updated['measurements']['hanches']
+    for delta in ({'shoe_size': 42}, {'measurements': 90}):
+        with pytest.raises(ValueError):
+            apply_delta(inputs, delta)
+
+
+def test_update_recomputes_only_affected_stages(engine):
+    store = SessionStore(engine)
+    created = store.create(SAMPLE_PAYLOAD)
+    assert created['recomputed_stages'] == STAGE_NAMES
+
+    hips = SAMPLE_PAYLOAD['measurements']['hanches'] + 12
+    updated = store.update(created['session_id'], {'measurements': {'hanches': hips}})
+    assert 'top_size' not in updated['recomputed_stages']
+    assert {'body_analysis', 'bottom_size'} <= set(updated['recomputed_stages'])
+    payload = {**SAMPLE_PAYLOAD, 'measurements': {**SAMPLE_PAYLOAD['measurements'], 'hanches': hips}}
+    assert updated['recommendation'] == {**engine.recommend_size(payload),
+                                         'api_metadata': updated['recommendation']['api_metadata']}
+
+
+def test_learned_offsets_recompute_brand_recommendations(engine, tmp_path):
+    learner = FeedbackLearner(engine, str(tmp_path), sync_interval=0)
+    store = SessionStore(engine, feedback_learner=learner)
+    session_id = store.create({**SAMPLE_PAYLOAD, 'brand': 'zara'})['session_id']
+    assert 'brand_recommendations' not in store.update(session_id, {'height': 171})['recomputed_stages']
+
+    learner.ingest([{'brand': 'zara', 'garment': 'top', 'outcome': 'too_small'}] * 200)
+    updated = store.update(session_id, {'height': 172})
+    assert 'brand_recommendations' in updated['recomputed_stages']
+    assert updated['recommendation']['brand_recommendations'] == \
+        engine.get_brand_recommendations(store.get(session_id).results['top_size'],
+                                         store.get(session_id).results['bottom_size'], 'zara')
+    learner.close()
+
+
+def test_sessions_are_bounded_by_estimated_size(engine):
+    inputs = normalize_inputs(SAMPLE_PAYLOAD)
+    store = SessionStore(engine, max_bytes=1)
+    size = store.get(store.create(SAMPLE_PAYLOAD)['session_id']).size
+    assert size > 0
+
+    store = SessionStore(engine, max_bytes=3 * size)
+    ids = [store.create(SAMPLE_PAYLOAD)['session_id'] for _ in range(5)]
+    metrics = store.get_metrics()
+    assert (metrics['active'], metrics['evicted']) == (3, 2)
+    assert metrics['estimated_bytes'] <= 3 * size
+    assert store.get(ids[0]) is None and store.get(ids[-1]) is not None
+    assert store.delete(ids[-1])
+    assert store.get_metrics()['estimated_bytes'] == sum(store.get(i).size for i in ids[2:4])
+    assert estimate_size(inputs, {}) < size
+
+
+def test_idle_sessions_expire(engine):
+    store = SessionStore(engine, ttl_seconds=0)
+    session_id = store.create(SAMPLE_PAYLOAD)['session_id']
+    assert store.get(session_id) is None
+    assert store.update(session_id, {'height': 170}) is None
+    metrics = store.get_metrics()
+    assert (metrics['expired'], metrics['estimated_bytes']) == (1, 0)
+
+
+def test_session_routes(client):
+    response = client.post('/api/sessions', json=SAMPLE_PAYLOAD)
+    assert response.status_code == 201
+    session_id = response.get_json()['data']['session_id']
+
+    response = client.patch(f'/api/sessions/{session_id}', json={'measurements': {'hanches': 104}})
+    assert response.get_json()['data']['inputs']['measurements']['hanches'] == 104
+    assert client.patch(f'/api/sessions/{session_id}', json={'shoe_size': 42}).status_code == 400
+    assert client.get(f'/api/sessions/{session_id}').get_json()['data']['updates'] == 1
+    assert client.delete(f'/api/sessions/{session_id}').status_code == 200
+    assert client.get(f'/api/sessions/{session_id}').status_code == 404
+    assert client.post('/api/sessions', json={'gender': 'femme'}).status_code == 400
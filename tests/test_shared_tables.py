@@ -0,0 +1,70 @@
+"""
+Shared engine tables: binary image, read-only views and shared memory
+"""
+
+import pytest
+
+from benchmarks import SAMPLE_PAYLOAD
+from engine import ProfessionalSizeRecommendationEngine
+from shared_tables import (TABLE_ATTRIBUTES, SharedTables, attach_shared_memory, compile_tables, map_tables_file,
+                           publish_shared_memory, to_builtin, write_tables_file)
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return ProfessionalSizeRecommendationEngine()
+
+
+@pytest.fixture
+def tables(engine):
+    tables = SharedTables(compile_tables(engine, {'built_by': 'test'}))
+    yield tables
+    tables.close()
+
+
+def test_every_table_round_trips(engine, tables):
+    assert tables.metadata == {'built_by': 'test'}
+    for attr in TABLE_ATTRIBUTES:
+        assert to_builtin(tables.table(attr)) == getattr(engine, attr)
+
+
+def test_rows_behave_like_read_only_dicts(tables):
+    sizes = tables.table('men_top_sizes')
+    assert list(sizes)[:2] == ['XS', 'S']
+    assert sizes['M']['chest'] == (94, 98)
+    assert sizes.get('XXXXL') is None and 'M' in sizes and 3 not in sizes
+    assert sizes['M'].get('waist', 'absent') == 'absent'
+    with pytest.raises(KeyError):
+        sizes['XXXXL']
+    with pytest.raises(TypeError):
+        sizes['M']['chest'] = (0, 1)
+    assert tables.table('brand_adjustments')['zara']['top'] == -1
+
+
+def test_memory_mapped_file(engine, tmp_path):
+    path = str(tmp_path / 'tables.bin')
+    assert write_tables_file(engine, path) > 0
+    tables = map_tables_file(path)
+    rebuilt = ProfessionalSizeRecommendationEngine.from_tables(tables.tables)
+    assert rebuilt.recommend_size(SAMPLE_PAYLOAD)['sizes'] == engine.recommend_size(SAMPLE_PAYLOAD)['sizes']
+    tables.close()
+
+
+def test_shared_memory_block(engine):
+    block = publish_shared_memory(engine)
+    try:
+        tables = attach_shared_memory(block.name)
+        assert to_builtin(tables.table('women_bottom_sizes')) == engine.women_bottom_sizes
+        tables.close()
+    finally:
+        block.close()
+        block.unlink()
+
+
+def test_unsupported_values_and_images_are_refused():
+    broken = ProfessionalSizeRecommendationEngine()
+    broken.fit_adjustments = {'standard': {'ease': True}}
+    with pytest.raises(ValueError, match='boolean'):
+        compile_tables(broken)
+    with pytest.raises(ValueError, match='Not an engine table image'):
+        SharedTables(b'NOTSZTBL' + bytes(64))
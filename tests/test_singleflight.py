@@ -0,0 +1,81 @@
+"""
+Single-flight coalescing of identical recommendation computations
+"""
+
+import threading
+import time
+
+import pytest
+
+from benchmarks import SAMPLE_PAYLOAD
+from singleflight import SingleFlight, canonical_key
+
+
+def run_concurrently(flight, key, fn, callers):
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(flight.do(key, fn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def slow(value, calls):
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        if isinstance(value, Exception):
+            raise value
+        return value
+    return compute
+
+
+def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight()
+    calls = []
+    results, errors = run_concurrently(flight, 'k', slow({'size': 'M'}, calls), 5)
+    assert (len(calls), errors) == (1, [])
+    assert results == [{'size': 'M'}] * 5
+    metrics = flight.get_metrics()
+    assert (metrics['executions'], metrics['coalesced'], metrics['in_flight']) == (1, 4, 0)
+    assert metrics['coalesce_rate'] == 0.8
+
+
+def test_waiters_receive_the_leaders_error():
+    flight = SingleFlight()
+    calls = []
+    results, errors = run_concurrently(flight, 'k', slow(ValueError('bad payload'), calls), 3)
+    assert (len(calls), results) == (1, [])
+    assert [str(error) for error in errors] == ['bad payload'] * 3
+    # A failed key is not remembered
+    assert flight.do('k', lambda: 'ok') == 'ok'
+
+
+def test_sequential_calls_are_not_coalesced():
+    flight = SingleFlight()
+    assert [flight.do('k', lambda: index) for index in range(3)] == [0, 1, 2]
+    assert flight.get_metrics()['coalesced'] == 0
+
+
+@pytest.mark.parametrize('variant', [
+    {'brand': 'ZARA'},
+    {'gender': 'Homme', 'morphotype': 'NORMAL'},
+    {'fit_preferences': {**SAMPLE_PAYLOAD['fit_preferences'], 'epaules': 'Cintre'}},
+    {'request_id': 'ignored'}
+])
+def test_canonical_key_ignores_case_and_extra_fields(variant):
+    assert canonical_key({**SAMPLE_PAYLOAD, **variant}) == canonical_key(SAMPLE_PAYLOAD)
+
+
+def test_canonical_key_separates_measurements():
+    changed = {**SAMPLE_PAYLOAD, 'measurements': {**SAMPLE_PAYLOAD['measurements'], 'hanches': 96}}
+    assert canonical_key(changed) != canonical_key(SAMPLE_PAYLOAD)
+    assert canonical_key({**SAMPLE_PAYLOAD, 'brand': 'h&m'}) != canonical_key(SAMPLE_PAYLOAD)
@@ -0,0 +1,78 @@
+"""
+Slow-request ring buffer, stage timings and its admin routes
+"""
+
+import json
+
+import pytest
+from flask import Flask
+
+from benchmarks import SAMPLE_PAYLOAD
+from engine import ProfessionalSizeRecommendationEngine
+from singleflight import canonical_key
+from slow_requests import TIMED_STAGES, SlowRequestLog, StageTimer, create_slow_requests_blueprint
+
+TOKEN = 'secret-token'
+
+
+def key(index):
+    return canonical_key({**SAMPLE_PAYLOAD, 'height': 150 + index})
+
+
+@pytest.fixture
+def slow_log():
+    log = SlowRequestLog(capacity=3)
+    for index, latency in enumerate([5.0, 1.0, 9.0, 3.0, 7.0]):
+        log.record(latency, key(index))
+    return log
+
+
+@pytest.fixture
+def admin_client(slow_log):
+    app = Flask(__name__)
+    app.register_blueprint(create_slow_requests_blueprint(slow_log, TOKEN))
+    return app.test_client()
+
+
+def test_keeps_the_slowest_requests(slow_log):
+    assert [entry['latency_ms'] for entry in slow_log.entries()] == [9.0, 7.0, 5.0]
+    assert slow_log.get_metrics()['floor_ms'] == 5.0
+    assert not slow_log.record(4.0, key(9))
+    assert slow_log.entries()[0]['payload']['height'] == 152
+
+
+def test_stage_timer_times_each_engine_stage():
+    engine = ProfessionalSizeRecommendationEngine()
+    timer = StageTimer(engine)
+    timer.begin()
+    engine.recommend_size(SAMPLE_PAYLOAD)
+    assert set(timer.timings()) == {stage for stage, _ in TIMED_STAGES}
+
+    log = SlowRequestLog(capacity=1)
+    log.record(50.0, canonical_key(SAMPLE_PAYLOAD), timer)
+    entry = log.entries()[0]
+    assert not entry['reused_result']
+    assert entry['outside_stages_ms'] == pytest.approx(50.0 - sum(entry['stages'].values()), abs=0.01)
+
+
+def test_admin_routes_are_off_without_a_token(client):
+    client.post('/api/recommend', json=SAMPLE_PAYLOAD)
+    for method in ('get', 'delete'):
+        response = getattr(client, method)('/api/admin/slow-requests')
+        assert response.status_code == 404
+        assert 'poitrine' not in response.get_data(as_text=True)
+
+
+def test_admin_routes_require_the_token(admin_client):
+    assert admin_client.get('/api/admin/slow-requests').status_code == 401
+    assert admin_client.delete('/api/admin/slow-requests', headers={'X-Admin-Token': 'wrong'}).status_code == 401
+
+
+def test_admin_routes_serve_and_reset_with_the_token(admin_client, slow_log):
+    headers = {'X-Admin-Token': TOKEN}
+    response = admin_client.get('/api/admin/slow-requests?format=jsonl', headers=headers)
+    assert response.status_code == 200
+    assert [json.loads(line)['height'] for line in response.get_data(as_text=True).splitlines()] == [152, 154, 150]
+
+    assert admin_client.delete('/api/admin/slow-requests', headers=headers).status_code == 200
+    assert slow_log.entries() == []
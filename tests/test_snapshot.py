@@ -0,0 +1,71 @@
+"""
+Engine snapshots: validation, static content and serving from a snapshot
+"""
+
+import copy
+import json
+
+import pytest
+
+import api
+from benchmarks import SAMPLE_PAYLOAD
+from engine import ProfessionalSizeRecommendationEngine
+from snapshot import SNAPSHOT_VERSION, build_snapshot, load_engine, load_snapshot, validate_tables
+from shared_tables import write_tables_file
+from static_content import MEASUREMENT_GUIDE, build_static_content
+
+
+@pytest.fixture
+def engine():
+    return ProfessionalSizeRecommendationEngine()
+
+
+@pytest.fixture
+def snapshot_path(engine, tmp_path):
+    path = str(tmp_path / 'engine.snapshot')
+    build_snapshot(engine, path)
+    return path
+
+
+def test_snapshot_engine_matches_the_literal_tables(engine, snapshot_path):
+    loaded, static_content = load_snapshot(ProfessionalSizeRecommendationEngine, snapshot_path)
+    assert loaded.recommend_size(SAMPLE_PAYLOAD)['sizes'] == engine.recommend_size(SAMPLE_PAYLOAD)['sizes']
+    assert static_content == json.loads(json.dumps(build_static_content(engine)))
+    assert static_content['measurement_guide'] == MEASUREMENT_GUIDE
+
+
+def test_invalid_tables_and_content_are_rejected(engine, tmp_path):
+    engine.men_top_sizes = copy.deepcopy(engine.men_top_sizes)
+    engine.men_top_sizes['M']['chest'] = (104, 96)
+    assert validate_tables(engine) == ['men_top_sizes[M][chest]: min 104 is above max 96']
+
+    engine = ProfessionalSizeRecommendationEngine()
+    engine.brand_adjustments = {'Zara': {'top': 'one', 'bottom': 0, 'note': '', 'fit_style': ''}}
+    with pytest.raises(ValueError, match='brand_adjustments'):
+        build_snapshot(engine, str(tmp_path / 'engine.snapshot'))
+
+
+def test_snapshots_of_another_version_are_refused(engine, tmp_path):
+    path = str(tmp_path / 'old.snapshot')
+    write_tables_file(engine, path, {'snapshot_version': SNAPSHOT_VERSION - 1})
+    with pytest.raises(ValueError, match='rebuild it'):
+        load_engine(ProfessionalSizeRecommendationEngine, path)
+
+
+def test_app_serves_static_content_from_the_snapshot(snapshot_path, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('SIZING_PROFILER_HZ', '0')
+    monkeypatch.setenv('SIZING_SNAPSHOT', snapshot_path)
+    app = api.create_app()
+    client = app.test_client()
+    try:
+        assert client.get('/api/measurement-guide').get_json()['data'] == MEASUREMENT_GUIDE
+        assert client.get('/api/health').get_json()['status'] == 'healthy'
+        assert client.get('/api/sizes').get_json()['data']['men_tops']['M']['chest'] == [94, 98]
+        assert client.post('/api/recommend', json=SAMPLE_PAYLOAD).status_code == 200
+    finally:
+        components = app.extensions['sizing']
+        components['event_log'].close()
+        components['feedback_learner'].close()
+        components['cache'].close()
+        components['job_manager'].close()
@@ -0,0 +1,185 @@
+"""
+Two-tier result cache: L1 and L2 hits, misses, invalidation and isolation
+"""
+
+import copy
+import threading
+import time
+
+import pytest
+
+from benchmarks import SAMPLE_PAYLOAD
+from engine import ProfessionalSizeRecommendationEngine
+from singleflight import canonical_key
+from tiered_cache import (MISS, BackendError, LocalRespServer, LRUCache, RedisBackend, SQLiteBackend,
+                          TieredCache, backend_from_url, engine_fingerprint, recommendation_key)
+
+
+class Counting:
+    """compute() callback counting its calls"""
+
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return copy.deepcopy(self.value)
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return ProfessionalSizeRecommendationEngine()
+
+
+@pytest.fixture(scope='module')
+def resp_server():
+    server = LocalRespServer().start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture(params=['sqlite', 'redis'])
+def make_backend(request, tmp_path, resp_server):
+    if request.param == 'sqlite':
+        return lambda: SQLiteBackend(str(tmp_path / 'cache.sqlite3'))
+    resp_server.data.clear()
+    return lambda: RedisBackend(*resp_server.server_address)
+
+
+def test_l1_hit_skips_the_computation():
+    cache = TieredCache(LRUCache(10))
+    compute = Counting({'size': 'M'})
+    assert cache.get_or_compute('k', compute) == {'size': 'M'}
+    assert cache.get_or_compute('k', compute) == {'size': 'M'}
+    assert compute.calls == 1
+    metrics = cache.get_metrics()
+    assert (metrics['l1']['hits'], metrics['l1']['misses'], metrics['computes']) == (1, 1, 1)
+
+
+def test_callers_get_private_copies(engine):
+    cache = TieredCache(LRUCache(10))
+    first = cache.get_or_compute('k', lambda: engine.recommend_size(SAMPLE_PAYLOAD))
+    expected = copy.deepcopy(first)
+    first['sizes']['top']['size'] = 'tampered'
+    first.clear()
+    second = cache.get_or_compute('k', lambda: pytest.fail('L1 should hit'))
+    assert second == expected
+    second['sizes'] = None
+    assert cache.get_many(['k'])['k'] == expected
+
+
+def test_coalesced_callers_get_private_copies():
+    cache = TieredCache(LRUCache(0))
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        time.sleep(0.2)
+        return {'sizes': ['M']}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', slow))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.get_metrics()['computes'] == 1
+    assert len({id(result) for result in results}) == 4
+
+
+def test_l1_disabled_and_evicting():
+    assert TieredCache(LRUCache(0)).l1.get('k') is MISS
+    l1 = LRUCache(2)
+    for key in 'abc':
+        l1.set(key, b'')
+    assert l1.get('a') is MISS
+    assert l1.get_metrics()['evictions'] == 1
+
+
+def test_l2_hit_in_another_worker(make_backend):
+    writer = TieredCache(LRUCache(10), make_backend(), namespace='v1')
+    compute = Counting({'size': 'L', 'scores': [1.5, 2]})
+    writer.get_or_compute('k', compute)
+    writer.flush()
+
+    reader = TieredCache(LRUCache(10), make_backend(), namespace='v1')
+    assert reader.get_or_compute('k', compute) == {'size': 'L', 'scores': [1.5, 2]}
+    assert compute.calls == 1
+    assert reader.get_metrics()['l2']['hits'] == 1
+    # The L2 hit is now in L1
+    assert reader.get_or_compute('k', compute) == {'size': 'L', 'scores': [1.5, 2]}
+    assert reader.get_metrics()['l2']['hits'] == 1
+    writer.close()
+    reader.close()
+
+
+def test_l2_miss_computes_and_writes_behind(make_backend):
+    cache = TieredCache(LRUCache(10), make_backend(), namespace='v1')
+    cache.get_or_compute('k', Counting({'size': 'S'}))
+    metrics = cache.get_metrics()
+    assert (metrics['l2']['misses'], metrics['computes']) == (1, 1)
+    cache.flush()
+    assert cache.get_metrics()['write_behind']['written'] == 1
+    assert cache.l2.get_many(['v1:k']) == {'v1:k': b'{"size":"S"}'}
+    cache.close()
+
+
+def test_engine_versions_do_not_share_l2(make_backend):
+    old = TieredCache(LRUCache(10), make_backend(), namespace='v1')
+    old.get_or_compute('k', Counting({'size': 'S'}))
+    old.flush()
+    new = TieredCache(LRUCache(10), make_backend(), namespace='v2')
+    compute = Counting({'size': 'M'})
+    assert new.get_or_compute('k', compute) == {'size': 'M'}
+    assert compute.calls == 1
+    old.close()
+    new.close()
+
+
+def test_expired_l2_entries_are_misses(make_backend):
+    cache = TieredCache(LRUCache(10), make_backend(), namespace='v1', ttl_seconds=0.05)
+    cache.get_or_compute('k', Counting({'size': 'S'}))
+    cache.flush()
+    time.sleep(0.1)
+    cache.l1.clear()
+    compute = Counting({'size': 'S'})
+    cache.get_or_compute('k', compute)
+    assert compute.calls == 1
+    cache.close()
+
+
+def test_brand_offset_change_invalidates_by_key(engine):
+    payload = dict(SAMPLE_PAYLOAD)
+    before = recommendation_key(engine, payload, canonical_key(payload))
+    changed = copy.copy(engine)
+    changed.brand_adjustments = copy.deepcopy(engine.brand_adjustments)
+    changed.brand_adjustments['zara']['top'] = changed.brand_adjustments['zara'].get('top', 0) + 1
+    assert recommendation_key(changed, payload, canonical_key(payload)) != before
+    unbranded = {field: value for field, value in payload.items() if field != 'brand'}
+    assert recommendation_key(changed, unbranded, canonical_key(unbranded)) == canonical_key(unbranded)
+
+
+def test_engine_fingerprint_is_stable(engine):
+    assert engine_fingerprint(engine) == engine_fingerprint(ProfessionalSizeRecommendationEngine())
+
+
+def test_unreachable_l2_is_a_miss():
+    server = LocalRespServer().start()
+    address = server.server_address
+    server.shutdown()
+    server.server_close()
+    cache = TieredCache(LRUCache(10), RedisBackend(*address, timeout=0.05), namespace='v1')
+    compute = Counting({'size': 'S'})
+    assert cache.get_or_compute('k', compute) == {'size': 'S'}
+    assert cache.get_metrics()['l2']['errors'] == 1
+    with pytest.raises(BackendError):
+        cache.l2.get_many(['v1:k'])
+
+
+def test_backend_urls(tmp_path):
+    assert backend_from_url(None) is None
+    assert isinstance(backend_from_url(f'sqlite:///{tmp_path}/cache.sqlite3'), SQLiteBackend)
+    assert isinstance(backend_from_url('redis://cache:6380/2'), RedisBackend)
+    with pytest.raises(ValueError):
+        backend_from_url('memcached://cache')
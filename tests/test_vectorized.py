@@ -0,0 +1,90 @@
+"""
+Equivalence of the vectorized engine with the scalar engine
+"""
+
+import itertools
+import math
+
+import numpy as np
+import pytest
+
+from engine import ProfessionalSizeRecommendationEngine
+from vectorized import (BODY_TYPES, FIT_LEVELS, RATIO_NAMES, VectorizedEngine, check_body_analysis, check_scores,
+                        random_profiles)
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return ProfessionalSizeRecommendationEngine()
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_body_analysis_matches_scalar_engine(engine, seed):
+    mismatches = check_body_analysis(engine, random_profiles(3000, seed))
+    assert mismatches == []
+
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_fitting_and_confidence_match_scalar_engine(engine, seed):
+    mismatches = check_scores(engine, random_profiles(1000, seed))
+    assert mismatches == []
+
+
+@pytest.mark.parametrize('garment', ['top', 'bottom'])
+def test_garment_fit_on_thresholds(engine, garment):
+    vectorized = VectorizedEngine(engine)
+    labels = vectorized.top_labels if garment == 'top' else vectorized.bottom_labels
+    midpoints = vectorized.top_midpoints if garment == 'top' else vectorized.bottom_midpoints
+    # Every size code (women's labels missing from the men's chart included) and no size,
+    # at distances on and either side of each fit threshold
+    cases = [(code, (90.0 if np.isnan(midpoints[code]) else midpoints[code]) + offset)
+             for code in range(-1, len(labels)) for offset in [0, 1, -1.5, 3, 3.5, -5, 5.5, -80]]
+    codes = np.array([code for code, _ in cases])
+    measurement = np.array([value for _, value in cases])
+    fit = vectorized.garment_fit(measurement, codes, garment)
+
+    for row, (code, value) in enumerate(cases):
+        expected = engine.calculate_garment_fit(value, 0, labels[code] if code >= 0 else None, garment)
+        actual = {'fit': FIT_LEVELS[fit['fit'][row]], 'precision': int(fit['precision'][row])}
+        if not math.isnan(fit['difference'][row]):
+            actual['difference'] = float(fit['difference'][row])
+        assert actual == expected
+
+
+def test_comfort_score_matches_scalar_engine(engine):
+    vectorized = VectorizedEngine(engine)
+    cases = list(itertools.product([0, 80, 94.5, 95, 120], [60, 72.5, 100], BODY_TYPES))
+    chest, harmony = (np.array(column, dtype=np.float64) for column in list(zip(*cases))[:2])
+    codes = np.array([BODY_TYPES.index(body_type) for _, _, body_type in cases])
+    scores = vectorized.comfort_score(chest, harmony, codes)
+
+    for row, (value, harmony_score, body_type) in enumerate(cases):
+        body_analysis = {'proportional_harmony': harmony_score, 'classification': {'type': body_type}}
+        assert float(scores[row]) == engine.calculate_comfort_score({'poitrine': value}, {}, body_analysis)
+
+
+@pytest.mark.parametrize('gender', ['homme', 'femme'])
+def test_body_types_on_thresholds(engine, gender):
+    # Every homme/femme threshold, the values either side of it, and missing ratios
+    shoulder_hip = [0.9, 0.949, 0.95, 0.951, 0.999, 1.0, 1.049, 1.05, 1.051, 1.079, 1.08, 1.081, 1.2, None]
+    waist_hip = [0.7, 0.749, 0.75, 0.751, 0.8, 0.849, 0.85, 0.851, 0.949, 0.95, 0.951, 1.0, None]
+    cases = [{name: value for name, value in (('shoulder_hip', sh), ('waist_hip', wh)) if value is not None}
+             for sh, wh in itertools.product(shoulder_hip, waist_hip)]
+
+    ratios = {name: np.array([case.get(name, np.nan) for case in cases]) for name in ('shoulder_hip', 'waist_hip')}
+    codes = VectorizedEngine(engine).body_type_codes(ratios, np.full(len(cases), gender == 'homme'))
+
+    expected = [engine.determine_professional_body_type(case, gender)['type'] for case in cases]
+    assert [BODY_TYPES[code] for code in codes] == expected
+
+
+def test_ratios_match_scalar_engine(engine):
+    vectorized = VectorizedEngine(engine)
+    rows = [(95, 80, 100, 44, 175), (88.5, 70, 97.5, 38, 0), (100, 0, 0, 46, 180), (0, 85, 96, 0, 160)]
+    chest, waist, hips, shoulders, height = (np.array(column, dtype=np.float64) for column in zip(*rows))
+    ratios = vectorized.calculate_ratios(chest, waist, hips, shoulders, height)
+
+    for row, values in enumerate(rows):
+        expected = engine.calculate_professional_ratios(*values)
+        actual = {name: float(ratios[name][row]) for name in RATIO_NAMES if not math.isnan(ratios[name][row])}
+        assert actual == expected
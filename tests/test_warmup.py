@@ -0,0 +1,89 @@
+"""
+Cache warm-up from recorded traffic
+"""
+
+import json
+
+import pytest
+
+from engine import ProfessionalSizeRecommendationEngine
+from singleflight import canonical_key
+from tiered_cache import MISS, LRUCache, SQLiteBackend, TieredCache, recommendation_key
+from vectorized import random_profiles
+from warmup import CacheWarmer, frequent_payloads
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return ProfessionalSizeRecommendationEngine()
+
+
+@pytest.fixture(scope='module')
+def payloads():
+    return random_profiles(150, 3)
+
+
+@pytest.fixture
+def traffic(tmp_path, payloads):
+    path = tmp_path / 'traffic.jsonl'
+    # The first payload is the most frequent, then the second
+    lines = [payloads[0]] * 3 + [payloads[1]] * 2 + payloads + [{'measurements': {}}]
+    path.write_text(''.join(json.dumps(payload) + '\n' for payload in lines))
+    return str(path)
+
+
+def cached(cache, engine, payload):
+    key = recommendation_key(engine, payload, canonical_key(payload))
+    return cache.get_many([key]).get(key, MISS)
+
+
+def test_frequent_payloads_are_ranked_and_incomplete_ones_skipped(payloads):
+    corpus = enumerate([payloads[1], payloads[0], payloads[0], {'gender': 'homme'}, payloads[2]])
+    selected, scanned = frequent_payloads(corpus, limit=2)
+    assert scanned == 5
+    assert [(key, count) for key, _, count in selected] == [
+        (canonical_key(payloads[0]), 2), (canonical_key(payloads[1]), 1)]
+
+
+@pytest.mark.parametrize('processes', [0, 1])
+def test_warmed_cache_serves_the_engine_results(engine, payloads, traffic, processes):
+    cache = TieredCache(LRUCache(1000))
+    warmer = CacheWarmer(cache, engine, traffic, workers=2, processes=processes)
+    report = warmer.run()
+    assert report['status'] == 'complete'
+    assert (report['selected'], report['warmed'], report['failed']) == (150, 150, 0)
+    # Every complete payload of the traffic is covered; the incomplete one is not
+    assert report['coverage'] == round(155 / 156, 4)
+    for payload in payloads:
+        assert json.loads(json.dumps(cached(cache, engine, payload))) == \
+            json.loads(json.dumps(engine.recommend_size(payload)))
+
+
+def test_second_worker_warms_from_shared_l2(engine, payloads, traffic, tmp_path):
+    path = str(tmp_path / 'cache.sqlite3')
+    first = TieredCache(LRUCache(1000), SQLiteBackend(path))
+    CacheWarmer(first, engine, traffic, processes=1).run()
+    first.close()
+
+    second = TieredCache(LRUCache(1000), SQLiteBackend(path))
+    report = CacheWarmer(second, engine, traffic, processes=1).run()
+    assert report['warmed'] == 150
+    assert second.get_metrics()['computes'] == 0
+    assert second.get_metrics()['l2']['hits'] == 150
+    second.close()
+
+
+def test_budget_limits_warm_up(engine, traffic):
+    cache = TieredCache(LRUCache(1000))
+    warmer = CacheWarmer(cache, engine, traffic, budget_seconds=0)
+    warmer.start()
+    assert warmer.wait(30)
+    assert warmer.get_metrics()['status'] == 'budget_exhausted'
+
+
+def test_without_source_the_worker_is_ready_at_once(engine):
+    warmer = CacheWarmer(TieredCache(LRUCache(10)), engine)
+    warmer.start()
+    assert warmer.ready
+    assert warmer.get_metrics()['status'] == 'disabled'
+    assert cached(warmer.cache, engine, random_profiles(1, 0)[0]) is MISS
@@ -0,0 +1,641 @@
+"""
+Professional Fashion Sizing API - Tiered Result Cache
+In-process LRU (L1) in front of a shared L2 backend (SQLite file or a Redis
+server), with read-through, write-behind and single-flight stampede protection
+"""
+
+import argparse
+import atexit
+import hashlib
+import inspect
+import json
+import logging
+import os
+import pickle
+import socket
+import socketserver
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from urllib.parse import urlparse
+
+from shared_tables import TABLE_ATTRIBUTES, to_builtin
+from singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+MISS = object()
+
+
+class BackendError(Exception):
+    """Raised when an L2 backend cannot serve a request; callers treat it as a miss"""
+
+
+class LRUCache:
+    """Bounded in-process L1; max_entries=0 disables it"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key, MISS)
+            if value is MISS:
+                self._counters['misses'] += 1
+            else:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+            return value
+
+    def set(self, key, value):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_metrics(self):
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return {
+                **self._counters,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hit_rate': round(self._counters['hits'] / lookups, 4) if lookups else 0.0
+            }
+
+
+class CacheBackend:
+    """
+    Shared L2 interface: byte values under string keys with a TTL
+    Implementations raise BackendError when unavailable and must be safe to
+    use from several threads and from forked workers.
+    """
+
+    name = 'backend'
+
+    def get_many(self, keys):
+        """{key: bytes} for the keys present"""
+        raise NotImplementedError
+
+    def set_many(self, items, ttl_seconds):
+        """Store [(key, bytes)] pairs"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    L2 in one SQLite file shared by every worker on the node
+    WAL mode lets readers proceed while a worker writes; on /dev/shm the file
+    lives in shared memory. Expired and excess rows are pruned every
+    prune_every writes.
+    """
+
+    name = 'sqlite'
+
+    SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires_at);
+    '''
+
+    def __init__(self, path, max_entries=1000000, busy_timeout_ms=50, prune_every=5000):
+        self.path = path
+        self.max_entries = max_entries
+        self.busy_timeout_ms = busy_timeout_ms
+        self.prune_every = prune_every
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._writes = 0
+
+    def _connection(self):
+        # Connections are not shared across fork
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False,
+                                   isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(self.SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def get_many(self, keys):
+        try:
+            with self._lock:
+                rows = self._connection().execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({','.join('?' * len(keys))}) AND expires_at > ?",
+                    (*keys, time.time())
+                ).fetchall()
+        except sqlite3.Error as e:
+            raise BackendError(str(e))
+        return {key: bytes(value) for key, value in rows}
+
+    def set_many(self, items, ttl_seconds):
+        expires_at = time.time() + ttl_seconds
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute('BEGIN')
+                try:
+                    conn.executemany('INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)',
+                                     [(key, value, expires_at) for key, value in items])
+                    self._writes += len(items)
+                    if self._writes >= self.prune_every:
+                        self._writes = 0
+                        self._prune(conn)
+                    conn.execute('COMMIT')
+                except sqlite3.Error:
+                    conn.execute('ROLLBACK')
+                    raise
+        except sqlite3.Error as e:
+            raise BackendError(str(e))
+
+    def _prune(self, conn):
+        conn.execute('DELETE FROM cache WHERE expires_at <= ?', (time.time(),))
+        excess = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0] - self.max_entries
+        if excess > 0:
+            conn.execute('DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at LIMIT ?)',
+                         (excess,))
+
+    def clear(self):
+        try:
+            with self._lock:
+                self._connection().execute('DELETE FROM cache')
+        except sqlite3.Error as e:
+            raise BackendError(str(e))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+
+def encode_command(*args):
+    """One RESP array of bulk strings"""
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode('utf-8')
+        parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+    return b''.join(parts)
+
+
+def read_reply(stream):
+    """One RESP reply from a buffered binary stream"""
+    line = stream.readline()
+    if not line.endswith(b'\r\n'):
+        raise BackendError('Connection closed by server')
+    kind, body = line[:1], line[1:-2]
+    if kind == b'+':
+        return body.decode('utf-8')
+    if kind == b'-':
+        raise BackendError(body.decode('utf-8', 'replace'))
+    if kind == b':':
+        return int(body)
+    if kind == b'$':
+        length = int(body)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        if len(data) != length + 2:
+            raise BackendError('Connection closed by server')
+        return data[:-2]
+    if kind == b'*':
+        count = int(body)
+        return None if count < 0 else [read_reply(stream) for _ in range(count)]
+    raise BackendError(f'Unexpected reply {line[:32]!r}')
+
+
+class RedisBackend(CacheBackend):
+    """
+    L2 on a Redis-protocol server shared by every node
+    A minimal RESP client: MGET for reads and pipelined SET ... PX for
+    writes over one connection per process. After a failure the backend is
+    skipped for retry_after seconds instead of slowing every request.
+    """
+
+    name = 'redis'
+
+    def __init__(self, host='127.0.0.1', port=6379, db=0, timeout=0.05, retry_after=5.0):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._sock = None
+        self._stream = None
+        self._pid = None
+        self._down_until = 0.0
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock, self._stream, self._pid = sock, sock.makefile('rb'), os.getpid()
+        if self.db:
+            self._sock.sendall(encode_command('SELECT', self.db))
+            read_reply(self._stream)
+
+    def _disconnect(self):
+        if self._sock is not None and self._pid == os.getpid():
+            try:
+                self._stream.close()
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = self._stream = None
+
+    def execute(self, *commands):
+        """Send commands in one pipeline and return their replies"""
+        with self._lock:
+            if time.monotonic() < self._down_until:
+                raise BackendError('Backend marked down')
+            try:
+                if self._sock is None or self._pid != os.getpid():
+                    self._connect()
+                self._sock.sendall(b''.join(encode_command(*command) for command in commands))
+                return [read_reply(self._stream) for _ in commands]
+            except (OSError, ValueError, BackendError) as e:
+                # The connection may hold unread replies; start over on a fresh one
+                self._disconnect()
+                if not isinstance(e, BackendError) or 'Connection closed' in str(e):
+                    self._down_until = time.monotonic() + self.retry_after
+                raise BackendError(str(e))
+
+    def get_many(self, keys):
+        values = self.execute(('MGET', *keys))[0]
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, items, ttl_seconds):
+        self.execute(*[('SET', key, value, 'PX', int(ttl_seconds * 1000)) for key, value in items])
+
+    def clear(self):
+        self.execute(('FLUSHDB',))
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+
+def backend_from_url(url):
+    """L2 backend from sqlite:///path/to/file or redis://host:port/db (None for no L2)"""
+    if not url:
+        return None
+    parsed = urlparse(url)
+    if parsed.scheme == 'sqlite':
+        return SQLiteBackend(parsed.path)
+    if parsed.scheme == 'redis':
+        return RedisBackend(parsed.hostname or '127.0.0.1', parsed.port or 6379, int(parsed.path.strip('/') or 0))
+    raise ValueError(f'Unsupported cache backend: {url}')
+
+
+def engine_fingerprint(engine):
+    """Hash of the engine code and static tables, so versions never share L2 entries"""
+    digest = hashlib.sha1()
+    for cls in type(engine).__mro__[:-1]:
+        digest.update(inspect.getsource(sys.modules[cls.__module__]).encode('utf-8'))
+    for attr in TABLE_ATTRIBUTES:
+        if attr != 'brand_adjustments':
+            digest.update(json.dumps(to_builtin(getattr(engine, attr)), sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+def recommendation_key(engine, data, canonical):
+    """
+    Cache key of a recommendation payload
+    Brand offsets change at runtime (fit feedback), so the requested brand's
+    current offsets are part of the key rather than a reason to flush.
+    """
+    brand = data.get('brand')
+    if not brand or not isinstance(brand, str):
+        return canonical
+    offsets = engine.brand_adjustments.get(brand.lower())
+    if offsets is None:
+        return canonical
+    return f"{canonical}|{json.dumps(to_builtin(offsets), sort_keys=True, separators=(',', ':'))}"
+
+
+def _encode(value):
+    return json.dumps(value, separators=(',', ':'), default=to_builtin).encode('utf-8')
+
+
+def _freeze(value):
+    # L1 entries never leave the process, so pickle (about twice as fast to
+    # load as JSON) is safe there; L2 stays JSON
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+class TieredCache:
+    """
+    Read-through cache of computed results
+    get_or_compute() checks L1, then L2, then computes. Concurrent misses for
+    one key share a single L2 read and computation (single flight). Computed
+    values go to L1 at once and reach L2 from a background writer in batches,
+    so the request never waits on L2 writes; a full write queue drops writes
+    rather than blocking. Values are stored serialized and every caller gets
+    its own copy, so a caller mutating its result never changes what the
+    cache serves to others.
+    """
+
+    def __init__(self, l1, l2=None, flight=None, namespace='', ttl_seconds=86400, write_queue=10000,
+                 batch_size=256, flush_interval=0.05):
+        self.l1 = l1
+        self.l2 = l2
+        self.flight = flight or SingleFlight()
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.write_queue = write_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = deque()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._counters = {'computes': 0, 'l2_hits': 0, 'l2_misses': 0, 'l2_errors': 0, 'l2_read_ms': 0.0,
+                          'writes_queued': 0, 'writes_dropped': 0, 'writes_done': 0, 'write_errors': 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def get_or_compute(self, key, compute):
+        frozen = self.l1.get(key)
+        if frozen is MISS:
+            # Coalesced callers share the frozen value, not one result object
+            frozen = self.flight.do(key, lambda: self._load(key, compute))
+        return pickle.loads(frozen)
+
+    def _load(self, key, compute):
+        """Frozen value of key, from L2 or compute()"""
+        if self.l2 is not None:
+            l2_key = f'{self.namespace}:{key}'
+            started = time.perf_counter()
+            try:
+                raw = self.l2.get_many([l2_key]).get(l2_key)
+            except BackendError as e:
+                logger.debug(f"Cache L2 read failed: {str(e)}")
+                raw = None
+                self._count('l2_errors')
+            self._count('l2_read_ms', (time.perf_counter() - started) * 1000)
+            if raw is not None:
+                self._count('l2_hits')
+                frozen = _freeze(json.loads(raw))
+                self.l1.set(key, frozen)
+                return frozen
+            self._count('l2_misses')
+
+        frozen = _freeze(compute())
+        self._count('computes')
+        self.l1.set(key, frozen)
+        if self.l2 is not None:
+            self._enqueue(key, frozen)
+        return frozen
+
+    def get_many(self, keys):
+        """Cached values of keys ({key: value}) from L1, then a single L2 read for the rest"""
+        found = {}
+        missing = []
+        for key in keys:
+            frozen = self.l1.get(key)
+            if frozen is MISS:
+                missing.append(key)
+            else:
+                found[key] = pickle.loads(frozen)
+        if not missing or self.l2 is None:
+            return found
+
+        l2_keys = {f'{self.namespace}:{key}': key for key in missing}
+        started = time.perf_counter()
+        try:
+            raw = self.l2.get_many(list(l2_keys))
+        except BackendError as e:
+            logger.debug(f"Cache L2 read failed: {str(e)}")
+            self._count('l2_errors', len(missing))
+            return found
+        finally:
+            self._count('l2_read_ms', (time.perf_counter() - started) * 1000)
+        for l2_key, key in l2_keys.items():
+            if raw.get(l2_key) is None:
+                self._count('l2_misses')
+                continue
+            self._count('l2_hits')
+            found[key] = json.loads(raw[l2_key])
+            self.l1.set(key, _freeze(found[key]))
+        return found
+
+    def set(self, key, value):
+        """Store a value computed outside get_or_compute in L1 and, behind the write queue, L2"""
+        frozen = _freeze(value)
+        self._count('computes')
+        self.l1.set(key, frozen)
+        if self.l2 is not None:
+            self._enqueue(key, frozen)
+
+    def _enqueue(self, key, frozen):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    # Started on first use so prefork servers get the thread in each worker
+                    self._thread = threading.Thread(target=self._run, name='cache-write-behind', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+        if len(self._pending) >= self.write_queue:
+            self._count('writes_dropped')
+            return
+        self._pending.append((key, frozen))
+        self._count('writes_queued')
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Write queued values to L2"""
+        while self._pending:
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                key, frozen = self._pending.popleft()
+                batch.append((f'{self.namespace}:{key}', _encode(pickle.loads(frozen))))
+            try:
+                self.l2.set_many(batch, self.ttl_seconds)
+                self._count('writes_done', len(batch))
+            except BackendError as e:
+                logger.warning(f"Cache L2 write of {len(batch)} entries failed: {str(e)}")
+                self._count('write_errors', len(batch))
+
+    def close(self):
+        self._stopped = True
+        self._wakeup.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        if self.l2 is not None:
+            self.flush()
+            self.l2.close()
+
+    def get_metrics(self):
+        with self._lock:
+            counters = dict(self._counters)
+        l2_reads = counters['l2_hits'] + counters['l2_misses'] + counters['l2_errors']
+        return {
+            'l1': self.l1.get_metrics(),
+            'l2': {
+                'backend': self.l2.name if self.l2 is not None else None,
+                'hits': counters['l2_hits'],
+                'misses': counters['l2_misses'],
+                'errors': counters['l2_errors'],
+                'hit_rate': round(counters['l2_hits'] / l2_reads, 4) if l2_reads else 0.0,
+                'mean_read_ms': round(counters['l2_read_ms'] / l2_reads, 3) if l2_reads else 0.0
+            },
+            'write_behind': {
+                'pending': len(self._pending),
+                'queued': counters['writes_queued'],
+                'written': counters['writes_done'],
+                'dropped': counters['writes_dropped'],
+                'errors': counters['write_errors']
+            },
+            'computes': counters['computes'],
+            'namespace': self.namespace
+        }
+
+
+class LocalRespServer(socketserver.ThreadingTCPServer):
+    """
+    In-memory stand-in for a Redis server (PING, GET, MGET, SET [PX|EX],
+    DEL, FLUSHDB, SELECT) for exercising RedisBackend without Redis
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        self.data = {}
+        self.data_lock = threading.Lock()
+        super().__init__(address, _RespHandler)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='resp-stand-in', daemon=True).start()
+        return self
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.data[key]
+            return None
+        return entry
+
+    def handle_command(self, command):
+        name = command[0].upper()
+        with self.data_lock:
+            if name == b'PING':
+                return b'+PONG\r\n'
+            if name in (b'SELECT', b'FLUSHDB'):
+                if name == b'FLUSHDB':
+                    self.data.clear()
+                return b'+OK\r\n'
+            if name == b'GET':
+                return _bulk((self._live(command[1]) or (None,))[0])
+            if name == b'MGET':
+                values = [(self._live(key) or (None,))[0] for key in command[1:]]
+                return b'*%d\r\n' % len(values) + b''.join(_bulk(value) for value in values)
+            if name == b'SET':
+                expires = None
+                options = [option.upper() for option in command[3:]]
+                if b'PX' in options:
+                    expires = time.monotonic() + int(command[3 + options.index(b'PX') + 1]) / 1000
+                elif b'EX' in options:
+                    expires = time.monotonic() + int(command[3 + options.index(b'EX') + 1])
+                self.data[command[1]] = (command[2], expires)
+                return b'+OK\r\n'
+            if name == b'DEL':
+                return b':%d\r\n' % sum(self.data.pop(key, None) is not None for key in command[1:])
+        return b'-ERR unknown command\r\n'
+
+
+def _bulk(value):
+    return b'$-1\r\n' if value is None else b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            try:
+                command = read_reply(self.rfile)
+            except (BackendError, ValueError):
+                return
+            self.wfile.write(self.server.handle_command(command))
+
+
+if __name__ == '__main__':
+    import tempfile
+
+    from engine import ProfessionalSizeRecommendationEngine
+    from singleflight import canonical_key
+    from vectorized import random_profiles
+
+    parser = argparse.ArgumentParser(description='Exercise the tiered cache against both L2 backends')
+    parser.add_argument('--rows', type=int, default=2000, help='Distinct payloads')
+    parser.add_argument('--workers', type=int, default=4, help='Simulated workers (each with its own L1)')
+    args = parser.parse_args()
+
+    engine = ProfessionalSizeRecommendationEngine()
+    payloads = random_profiles(args.rows, 0)
+    expected = [engine.recommend_size(payload) for payload in payloads]
+    namespace = engine_fingerprint(engine)
+
+    server = LocalRespServer().start()
+    with tempfile.TemporaryDirectory() as directory:
+        backends = [
+            ('sqlite', lambda: SQLiteBackend(os.path.join(directory, 'cache.sqlite3'))),
+            ('redis', lambda: RedisBackend(*server.server_address))
+        ]
+        failed = False
+        for name, make_backend in backends:
+            caches = [TieredCache(LRUCache(args.rows), make_backend(), namespace=namespace)
+                      for _ in range(args.workers)]
+            started = time.perf_counter()
+            mismatches = 0
+            # Each worker sees every payload; only the first should compute
+            for worker, cache in enumerate(caches):
+                for payload, result in zip(payloads, expected):
+                    key = recommendation_key(engine, payload, canonical_key(payload))
+                    value = cache.get_or_compute(key, lambda: engine.recommend_size(payload))
+                    mismatches += json.loads(_encode(value)) != json.loads(_encode(result))
+                cache.flush()
+            elapsed = time.perf_counter() - started
+            computes = sum(cache.get_metrics()['computes'] for cache in caches)
+            l2_hits = sum(cache.get_metrics()['l2']['hits'] for cache in caches)
+            print(f"{name}: {args.workers} workers x {len(payloads)} payloads in {elapsed:.2f} s, "
+                  f"{computes} computed, {l2_hits} served from L2, {mismatches} mismatches")
+            failed = failed or mismatches > 0 or computes != len(payloads)
+            for cache in caches:
+                cache.close()
+    server.shutdown()
+    sys.exit(1 if failed else 0)
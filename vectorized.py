@@ -0,0 +1,511 @@
+"""
+Professional Fashion Sizing API - Vectorized Engine
+Array implementation of the sizing pipeline for scoring whole populations,
+producing the same sizes, body types and confidence as the scalar engine
+"""
+
+import argparse
+import math
+import random
+import sys
+
+import numpy as np
+
+# Body type codes shared by the array functions
+BODY_TYPES = [
+    'Athletic V-Shape',
+    'Inverted Triangle',
+    'Pear Shape',
+    'Rectangle',
+    'Oval',
+    'Hourglass',
+    'Pear',
+    'Apple'
+]
+BODY_TYPE_CODES = {name: code for code, name in enumerate(BODY_TYPES)}
+
+REQUIRED_MEASUREMENTS = ['poitrine', 'epaules', 'bassin', 'hanches']
+MEASUREMENT_COLUMNS = ['poitrine', 'epaules', 'bassin', 'hanches', 'abdomen']
+RATIO_NAMES = ['shoulder_hip', 'waist_hip', 'chest_waist', 'chest_height', 'leg_torso']
+
+# Garment fit levels of calculate_garment_fit, with their precision scores
+FIT_LEVELS = ['unknown', 'perfect', 'excellent', 'good', 'needs_adjustment']
+FIT_PRECISION = np.array([0, 95, 85, 75, 60], dtype=np.int16)
+OVERALL_FITS = ['Good', 'Excellent']
+
+
+def round3(values):
+    """round(x, 3) with Python's correctly rounded semantics"""
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, 3)
+    # np.round scales by 1000 first, which can land on the wrong side of a half
+    scaled = values * 1000.0
+    ambiguous = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    if ambiguous.any():
+        rounded[ambiguous] = [round(float(v), 3) for v in values[ambiguous]]
+    return rounded
+
+
+def as_categorical(values):
+    """Encode a sequence of strings (None allowed) as (codes, categories)"""
+    categories = []
+    index = {}
+    codes = np.empty(len(values), dtype=np.int32)
+    for position, value in enumerate(values):
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(categories)
+            categories.append(value)
+        codes[position] = code
+    return codes, categories
+
+
+def columns_from_payloads(payloads):
+    """Recommendation payloads as the columns accepted by score_columns"""
+    columns = {}
+    for name in MEASUREMENT_COLUMNS:
+        columns[name] = np.array([p['measurements'].get(name, np.nan) for p in payloads], dtype=np.float64)
+    columns['height'] = np.array([p.get('height', np.nan) for p in payloads], dtype=np.float64)
+    for name in ['gender', 'morphotype', 'brand']:
+        columns[name] = as_categorical([p.get(name) for p in payloads])
+    for name in REQUIRED_MEASUREMENTS:
+        columns[f'fit_{name}'] = as_categorical([p.get('fit_preferences', {}).get(name) for p in payloads])
+    return columns
+
+
+def _positive(values):
+    """Missing (NaN) measurements behave like the scalar engine's 0 default"""
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(values), 0.0, values)
+
+
+def _range_penalty(values, lo, hi):
+    """Squared out-of-range penalty of every value against every range"""
+    values = values[:, None]
+    below = np.where(values < lo, (lo - values) ** 2, 0.0)
+    return np.where(values > hi, (values - hi) ** 2, below)
+
+
+class VectorizedEngine:
+    """
+    Vectorized counterpart of ProfessionalSizeRecommendationEngine
+    Chart, fit and morphotype tables are compiled from the engine once;
+    categorical inputs are (codes, categories) pairs so per-category work
+    happens once per distinct value instead of once per row.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.top_charts = [self._compile_chart(engine.men_top_sizes, ['chest', 'shoulders']),
+                           self._compile_chart(engine.women_top_sizes, ['chest', 'shoulders'])]
+        self.bottom_charts = [self._compile_chart(engine.men_bottom_sizes, ['waist', 'hips']),
+                              self._compile_chart(engine.women_bottom_sizes, ['waist', 'hips'])]
+        # Size labels: men codes first, women codes offset after them
+        self.top_labels = self.top_charts[0]['labels'] + self.top_charts[1]['labels']
+        self.bottom_labels = self.bottom_charts[0]['labels'] + self.bottom_charts[1]['labels']
+        # Garment fit compares against the men's chart midpoints, looked up by label
+        self.top_midpoints = self._compile_midpoints(self.top_labels, engine.men_top_sizes, 'chest')
+        self.bottom_midpoints = self._compile_midpoints(self.bottom_labels, engine.men_bottom_sizes, 'waist')
+
+    @staticmethod
+    def _compile_chart(chart, dimensions):
+        compiled = {'labels': list(chart)}
+        for dimension in dimensions:
+            bounds = [ranges[dimension] if dimension in ranges else (np.nan, np.nan) for ranges in chart.values()]
+            compiled[dimension] = (np.array([b[0] for b in bounds], dtype=np.float64),
+                                   np.array([b[1] for b in bounds], dtype=np.float64))
+        return compiled
+
+    @staticmethod
+    def _compile_midpoints(labels, chart, dimension):
+        """Range midpoint per size code, NaN where calculate_garment_fit has no range"""
+        midpoints = np.full(len(labels) + 1, np.nan)
+        for code, label in enumerate(labels):
+            size_range = chart.get(label, {}).get(dimension, (0, 0))
+            if size_range[0] != 0:
+                midpoints[code] = (size_range[0] + size_range[1]) / 2
+        # The trailing entry is selected by size code -1
+        return midpoints
+
+    def is_male(self, gender):
+        """Boolean mask of rows sized on the men's charts"""
+        codes, categories = gender
+        table = np.array([isinstance(c, str) and c.lower() == 'homme' for c in categories], dtype=bool)
+        return table[codes]
+
+    def _ease(self, preference):
+        codes, categories = preference
+        table = np.array([
+            self.engine.fit_adjustments.get(c.lower() if isinstance(c, str) else 'standard', {'ease': 0})['ease']
+            for c in categories
+        ], dtype=np.float64)
+        return table[codes]
+
+    def _morph(self, morphotype, measurement_type):
+        codes, categories = morphotype
+        table = np.array([
+            self.engine.morphotype_adjustments.get(c.lower(), {}).get(measurement_type, 0) if isinstance(c, str) else 0
+            for c in categories
+        ], dtype=np.float64)
+        return table[codes]
+
+    def adjust_measurement(self, values, preference, morphotype, measurement_type):
+        """Array version of adjust_measurement"""
+        values = _positive(values)
+        adjusted = values + self._ease(preference) + self._morph(morphotype, measurement_type)
+        return np.where(values <= 0, 0.0, adjusted)
+
+    def _best_codes(self, charts, first, second, second_weight, male, valid, optional_second):
+        codes = np.full(len(first), -1, dtype=np.int32)
+        offset = 0
+        for chart, mask in zip(charts, (male, ~male)):
+            dims = [name for name in chart if name != 'labels']
+            lo, hi = chart[dims[0]]
+            score = _range_penalty(first[mask], lo, hi)
+            lo, hi = chart[dims[1]]
+            second_score = _range_penalty(second[mask], lo, hi)
+            skip = np.isnan(lo) | (second[mask][:, None] <= 0) if optional_second else np.isnan(lo)
+            second_score = np.where(skip, 0.0, second_score)
+            score = score + second_score * second_weight
+            codes[mask] = np.argmin(score, axis=1) + offset
+            offset += len(chart['labels'])
+        return np.where(valid, codes, -1)
+
+    def top_size_codes(self, chest, shoulders, chest_pref, shoulders_pref, male, morphotype):
+        """Array version of find_best_top_size, codes into top_labels (-1 for None)"""
+        chest = _positive(chest)
+        shoulders = _positive(shoulders)
+        adjusted_chest = self.adjust_measurement(chest, chest_pref, morphotype, 'chest')
+        adjusted_shoulders = self.adjust_measurement(shoulders, shoulders_pref, morphotype, 'chest')
+        return self._best_codes(self.top_charts, adjusted_chest, adjusted_shoulders, 0.3, male, chest > 0,
+                                optional_second=True)
+
+    def bottom_size_codes(self, waist, hips, waist_pref, hips_pref, male, morphotype):
+        """Array version of find_best_bottom_size, codes into bottom_labels (-1 for None)"""
+        waist = _positive(waist)
+        hips = _positive(hips)
+        adjusted_waist = self.adjust_measurement(waist, waist_pref, morphotype, 'waist')
+        adjusted_hips = self.adjust_measurement(hips, hips_pref, morphotype, 'hips')
+        return self._best_codes(self.bottom_charts, adjusted_waist, adjusted_hips, 1.0, male,
+                                (waist > 0) & (hips > 0), optional_second=False)
+
+    def brand_sizes(self, size_codes, labels, brand, clothing_type):
+        """Brand-adjusted sizes as (codes, labels), computed once per (size, brand) pair"""
+        brand_codes, brands = brand
+        adjusted_labels = []
+        index = {}
+        table = np.empty((len(labels) + 1, len(brands)), dtype=np.int32)
+        for size_code, label in enumerate(list(labels) + [None]):
+            for brand_code, name in enumerate(brands):
+                if not name:
+                    value = None
+                else:
+                    value = self.engine.get_brand_adjusted_size(label, name, clothing_type)['size']
+                if value not in index:
+                    index[value] = len(adjusted_labels)
+                    adjusted_labels.append(value)
+                table[size_code, brand_code] = index[value]
+        # Size code -1 selects the trailing None row
+        codes = table[size_codes, brand_codes]
+        none_code = index.get(None, -1)
+        return np.where(codes == none_code, -1, codes), adjusted_labels
+
+    def calculate_ratios(self, chest, waist, hips, shoulders, height):
+        """Array version of calculate_professional_ratios, NaN where a ratio is absent"""
+        chest, waist, hips, shoulders, height = (_positive(v) for v in (chest, waist, hips, shoulders, height))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = {
+                'shoulder_hip': np.where((shoulders > 0) & (hips > 0), round3(shoulders / hips * 2.2), np.nan),
+                'waist_hip': np.where((waist > 0) & (hips > 0), round3(waist / hips), np.nan),
+                'chest_waist': np.where((chest > 0) & (waist > 0), round3(chest / waist), np.nan),
+                'chest_height': np.where((height > 0) & (chest > 0), round3(chest / height), np.nan)
+            }
+            leg_length = height * 0.45
+            ratios['leg_torso'] = np.where(height > 0, round3(leg_length / (height - leg_length)), np.nan)
+        return ratios
+
+    def body_type_codes(self, ratios, male):
+        """Array version of determine_professional_body_type, codes into BODY_TYPES"""
+        shoulder_hip = np.where(np.isnan(ratios['shoulder_hip']), 1.0, ratios['shoulder_hip'])
+        waist_hip = np.where(np.isnan(ratios['waist_hip']), 0.8, ratios['waist_hip'])
+
+        men = np.select(
+            [(shoulder_hip > 1.08) & (waist_hip < 0.85), shoulder_hip > 1.08, shoulder_hip < 0.95, waist_hip > 0.95],
+            [BODY_TYPE_CODES['Athletic V-Shape'], BODY_TYPE_CODES['Inverted Triangle'],
+             BODY_TYPE_CODES['Pear Shape'], BODY_TYPE_CODES['Rectangle']],
+            BODY_TYPE_CODES['Oval']
+        )
+        women = np.select(
+            [(np.abs(shoulder_hip - 1) < 0.05) & (waist_hip < 0.75), shoulder_hip > 1.05, shoulder_hip < 0.95,
+             waist_hip > 0.85],
+            [BODY_TYPE_CODES['Hourglass'], BODY_TYPE_CODES['Inverted Triangle'],
+             BODY_TYPE_CODES['Pear'], BODY_TYPE_CODES['Rectangle']],
+            BODY_TYPE_CODES['Apple']
+        )
+        return np.where(male, men, women).astype(np.int8)
+
+    def analyze_body_proportions(self, measurements, height, male):
+        """
+        Array version of the ratio, body type and harmony parts of
+        analyze_body_proportions_professional; measurements maps measurement
+        names to float arrays (NaN when missing)
+        """
+        rows = len(male)
+        nan = np.full(rows, np.nan)
+        chest, shoulders, bassin, hips, abdomen = (
+            np.asarray(measurements[name], dtype=np.float64) if name in measurements else nan
+            for name in MEASUREMENT_COLUMNS
+        )
+        # The waist is read from abdomen when present, else bassin
+        waist = np.where(np.isnan(abdomen), bassin, abdomen)
+        ratios = self.calculate_ratios(chest, waist, hips, shoulders, height)
+        return {
+            'ratios': ratios,
+            'body_type': self.body_type_codes(ratios, male),
+            'proportional_harmony': self.proportional_harmony(ratios)
+        }
+
+    def proportional_harmony(self, ratios):
+        """Array version of calculate_proportional_harmony"""
+        harmony = np.full(len(ratios['shoulder_hip']), 100.0)
+        for name, ideal in (('shoulder_hip', 1.0), ('waist_hip', 0.7), ('chest_waist', 1.3)):
+            penalty = np.minimum(np.abs(ratios[name] - ideal) * 20, 30)
+            harmony = np.where(np.isnan(ratios[name]), harmony, harmony - penalty)
+        return np.maximum(60, harmony)
+
+    def garment_fit(self, measurement, size_codes, clothing_type):
+        """
+        Array version of calculate_garment_fit
+        Returns fit level codes into FIT_LEVELS, precision scores and the
+        difference to the size midpoint (NaN when the fit is unknown).
+        """
+        measurement = _positive(measurement)
+        midpoints = self.top_midpoints if clothing_type == 'top' else self.bottom_midpoints
+        midpoint = midpoints[size_codes]
+        known = (size_codes >= 0) & (measurement > 0) & ~np.isnan(midpoint)
+        difference = np.where(known, measurement - midpoint, np.nan)
+        distance = np.abs(difference)
+        levels = np.select(
+            [~known, distance <= 1, distance <= 3, distance <= 5],
+            [FIT_LEVELS.index('unknown'), FIT_LEVELS.index('perfect'),
+             FIT_LEVELS.index('excellent'), FIT_LEVELS.index('good')],
+            FIT_LEVELS.index('needs_adjustment')
+        ).astype(np.int8)
+        return {'fit': levels, 'precision': FIT_PRECISION[levels], 'difference': difference}
+
+    def comfort_score(self, chest, harmony, body_type_codes):
+        """Array version of calculate_comfort_score"""
+        chest = _positive(chest)
+        body_type_score = np.select(
+            [np.isin(body_type_codes, [BODY_TYPE_CODES['Hourglass'], BODY_TYPE_CODES['Athletic V-Shape']]),
+             body_type_codes == BODY_TYPE_CODES['Rectangle']],
+            [90.0, 80.0],
+            75.0
+        )
+        chest_score = np.maximum(60, 100 - np.abs(chest - 95) * 1.5)
+        with_chest = (harmony + chest_score + body_type_score) / 3
+        without_chest = (harmony + body_type_score) / 2
+        return np.where(chest > 0, with_chest, without_chest)
+
+    def virtual_fitting(self, measurements, top_codes, bottom_codes, body):
+        """
+        Array version of the scores in generate_virtual_fitting
+        body is the result of analyze_body_proportions. Overall fit codes
+        index OVERALL_FITS.
+        """
+        rows = len(top_codes)
+        nan = np.full(rows, np.nan)
+        chest, shoulders, bassin, hips, abdomen = (
+            np.asarray(measurements[name], dtype=np.float64) if name in measurements else nan
+            for name in MEASUREMENT_COLUMNS
+        )
+        waist = np.where(np.isnan(abdomen), bassin, abdomen)
+        comfort = self.comfort_score(chest, body['proportional_harmony'], body['body_type'])
+        return {
+            'top': self.garment_fit(chest, top_codes, 'top'),
+            'bottom': self.garment_fit(waist, bottom_codes, 'bottom'),
+            'comfort_prediction': comfort,
+            'overall_fit': (comfort > 85).astype(np.int8)
+        }
+
+    def confidence(self, measurements, harmony):
+        """Array version of calculate_professional_confidence"""
+        present = sum((_positive(measurements[name]) > 0).astype(np.int64) for name in REQUIRED_MEASUREMENTS)
+        completeness = present / len(REQUIRED_MEASUREMENTS)
+        final = np.minimum(98, 85 + completeness * 10 + (harmony - 80) * 0.3)
+        return np.maximum(80, final)
+
+    def size_codes(self, columns):
+        """Top and bottom size codes of a population given as columns (see score_columns)"""
+        rows = len(columns['gender'][0])
+        nan = np.full(rows, np.nan)
+        standard = (np.zeros(rows, dtype=np.int32), ['standard'])
+        measurements = {name: np.asarray(columns[name], dtype=np.float64) if name in columns else nan
+                        for name in ['poitrine', 'epaules', 'bassin', 'hanches']}
+        fits = {name: columns.get(f'fit_{name}', standard) for name in measurements}
+        male = self.is_male(columns['gender'])
+        morphotype = columns.get('morphotype', (np.zeros(rows, dtype=np.int32), [None]))
+
+        top = self.top_size_codes(measurements['poitrine'], measurements['epaules'],
+                                  fits['poitrine'], fits['epaules'], male, morphotype)
+        bottom = self.bottom_size_codes(measurements['bassin'], measurements['hanches'],
+                                        fits['bassin'], fits['hanches'], male, morphotype)
+        return top, bottom
+
+    def score_columns(self, columns, include_fitting=False):
+        """
+        Score a population given as columns
+        Numeric columns (poitrine, epaules, bassin, hanches, abdomen, height) are
+        float arrays with NaN for missing values; gender, morphotype, brand and
+        fit_<measurement> are (codes, categories) pairs. Size outputs are
+        (codes, labels) pairs with -1 for no size. With include_fitting=True
+        the virtual fitting scores are added.
+        """
+        rows = len(columns['gender'][0])
+        nan = np.full(rows, np.nan)
+
+        def numeric(name):
+            return np.asarray(columns[name], dtype=np.float64) if name in columns else nan
+
+        measurements = {name: numeric(name) for name in MEASUREMENT_COLUMNS}
+        male = self.is_male(columns['gender'])
+        brand = columns.get('brand', (np.zeros(rows, dtype=np.int32), [None]))
+        top, bottom = self.size_codes(columns)
+
+        body = self.analyze_body_proportions(measurements, numeric('height'), male)
+
+        scores = {
+            'top_size': (top, self.top_labels),
+            'bottom_size': (bottom, self.bottom_labels),
+            'brand_top_size': self.brand_sizes(top, self.top_labels, brand, 'top'),
+            'brand_bottom_size': self.brand_sizes(bottom, self.bottom_labels, brand, 'bottom'),
+            'body_type': (body['body_type'], BODY_TYPES),
+            'confidence': self.confidence(measurements, body['proportional_harmony'])
+        }
+        if include_fitting:
+            fitting = self.virtual_fitting(measurements, top, bottom, body)
+            for garment in ['top', 'bottom']:
+                scores[f'{garment}_fit'] = (fitting[garment]['fit'], FIT_LEVELS)
+                scores[f'{garment}_fit_precision'] = fitting[garment]['precision']
+                scores[f'{garment}_fit_difference'] = fitting[garment]['difference']
+            scores['comfort_prediction'] = fitting['comfort_prediction']
+            scores['overall_fit'] = (fitting['overall_fit'], OVERALL_FITS)
+        return scores
+
+
+def random_profiles(rows, seed=0):
+    """
+    Random recommendation payloads for equivalence checks
+    Measurements are whole and half centimetres like real input, so ratios
+    regularly land exactly on the classification thresholds; some are
+    missing or zero.
+    """
+    rng = random.Random(seed)
+    bounds = {'poitrine': (75, 125), 'epaules': (34, 58), 'bassin': (55, 105),
+              'hanches': (80, 122), 'abdomen': (55, 110)}
+
+    def measurement(lo, hi):
+        draw = rng.random()
+        if draw < 0.04:
+            return None
+        if draw < 0.06:
+            return 0
+        return rng.randint(lo * 2, hi * 2) / 2
+
+    payloads = []
+    for _ in range(rows):
+        measurements = {}
+        for name, (lo, hi) in bounds.items():
+            value = measurement(lo, hi)
+            if value is not None and (name != 'abdomen' or rng.random() < 0.3):
+                measurements[name] = value
+        payloads.append({
+            'measurements': measurements,
+            'fit_preferences': {name: rng.choice(['cintre', 'standard', 'ample'])
+                                for name in REQUIRED_MEASUREMENTS if rng.random() < 0.6},
+            'gender': rng.choice(['homme', 'femme', 'Homme']),
+            'height': rng.choice([0, rng.randint(140, 205)]),
+            'morphotype': rng.choice(['mince', 'normal', 'fort', 'athletique']),
+            'brand': rng.choice(['', 'zara', 'uniqlo', 'levis', 'unknown'])
+        })
+    return payloads
+
+
+def check_body_analysis(engine, payloads):
+    """Compare ratios, body types and harmony with the scalar engine, listing mismatches"""
+    vectorized = VectorizedEngine(engine)
+    columns = columns_from_payloads(payloads)
+    body = vectorized.analyze_body_proportions(columns, columns['height'], vectorized.is_male(columns['gender']))
+
+    mismatches = []
+    for row, payload in enumerate(payloads):
+        expected = engine.analyze_body_proportions_professional(
+            payload['measurements'], payload['gender'], payload['height'])
+        ratios = {name: float(body['ratios'][name][row]) for name in RATIO_NAMES
+                  if not math.isnan(body['ratios'][name][row])}
+        actual = {
+            'ratios': ratios,
+            'type': BODY_TYPES[body['body_type'][row]],
+            'proportional_harmony': float(body['proportional_harmony'][row])
+        }
+        wanted = {
+            'ratios': expected['ratios'],
+            'type': expected['classification']['type'],
+            'proportional_harmony': expected['proportional_harmony']
+        }
+        if actual != wanted:
+            mismatches.append({'payload': payload, 'expected': wanted, 'actual': actual})
+    return mismatches
+
+
+def check_scores(engine, payloads):
+    """Compare virtual fitting and confidence with recommend_size, listing mismatches"""
+    vectorized = VectorizedEngine(engine)
+    scores = vectorized.score_columns(columns_from_payloads(payloads), include_fitting=True)
+
+    mismatches = []
+    for row, payload in enumerate(payloads):
+        recommendation = engine.recommend_size(payload)
+        fitting = recommendation['virtual_fitting']
+        wanted = {
+            'comfort_prediction': fitting['comfort_prediction'],
+            'overall_fit': fitting['professional_assessment']['overall_fit'],
+            'confidence': recommendation['confidence']
+        }
+        actual = {
+            'comfort_prediction': float(scores['comfort_prediction'][row]),
+            'overall_fit': OVERALL_FITS[scores['overall_fit'][0][row]],
+            'confidence': float(scores['confidence'][row])
+        }
+        for garment in ['top', 'bottom']:
+            wanted[garment] = fitting['fit_analysis'][garment]
+            actual[garment] = {
+                'fit': FIT_LEVELS[scores[f'{garment}_fit'][0][row]],
+                'precision': int(scores[f'{garment}_fit_precision'][row])
+            }
+            difference = scores[f'{garment}_fit_difference'][row]
+            if not math.isnan(difference):
+                actual[garment]['difference'] = float(difference)
+        if actual != wanted:
+            mismatches.append({'payload': payload, 'expected': wanted, 'actual': actual})
+    return mismatches
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check the vectorized engine against the scalar engine')
+    parser.add_argument('--rows', type=int, default=20000, help='Number of random profiles')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    from engine import ProfessionalSizeRecommendationEngine
+    scalar_engine = ProfessionalSizeRecommendationEngine()
+    payloads = random_profiles(args.rows, args.seed)
+
+    failed = False
+    for name, check in [('body analysis', check_body_analysis), ('fitting and confidence', check_scores)]:
+        failures = check(scalar_engine, payloads)
+        for failure in failures[:5]:
+            print(f"  MISMATCH {failure}")
+        print(f"{name}: {len(failures)} mismatches in {len(payloads)} profiles")
+        failed = failed or bool(failures)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,287 @@
+"""
+Professional Fashion Sizing API - Cache Warm-up
+Replays the most frequent recorded payloads through the result cache after a
+deploy, within a time budget, before the worker reports ready
+"""
+
+import argparse
+import itertools
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from shared_tables import TABLE_ATTRIBUTES, to_builtin
+from singleflight import canonical_key
+from tiered_cache import recommendation_key
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ('measurements', 'fit_preferences', 'gender', 'height', 'morphotype')
+# Payloads per cache read and worker task when misses are computed in processes
+BATCH_SIZE = 64
+
+
+def frequent_payloads(corpus, limit=5000, scan_limit=200000, deadline=None):
+    """
+    The limit most frequent distinct payloads of a corpus, most frequent first
+    Payloads are grouped by canonical key; only the first scan_limit payloads
+    are read, and reading stops at the deadline (time.monotonic()).
+    """
+    counts = Counter()
+    payloads = {}
+    scanned = 0
+    for _, payload in itertools.islice(corpus, scan_limit):
+        scanned += 1
+        if deadline is not None and scanned % 1000 == 0 and time.monotonic() >= deadline:
+            break
+        if not isinstance(payload, dict) or any(field not in payload for field in REQUIRED_FIELDS):
+            continue
+        key = canonical_key(payload)
+        counts[key] += 1
+        payloads.setdefault(key, payload)
+    return [(key, payloads[key], count) for key, count in counts.most_common(limit)], scanned
+
+
+# Worker process state: an engine over the server engine's tables, built by the pool initializer
+_worker_engine = None
+
+
+def _init_worker(engine_class, tables):
+    global _worker_engine
+    logging.getLogger().setLevel(logging.WARNING)
+    _worker_engine = engine_class.from_tables(tables)
+
+
+def _recommend_many(payloads):
+    """(error, recommendation) per payload (runs in a worker process)"""
+    results = []
+    for payload in payloads:
+        try:
+            results.append((None, _worker_engine.recommend_size(payload)))
+        except Exception as e:
+            results.append((str(e), None))
+    return results
+
+
+class CacheWarmer:
+    """
+    Fills the recommendation cache from a traffic file or event log directory
+    start() runs in the background; ready turns true once every selected
+    payload is cached or the time budget runs out, whichever comes first.
+    Workers are threads because L1 lives in this process, so they overlap L2
+    reads but compute one recommendation at a time under the GIL. With
+    processes, misses are computed by that many worker processes over a copy
+    of the engine's tables, and the threads fill L1 and L2 with the results.
+    """
+
+    def __init__(self, cache, engine, source=None, limit=5000, budget_seconds=30.0, workers=4,
+                 scan_limit=200000, processes=0):
+        self.cache = cache
+        self.engine = engine
+        self.source = source
+        self.limit = limit
+        self.budget_seconds = budget_seconds
+        self.workers = max(1, workers)
+        self.scan_limit = scan_limit
+        self.processes = max(0, processes)
+        self._done = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._reset_counters()
+        if not source:
+            self._done.set()
+
+    def _reset_counters(self):
+        self._counters = {'selected': 0, 'scanned': 0, 'warmed': 0, 'failed': 0, 'requests_covered': 0,
+                          'requests_selected': 0}
+        self._started = None
+        self._finished = None
+        self._status = 'disabled' if not self.source else 'pending'
+
+    @property
+    def ready(self):
+        return self._done.is_set()
+
+    def start(self):
+        """Start warming in the background (no-op without a source)"""
+        if not self.source or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self.run, name='cache-warmup', daemon=True)
+        self._thread.start()
+        if not hasattr(self, '_fork_hook'):
+            # A worker forked mid warm-up inherits an unfinished state but not the thread
+            self._fork_hook = True
+            os.register_at_fork(after_in_child=self._restart_in_child)
+
+    def _restart_in_child(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        if not self.ready:
+            self._reset_counters()
+            self.start()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def run(self):
+        """Warm the cache in the calling thread; returns the metrics"""
+        self._started = time.monotonic()
+        deadline = self._started + self.budget_seconds
+        self._status = 'loading'
+        # replay pulls in numpy; only workers that warm up pay for it
+        from replay import read_corpus
+        try:
+            # Reading the traffic may use half the budget; the rest is for warming
+            selected, scanned = frequent_payloads(read_corpus(self.source), self.limit, self.scan_limit,
+                                                  self._started + self.budget_seconds / 2)
+        except (OSError, ValueError) as e:
+            logger.error(f"Cache warm-up could not read {self.source}: {str(e)}")
+            self._finish('failed')
+            return self.get_metrics()
+
+        self._counters['scanned'] = scanned
+        self._counters['selected'] = len(selected)
+        self._counters['requests_selected'] = sum(count for _, _, count in selected)
+        self._status = 'warming'
+        position = itertools.count()
+        pool = self._start_pool() if self.processes and selected else None
+
+        def work():
+            while time.monotonic() < deadline:
+                index = next(position)
+                if index >= len(selected):
+                    return
+                key, payload, count = selected[index]
+                try:
+                    self.cache.get_or_compute(recommendation_key(self.engine, payload, key),
+                                              lambda: self.engine.recommend_size(payload))
+                except Exception as e:
+                    logger.debug(f"Cache warm-up payload failed: {str(e)}")
+                    self._count('failed')
+                    continue
+                self._count('warmed')
+                self._count('requests_covered', count)
+
+        def work_in_pool():
+            while time.monotonic() < deadline:
+                start = next(position) * BATCH_SIZE
+                if start >= len(selected):
+                    return
+                batch = selected[start:start + BATCH_SIZE]
+                keys = [recommendation_key(self.engine, payload, key) for key, payload, _ in batch]
+                try:
+                    cached = self.cache.get_many(keys)
+                    misses = [index for index, key in enumerate(keys) if key not in cached]
+                    results = pool.submit(_recommend_many, [batch[index][1] for index in misses]).result() \
+                        if misses else []
+                except Exception as e:
+                    logger.debug(f"Cache warm-up batch failed: {str(e)}")
+                    self._count('failed', len(batch))
+                    continue
+                failed = set()
+                for index, (error, recommendation) in zip(misses, results):
+                    if error is None:
+                        self.cache.set(keys[index], recommendation)
+                    else:
+                        logger.debug(f"Cache warm-up payload failed: {error}")
+                        failed.add(index)
+                self._count('failed', len(failed))
+                self._count('warmed', len(batch) - len(failed))
+                self._count('requests_covered', sum(count for index, (_, _, count) in enumerate(batch)
+                                                    if index not in failed))
+
+        if pool is not None:
+            # Threads only wait on the cache and the pool; two per process keep every process busy
+            target, thread_count = work_in_pool, max(self.workers, 2 * self.processes)
+        else:
+            target, thread_count = work, self.workers
+        threads = [threading.Thread(target=target, name=f'cache-warmup-{n}', daemon=True)
+                   for n in range(min(thread_count, len(selected)))]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._finish('complete' if self._counters['warmed'] + self._counters['failed'] >= len(selected)
+                     else 'budget_exhausted')
+        return self.get_metrics()
+
+    def _start_pool(self):
+        """Worker processes over the engine's current tables, brand offsets included"""
+        from concurrent.futures import ProcessPoolExecutor
+        tables = {attr: to_builtin(getattr(self.engine, attr)) for attr in TABLE_ATTRIBUTES}
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(type(self.engine), tables)
+        )
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _finish(self, status):
+        self._finished = time.monotonic()
+        self._status = status
+        self._done.set()
+        logger.info(f"Cache warm-up {status}: {self._counters['warmed']} of {self._counters['selected']} "
+                    f"payloads in {self._finished - self._started:.2f}s")
+
+    def get_metrics(self):
+        with self._lock:
+            counters = dict(self._counters)
+        elapsed = None
+        if self._started is not None:
+            elapsed = round((self._finished or time.monotonic()) - self._started, 3)
+        return {
+            **counters,
+            'status': self._status,
+            'ready': self.ready,
+            'source': self.source,
+            'budget_seconds': self.budget_seconds,
+            'workers': self.workers,
+            'processes': self.processes,
+            'elapsed_seconds': elapsed,
+            # Share of the scanned traffic whose payload is now cached
+            'coverage': round(counters['requests_covered'] / counters['scanned'], 4) if counters['scanned'] else 0.0
+        }
+
+
+if __name__ == '__main__':
+    import json
+    from engine import ProfessionalSizeRecommendationEngine
+    from replay import read_corpus
+    from tiered_cache import MISS, LRUCache, TieredCache
+
+    parser = argparse.ArgumentParser(description='Warm a fresh cache from recorded traffic and report its hit rate')
+    parser.add_argument('corpus', help='JSONL file of recommendation payloads or an event log directory')
+    parser.add_argument('--limit', type=int, default=5000, help='Most frequent payloads to warm')
+    parser.add_argument('--seconds', type=float, default=30.0, help='Time budget')
+    parser.add_argument('--workers', type=int, default=4, help='Warm-up threads')
+    parser.add_argument('--processes', type=int, default=0, help='Worker processes computing the misses')
+    args = parser.parse_args()
+
+    engine = ProfessionalSizeRecommendationEngine()
+    cache = TieredCache(LRUCache(max(args.limit, 1)))
+    warmer = CacheWarmer(cache, engine, args.corpus, args.limit, args.seconds, args.workers,
+                         processes=args.processes)
+    report = warmer.run()
+    print(json.dumps(report, indent=2))
+    if report['status'] == 'failed':
+        sys.exit(1)
+
+    # Share of the corpus a freshly warmed worker answers from L1, without caching the misses
+    hits = total = 0
+    for _, payload in itertools.islice(read_corpus(args.corpus), warmer.scan_limit):
+        if isinstance(payload, dict) and all(field in payload for field in REQUIRED_FIELDS):
+            total += 1
+            hits += cache.l1.get(recommendation_key(engine, payload, canonical_key(payload))) is not MISS
+    print(f"L1 hit rate of the corpus after warm-up: {hits / max(total, 1):.4f}")